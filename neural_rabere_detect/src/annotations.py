@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Tuple
+import logging
+
+from .utils import publish_directory
+
+# Columns of the annotation index: name -> (source key, dtype, row width)
+INDEX_COLUMNS: Dict[str, Tuple[str, type, int]] = {
+    "frame_id": ("frame_id", np.int32, 1),
+    "bbox": ("bbox", np.float32, 4),
+    "activity_level": ("activity_level", np.float32, 1),
+    "position": ("Rabere_position", np.float32, 2),
+    "direction": ("Rabere_direction", np.float32, 1),
+    "speed": ("Rabere_speed", np.float32, 1)
+}
+
+INDEX_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+class AnnotationIndex:
+    def __init__(self, index_path: Path):
+        # Pinned to the version current at open time, so columns opened
+        # lazily later match meta and offsets even if the index is rebuilt
+        self.index_path = Path(index_path).resolve()
+
+        with open(self.index_path / "meta.json", 'r') as f:
+            self.meta = json.load(f)
+
+        self.sequence_names: List[str] = self.meta["sequences"]
+        self.offsets = np.load(self.index_path / "offsets.npy")
+        self.lengths = np.diff(self.offsets)
+
+        # Columns are memory-mapped lazily so every worker shares the page cache
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state["_columns"] = {}
+        return state
+
+    def __len__(self) -> int:
+        return len(self.sequence_names)
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = np.load(self.index_path / f"{name}.npy", mmap_mode="r")
+        return self._columns[name]
+
+    def rows(self, seq_idx: int, start: int, stop: int, step: int = 1) -> slice:
+        offset = int(self.offsets[seq_idx])
+        return slice(offset + start, offset + stop, step)
+
+    @staticmethod
+    def _source_mtime(annotation_path: Path, sequence_names: List[str]) -> int:
+        return max(
+            (annotation_path / f"{name}.json").stat().st_mtime_ns
+            for name in sequence_names
+        ) if sequence_names else 0
+
+    @classmethod
+    def build(
+        cls,
+        annotation_path: Path,
+        sequence_names: List[str],
+        index_path: Path
+    ) -> "AnnotationIndex":
+        annotation_path = Path(annotation_path)
+        index_path = Path(index_path)
+
+        frames_per_sequence = []
+        for name in sequence_names:
+            with open(annotation_path / f"{name}.json", 'r') as f:
+                frames_per_sequence.append(json.load(f)["frames"])
+
+        offsets = np.zeros(len(sequence_names) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(frames) for frames in frames_per_sequence])
+
+        columns = {}
+        for name, (key, dtype, width) in INDEX_COLUMNS.items():
+            values = [frame[key] for frames in frames_per_sequence for frame in frames]
+            column = np.asarray(values, dtype=dtype)
+            columns[name] = column.reshape(-1, width) if width > 1 else column.reshape(-1)
+
+        # Write into a temporary directory and publish it in one atomic swap,
+        # so concurrent readers never see a half-written or missing index
+        tmp_path = index_path.with_name(index_path.name + f".tmp{os.getpid()}")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        np.save(tmp_path / "offsets.npy", offsets)
+        for name, column in columns.items():
+            np.save(tmp_path / f"{name}.npy", column)
+
+        with open(tmp_path / "meta.json", 'w') as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "sequences": sequence_names,
+                "source_mtime_ns": cls._source_mtime(annotation_path, sequence_names)
+            }, f)
+
+        publish_directory(tmp_path, index_path)
+
+        logger.info(f"Built annotation index for {len(sequence_names)} sequences at {index_path}")
+        return cls(index_path)
+
+    @classmethod
+    def open_or_build(
+        cls,
+        annotation_path: Path,
+        sequence_names: List[str],
+        index_path: Path
+    ) -> "AnnotationIndex":
+        annotation_path = Path(annotation_path)
+        meta_path = Path(index_path) / "meta.json"
+
+        if meta_path.is_file():
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+
+            if (
+                meta.get("version") == INDEX_VERSION
+                and meta["sequences"] == sequence_names
+                and meta["source_mtime_ns"] == cls._source_mtime(annotation_path, sequence_names)
+            ):
+                return cls(index_path)
+
+        return cls.build(annotation_path, sequence_names, index_path)
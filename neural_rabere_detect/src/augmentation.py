@@ -0,0 +1,115 @@
+import math
+import torch
+import numpy as np
+import torch.nn.functional as F
+from typing import List, Sequence, Tuple, Union
+
+class ClipAugmentation:
+    def __init__(
+        self,
+        train: bool = True,
+        brightness_limit: float = 0.2,
+        contrast_limit: float = 0.2,
+        brightness_contrast_prob: float = 0.5,
+        noise_var_limit: Tuple[float, float] = (10.0, 50.0),
+        noise_prob: float = 0.5,
+        horizontal_flip_prob: float = 0.5,
+        vertical_flip_prob: float = 0.5,
+        rotation_limit: float = 30.0,
+        rotation_prob: float = 0.5,
+        mean: Sequence[float] = (0.485, 0.456, 0.406),
+        std: Sequence[float] = (0.229, 0.224, 0.225)
+    ):
+        self.train = train
+        self.brightness_limit = brightness_limit
+        self.contrast_limit = contrast_limit
+        self.brightness_contrast_prob = brightness_contrast_prob
+        self.noise_var_limit = noise_var_limit
+        self.noise_prob = noise_prob
+        self.horizontal_flip_prob = horizontal_flip_prob
+        self.vertical_flip_prob = vertical_flip_prob
+        self.rotation_limit = rotation_limit
+        self.rotation_prob = rotation_prob
+
+        # Normalization folded into one scale and shift on the 0-255 range
+        mean = torch.tensor(mean, dtype=torch.float32).view(1, 3, 1, 1)
+        std = torch.tensor(std, dtype=torch.float32).view(1, 3, 1, 1)
+        self.scale = 1.0 / (255.0 * std)
+        self.shift = -mean / std
+
+    @staticmethod
+    def _uniform(low: float, high: float) -> float:
+        return low + (high - low) * torch.rand(()).item()
+
+    @staticmethod
+    def _chance(p: float) -> bool:
+        return p > 0 and torch.rand(()).item() < p
+
+    def __call__(
+        self,
+        clip: Union[np.ndarray, List[np.ndarray]],
+        bboxes: np.ndarray
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        # [T, H, W, 3] uint8 -> [T, 3, H, W] float32 in one copy
+        frames = torch.from_numpy(np.stack(clip)).permute(0, 3, 1, 2).float()
+        bboxes = torch.as_tensor(np.asarray(bboxes), dtype=torch.float32).clone()
+        T, _, H, W = frames.shape
+
+        if self.train:
+            # Parameters are sampled once per clip so all frames stay consistent
+            if self._chance(self.brightness_contrast_prob):
+                alpha = 1.0 + self._uniform(-self.contrast_limit, self.contrast_limit)
+                beta = 255.0 * self._uniform(-self.brightness_limit, self.brightness_limit)
+                frames.mul_(alpha).add_(beta).clamp_(0, 255)
+
+            if self._chance(self.noise_prob):
+                sigma = math.sqrt(self._uniform(*self.noise_var_limit))
+                frames.add_(torch.randn_like(frames), alpha=sigma).clamp_(0, 255)
+
+            if self._chance(self.horizontal_flip_prob):
+                frames = frames.flip(-1)
+                bboxes[:, [0, 2]] = W - bboxes[:, [2, 0]]
+
+            if self._chance(self.vertical_flip_prob):
+                frames = frames.flip(-2)
+                bboxes[:, [1, 3]] = H - bboxes[:, [3, 1]]
+
+            if self._chance(self.rotation_prob):
+                angle = math.radians(self._uniform(-self.rotation_limit, self.rotation_limit))
+                frames, bboxes = self._rotate(frames, bboxes, angle)
+
+        frames = frames.mul_(self.scale).add_(self.shift)
+        return frames.contiguous(), bboxes
+
+    def _rotate(
+        self,
+        frames: torch.Tensor,
+        bboxes: torch.Tensor,
+        angle: float
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        T, _, H, W = frames.shape
+        cos, sin = math.cos(angle), math.sin(angle)
+
+        # Output -> input sampling grid in normalized coordinates, shared by
+        # every frame of the clip
+        theta = torch.tensor([
+            [cos, sin * H / W, 0.0],
+            [-sin * W / H, cos, 0.0]
+        ], dtype=frames.dtype).expand(T, 2, 3)
+        grid = F.affine_grid(theta, frames.shape, align_corners=False)
+        frames = F.grid_sample(frames, grid, mode="bilinear", padding_mode="reflection", align_corners=False)
+
+        # Rotate the box corners about the image center and take their extent
+        cx, cy = W / 2, H / 2
+        xs = bboxes[:, [0, 2, 2, 0]] - cx
+        ys = bboxes[:, [1, 1, 3, 3]] - cy
+        rx = cos * xs - sin * ys + cx
+        ry = sin * xs + cos * ys + cy
+        bboxes = torch.stack([
+            rx.min(dim=1).values.clamp(0, W),
+            ry.min(dim=1).values.clamp(0, H),
+            rx.max(dim=1).values.clamp(0, W),
+            ry.max(dim=1).values.clamp(0, H)
+        ], dim=1)
+
+        return frames, bboxes
@@ -0,0 +1,101 @@
+import torch
+import torch.nn as nn
+import torchvision.models as models
+from torchvision.models.feature_extraction import create_feature_extractor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .utils import set_activation_checkpointing
+
+# name -> (torchvision constructor, nodes returning the stride 4/8/16/32 stages,
+# modules recomputed under activation checkpointing)
+BACKBONES: Dict[str, Tuple[Callable[..., nn.Module], List[str], List[str]]] = {}
+
+RESNET_STAGES = ["layer1", "layer2", "layer3", "layer4"]
+
+def register_backbone(
+    name: str,
+    constructor: Callable[..., nn.Module],
+    stage_nodes: List[str],
+    checkpoint_modules: Optional[List[str]] = None
+) -> None:
+    if len(stage_nodes) != 4:
+        raise ValueError(f"Backbone {name} must expose four stages, got {len(stage_nodes)}")
+    BACKBONES[name] = (constructor, stage_nodes, checkpoint_modules or stage_nodes)
+
+def available_backbones() -> List[str]:
+    return sorted(BACKBONES)
+
+class Backbone(nn.Module):
+    def __init__(self, name: str, pretrained: bool = True):
+        super().__init__()
+        if name not in BACKBONES:
+            raise NotImplementedError(
+                f"Backbone {name} not implemented, choose from {available_backbones()}"
+            )
+
+        constructor, stage_nodes, self.checkpoint_modules = BACKBONES[name]
+        network = constructor(weights="DEFAULT" if pretrained else None)
+
+        # Keeps only what the stage outputs depend on, so the classifier is
+        # dropped; the result stays FX-traceable for quantization. The
+        # checkpointed modules are traced as leaves: the graph then calls
+        # them instead of inlining their ops, so their forward can be swapped
+        leaf_types = {type(network.get_submodule(module)) for module in self.checkpoint_modules}
+        self.body = create_feature_extractor(
+            network,
+            return_nodes={node: str(idx) for idx, node in enumerate(stage_nodes)},
+            tracer_kwargs={"leaf_modules": list(leaf_types)}
+        )
+
+        called = {node.target for node in self.body.graph.nodes if node.op == "call_module"}
+        missing = [module for module in self.checkpoint_modules if module not in called]
+        if missing:
+            raise ValueError(f"Backbone {name} graph does not call checkpoint modules {missing}")
+        self.name = name
+        self.out_channels = self._discover_channels()
+
+    @torch.no_grad()
+    def _discover_channels(self) -> List[int]:
+        was_training = self.training
+        self.eval()
+        features = self(torch.zeros(1, 3, 64, 64))
+        self.train(was_training)
+        return [feature.shape[1] for feature in features]
+
+    def set_activation_checkpointing(self, enabled: bool) -> None:
+        for name in self.checkpoint_modules:
+            set_activation_checkpointing(self.body.get_submodule(name), enabled)
+
+    def forward(self, x: torch.Tensor) -> List[torch.Tensor]:
+        # Stage features at strides 4, 8, 16 and 32
+        return list(self.body(x).values())
+
+for _name in ("resnet18", "resnet34", "resnet50", "resnet101", "resnext50_32x4d", "resnext101_32x8d"):
+    register_backbone(_name, getattr(models, _name), RESNET_STAGES)
+
+def _blocks(last: int) -> List[str]:
+    return [f"features.{idx}" for idx in range(1, last + 1)]
+
+# Mobile-class networks: last block of each resolution; every block is
+# checkpointed on its own
+register_backbone(
+    "mobilenet_v2",
+    models.mobilenet_v2,
+    ["features.3", "features.6", "features.13", "features.18"],
+    _blocks(18)
+)
+register_backbone(
+    "mobilenet_v3_large",
+    models.mobilenet_v3_large,
+    ["features.3", "features.6", "features.12", "features.16"],
+    _blocks(16)
+)
+register_backbone(
+    "mobilenet_v3_small",
+    models.mobilenet_v3_small,
+    ["features.1", "features.3", "features.8", "features.12"],
+    _blocks(12)
+)
+
+def build_backbone(name: str, pretrained: bool = True) -> Backbone:
+    return Backbone(name, pretrained=pretrained)
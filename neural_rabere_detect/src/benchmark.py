@@ -0,0 +1,248 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import torch
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+from .dataset import RabereDatasetGenerator, create_data_loaders
+
+logger = logging.getLogger(__name__)
+
+SPLITS = ("train", "val", "test")
+
+def _parse_list(value: str, cast=int) -> List:
+    return [cast(v) for v in value.split(",") if v]
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    values = np.asarray(values) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean())
+    }
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+def generate_benchmark_split(
+    root: Path,
+    storage_format: str,
+    num_sequences: int,
+    frames_per_sequence: int,
+    image_size: int,
+    seed: int
+) -> Path:
+    split_root = root / storage_format
+
+    # resume only continues a run with the same parameters; the manifest is
+    # written before generating, so an interrupted run is resumed too
+    params = {
+        "storage_format": storage_format,
+        "num_sequences": num_sequences,
+        "frames_per_sequence": frames_per_sequence,
+        "image_size": image_size,
+        "seed": seed
+    }
+    manifest_path = split_root / "manifest.json"
+    if split_root.exists():
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if manifest != params:
+            logger.info(f"Regenerating {split_root}: generated with {manifest}, requested {params}")
+            shutil.rmtree(split_root)
+    split_root.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(params, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    generator = RabereDatasetGenerator(
+        str(split_root),
+        num_sequences=num_sequences,
+        frames_per_sequence=frames_per_sequence,
+        image_size=(image_size, image_size),
+        storage_format=storage_format,
+        batched=True,
+        seed=seed
+    )
+    generator.generate_dataset(num_workers=min(4, os.cpu_count() or 1), resume=True)
+
+    # create_data_loaders expects train/val/test next to annotations/
+    for split in SPLITS:
+        link = split_root / split
+        if not link.exists():
+            link.symlink_to(generator.data_path, target_is_directory=True)
+
+    return split_root
+
+def run_variant(
+    data_root: Path,
+    num_workers: int,
+    batch_size: int,
+    temporal_length: int,
+    clip_augmentation: bool,
+    max_batches: int,
+    warmup_batches: int,
+    latency_samples: int
+) -> Dict[str, object]:
+    train_loader, _, _ = create_data_loaders(
+        str(data_root),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        temporal_length=temporal_length,
+        clip_augmentation=clip_augmentation
+    )
+    dataset = train_loader.dataset
+
+    # Per-sample latency straight from the dataset, in this process
+    sample_latencies = []
+    indices = np.random.default_rng(0).choice(len(dataset), min(latency_samples, len(dataset)), replace=False)
+    for idx in indices:
+        start = time.perf_counter()
+        dataset[int(idx)]
+        sample_latencies.append(time.perf_counter() - start)
+
+    # Loader throughput, including worker startup in a separate figure
+    batch_latencies = []
+    worker_rss = []
+    num_samples = 0
+
+    start = time.perf_counter()
+    loader_iter = iter(train_loader)
+    startup = time.perf_counter() - start
+
+    measured_start = None
+    for batch_idx in range(warmup_batches + max_batches):
+        batch_start = time.perf_counter()
+        try:
+            frames, _, _ = next(loader_iter)
+        except StopIteration:
+            break
+
+        if batch_idx == warmup_batches:
+            measured_start = batch_start
+        if batch_idx >= warmup_batches:
+            batch_latencies.append(time.perf_counter() - batch_start)
+            num_samples += frames.shape[0]
+
+    elapsed = time.perf_counter() - measured_start if measured_start is not None else 0.0
+
+    for worker in getattr(loader_iter, "_workers", []):
+        worker_rss.append(_rss_mb(worker.pid))
+    del loader_iter
+
+    return {
+        "num_workers": num_workers,
+        "batch_size": batch_size,
+        "temporal_length": temporal_length,
+        "augmentation": "clip" if clip_augmentation else "frame",
+        "num_batches": len(batch_latencies),
+        "samples_per_sec": num_samples / elapsed if elapsed > 0 else 0.0,
+        "loader_startup_s": startup,
+        "batch_latency": _percentiles(batch_latencies),
+        "sample_latency": _percentiles(sample_latencies),
+        "main_rss_mb": _rss_mb(os.getpid()),
+        "worker_rss_mb": worker_rss
+    }
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, object]:
+    torch.manual_seed(args.seed)
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="rabere_bench_"))
+
+    results = []
+    for storage_format in _parse_list(args.storage, str):
+        data_root = generate_benchmark_split(
+            work_dir,
+            storage_format,
+            args.num_sequences,
+            args.frames_per_sequence,
+            args.image_size,
+            args.seed
+        )
+
+        for num_workers, batch_size, temporal_length, augmentation in itertools.product(
+            _parse_list(args.num_workers),
+            _parse_list(args.batch_sizes),
+            _parse_list(args.temporal_lengths),
+            _parse_list(args.augmentation, str)
+        ):
+            result = run_variant(
+                data_root,
+                num_workers=num_workers,
+                batch_size=batch_size,
+                temporal_length=temporal_length,
+                clip_augmentation=augmentation == "clip",
+                max_batches=args.max_batches,
+                warmup_batches=args.warmup_batches,
+                latency_samples=args.latency_samples
+            )
+            result["storage"] = storage_format
+            results.append(result)
+
+            logger.info(
+                f"{storage_format} workers={num_workers} batch={batch_size} "
+                f"T={temporal_length} aug={augmentation}: "
+                f"{result['samples_per_sec']:.1f} samples/s"
+            )
+
+    return {
+        "environment": {
+            "torch": torch.__version__,
+            "numpy": np.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads()
+        },
+        "config": vars(args),
+        "results": results
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the RabereDataset data pipeline on CPU")
+    parser.add_argument("--output", default="data_pipeline_benchmark.json")
+    parser.add_argument("--work-dir", default=None)
+    parser.add_argument("--num-sequences", type=int, default=4)
+    parser.add_argument("--frames-per-sequence", type=int, default=64)
+    parser.add_argument("--image-size", type=int, default=256)
+    parser.add_argument("--storage", default="jpeg,packed")  # Also: video
+    parser.add_argument("--num-workers", default="0,2,4")
+    parser.add_argument("--batch-sizes", default="2,8")
+    parser.add_argument("--temporal-lengths", default="8,16")
+    parser.add_argument("--augmentation", default="frame,clip")
+    parser.add_argument("--max-batches", type=int, default=20)
+    parser.add_argument("--warmup-batches", type=int, default=2)
+    parser.add_argument("--latency-samples", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = run_benchmarks(args)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote benchmark report to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import torch
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+# Default number of DataLoader workers the shared counter table has rows
+# for; row 0 is the main process, row k + 1 is DataLoader worker k.
+MAX_CACHE_WORKERS = 64
+
+_HITS, _MISSES, _EVICTIONS, _BYTES = range(4)
+
+class FrameCache:
+    def __init__(self, capacity: int, num_workers: int = MAX_CACHE_WORKERS):
+        self.capacity = capacity
+        self._frames: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._nbytes = 0
+
+        # Counters live in shared memory so the main process can read the
+        # statistics of every DataLoader worker
+        self._counters = torch.zeros(num_workers + 1, 4, dtype=torch.int64).share_memory_()
+
+    def __getstate__(self) -> Dict:
+        # Each worker starts with an empty cache but keeps the shared counters
+        state = self.__dict__.copy()
+        state["_frames"] = OrderedDict()
+        state["_nbytes"] = 0
+        return state
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def _row(self) -> torch.Tensor:
+        worker_info = torch.utils.data.get_worker_info()
+        worker_id = 0 if worker_info is None else worker_info.id + 1
+        if worker_id >= self._counters.shape[0]:
+            # Wrapping around would merge two workers' counters
+            raise RuntimeError(
+                f"FrameCache has counters for {self._counters.shape[0] - 1} DataLoader workers, "
+                f"but worker {worker_id - 1} is using it; pass num_workers"
+            )
+        return self._counters[worker_id]
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        frame = self._frames.get(key)
+        row = self._row()
+        if frame is None:
+            row[_MISSES] += 1
+            return None
+
+        self._frames.move_to_end(key)
+        row[_HITS] += 1
+        return frame
+
+    def put(self, key: Hashable, frame: np.ndarray) -> None:
+        if self.capacity <= 0:
+            return
+
+        if key in self._frames:
+            self._frames.move_to_end(key)
+            return
+
+        self._frames[key] = frame
+        self._nbytes += frame.nbytes
+        row = self._row()
+
+        while len(self._frames) > self.capacity:
+            _, evicted = self._frames.popitem(last=False)
+            self._nbytes -= evicted.nbytes
+            row[_EVICTIONS] += 1
+
+        row[_BYTES] = self._nbytes
+
+    def clear(self) -> None:
+        self._frames.clear()
+        self._nbytes = 0
+        self._row()[_BYTES] = 0
+
+    def reset_stats(self) -> None:
+        self._counters[:, :_BYTES] = 0
+
+    def stats(self) -> Dict[str, object]:
+        counters = self._counters.clone()
+        active = (counters.sum(dim=1) > 0).nonzero().flatten().tolist()
+
+        per_worker: List[Dict[str, int]] = []
+        for row_idx in active:
+            hits, misses, evictions, nbytes = counters[row_idx].tolist()
+            per_worker.append({
+                "worker": row_idx - 1,
+                "hits": hits,
+                "misses": misses,
+                "evictions": evictions,
+                "bytes": nbytes
+            })
+
+        hits, misses, evictions, nbytes = counters.sum(dim=0).tolist()
+        lookups = hits + misses
+        return {
+            "capacity": self.capacity,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "bytes": nbytes,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "per_worker": per_worker
+        }
@@ -0,0 +1,165 @@
+import torch
+from typing import Any, Dict, List, Optional, Tuple
+
+def encode_targets(
+    bboxes: torch.Tensor,
+    activities: torch.Tensor,
+    image_size: Tuple[int, int],
+    target_bbox: torch.Tensor,
+    target_obj: torch.Tensor,
+    target_activity: torch.Tensor
+) -> None:
+    # Writes the [B, 4] pixel (x1, y1, x2, y2) boxes and [B] activities of
+    # the predicted frames into the target maps in place
+    H, W = image_size
+    B = bboxes.shape[0]
+    num_levels = target_obj.shape[1]
+
+    # Box targets as normalized (cx, cy, w, h), matching the sigmoid head.
+    # They are written to every cell; compute_loss only regresses the cells
+    # where objectness is set
+    x1, y1, x2, y2 = bboxes.unbind(dim=1)
+    boxes = torch.stack([
+        (x1 + x2) / (2 * W),
+        (y1 + y2) / (2 * H),
+        (x2 - x1) / W,
+        (y2 - y1) / H
+    ], dim=1).clamp_(0, 1)
+
+    map_h, map_w = target_bbox.shape[-2:]
+    target_bbox.view(B, num_levels, 4, map_h, map_w).copy_(
+        boxes.view(B, 1, 4, 1, 1).expand(B, num_levels, 4, map_h, map_w)
+    )
+
+    # Objectness is set at the cell holding the box center on every level
+    target_obj.zero_()
+    cell_x = (boxes[:, 0] * map_w).long().clamp_(0, map_w - 1)
+    cell_y = (boxes[:, 1] * map_h).long().clamp_(0, map_h - 1)
+    target_obj[torch.arange(B), :, cell_y, cell_x] = 1.0
+
+    target_activity.copy_(activities.view(B, 1))
+
+class ClipBatchCollator:
+    # Batches RabereDataset samples as (last frames, earlier frames, targets)
+    # with targets on the model's output grid: output_stride and num_levels
+    # must match RabereActivityNet's, which rabereTrainer checks.
+    #
+    # Returned tensors are views of a ring of num_slots shared-memory slots
+    # that later batches overwrite in place. Each worker has at most
+    # prefetch_factor batches in flight, plus the batch the training loop is
+    # using and the one it just released, so a batch stays valid until the
+    # consumer fetches the next one. A consumer that keeps a batch longer,
+    # or keeps it on CPU where .to() returns the same tensor, must copy it
+    # first; rabereTrainer._to_device does
+    def __init__(
+        self,
+        batch_size: int,
+        prefetch_factor: int = 2,
+        output_stride: int = 4,
+        num_levels: int = 4
+    ):
+        self.batch_size = batch_size
+        self.output_stride = output_stride
+        self.num_levels = num_levels
+        self.num_slots = prefetch_factor + 2
+
+        self._slots: List[Optional[Dict[str, torch.Tensor]]] = [None] * self.num_slots
+        self._next_slot = 0
+
+    def __getstate__(self) -> Dict:
+        # Every worker allocates its own ring of shared-memory slots
+        state = self.__dict__.copy()
+        state["_slots"] = [None] * self.num_slots
+        state["_next_slot"] = 0
+        return state
+
+    def _allocate_slot(self, clip_shape: torch.Size) -> Dict[str, torch.Tensor]:
+        T, C, H, W = clip_shape
+        map_h, map_w = H // self.output_stride, W // self.output_stride
+        B = self.batch_size
+
+        slot = {
+            "frames": torch.empty(B, C, H, W),
+            "temporal_frames": torch.empty(B, max(T - 1, 0), C, H, W),
+            "bbox": torch.empty(B, 4 * self.num_levels, map_h, map_w),
+            "objectness": torch.empty(B, self.num_levels, map_h, map_w),
+            "activity": torch.empty(B, 1)
+        }
+
+        # Tensors in shared memory are sent to the main process by handle,
+        # so reusing them avoids a per-batch allocation and copy
+        for tensor in slot.values():
+            tensor.share_memory_()
+        return slot
+
+    def _get_slot(self, clip_shape: torch.Size) -> Dict[str, torch.Tensor]:
+        slot_idx = self._next_slot
+        self._next_slot = (self._next_slot + 1) % self.num_slots
+
+        slot = self._slots[slot_idx]
+        expected = (self.batch_size, max(clip_shape[0] - 1, 0), *clip_shape[1:])
+        if slot is None or slot["temporal_frames"].shape != expected:
+            slot = self._allocate_slot(clip_shape)
+            self._slots[slot_idx] = slot
+        return slot
+
+    def __call__(
+        self,
+        samples: List[Dict[str, torch.Tensor]]
+    ) -> Tuple[torch.Tensor, Optional[torch.Tensor], Dict[str, torch.Tensor]]:
+        clip_shape = samples[0]["frames"].shape
+        T, _, H, W = clip_shape
+        B = len(samples)
+        slot = self._get_slot(clip_shape)
+
+        frames = slot["frames"][:B]
+        temporal_frames = slot["temporal_frames"][:B]
+        for i, sample in enumerate(samples):
+            # The last frame of the window is the one being predicted
+            frames[i].copy_(sample["frames"][-1])
+            temporal_frames[i].copy_(sample["frames"][:-1])
+
+        bboxes = torch.stack([sample["bboxes"][-1] for sample in samples]).float()
+        activities = torch.stack([sample["activities"][-1] for sample in samples]).float()
+        targets = {
+            "bbox": slot["bbox"][:B],
+            "objectness": slot["objectness"][:B],
+            "activity": slot["activity"][:B]
+        }
+        encode_targets(bboxes, activities, (H, W), targets["bbox"], targets["objectness"], targets["activity"])
+
+        return frames, temporal_frames if T > 1 else None, targets
+
+class FeatureBatchCollator:
+    # Batches FeatureCacheDataset samples as (stage features, last-stage
+    # features of the earlier frames, targets); features stay fp16 until
+    # they reach the device
+    def __call__(
+        self,
+        samples: List[Dict[str, Any]]
+    ) -> Tuple[List[torch.Tensor], Optional[torch.Tensor], Dict[str, torch.Tensor]]:
+        B = len(samples)
+        num_levels = len(samples[0]["features"])
+        features = [
+            torch.stack([sample["features"][level] for sample in samples])
+            for level in range(num_levels)
+        ]
+        temporal_features = torch.stack([sample["temporal_features"] for sample in samples])
+
+        # Targets live on the finest stage's grid, like the model's outputs
+        map_h, map_w = features[0].shape[-2:]
+        targets = {
+            "bbox": torch.empty(B, 4 * num_levels, map_h, map_w),
+            "objectness": torch.empty(B, num_levels, map_h, map_w),
+            "activity": torch.empty(B, 1)
+        }
+        encode_targets(
+            torch.stack([sample["bbox"] for sample in samples]).float(),
+            torch.tensor([sample["activity"] for sample in samples]),
+            samples[0]["frame_size"],
+            targets["bbox"],
+            targets["objectness"],
+            targets["activity"]
+        )
+
+        return features, temporal_features if temporal_features.shape[1] > 0 else None, targets
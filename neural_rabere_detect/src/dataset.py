@@ -2,16 +2,30 @@ import torch
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import Dict, Tuple, List, Optional
+from typing import Dict, Tuple, List, Optional, Union
 import albumentations as A
 from albumentations.pytorch import ToTensorV2
 import json
-import random
-from torch.utils.data import Dataset, DataLoader
-from concurrent.futures import ThreadPoolExecutor
+import os
+from torch.utils.data import Dataset, DataLoader, DistributedSampler
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 import logging
 from tqdm import tqdm
 
+from .annotations import AnnotationIndex
+from .augmentation import ClipAugmentation
+from .cache import MAX_CACHE_WORKERS, FrameCache
+from .collate import ClipBatchCollator
+from .distributed import barrier, is_main_process
+from .sampler import SequenceLocalitySampler
+from .storage import create_packed_sequence, is_packed_sequence, open_packed_sequence, publish_packed_sequence
+from .synthesis import BatchedSequenceRenderer
+from .video import VideoReaderPool, is_video_sequence, video_path, write_video_sequence
+
+# Annotation boxes are absolute (x1, y1, x2, y2); geometric transforms move
+# them with the frame and clip them to it
+FRAME_BBOX_PARAMS = A.BboxParams(format="pascal_voc", clip=True)
+
 class RabereDatasetGenerator:
     def __init__(
         self,
@@ -19,13 +33,22 @@ class RabereDatasetGenerator:
         num_sequences: int = 1000,
         frames_per_sequence: int = 300,
         image_size: Tuple[int, int] = (640, 640),
-        fps: int = 30
+        fps: int = 30,
+        storage_format: str = "jpeg",
+        batched: bool = False,
+        seed: Optional[int] = None
     ):
+        if storage_format not in ("jpeg", "packed", "video"):
+            raise ValueError(f"Unknown storage format: {storage_format}")
+
         self.base_path = Path(base_path)
         self.num_sequences = num_sequences
         self.frames_per_sequence = frames_per_sequence
         self.image_size = image_size
         self.fps = fps
+        self.storage_format = storage_format
+        self.batched = batched
+        self.seed = seed
         
         # Create directories
         self.data_path = self.base_path / "data"
@@ -46,6 +69,9 @@ class RabereDatasetGenerator:
             "min_activity": 0.0,
             "max_activity": 1.0
         }
+        
+        # Vectorized trajectory + sprite renderer used in batched mode
+        self.renderer = BatchedSequenceRenderer(self.image_size, self.movement_params)
 
     def generate_Rabere_sequence(
         self,
@@ -54,23 +80,27 @@ class RabereDatasetGenerator:
         frames = []
         annotations = []
         
+        # Each sequence draws from its own generator, so thread workers never
+        # share RNG state and a seeded run is reproducible in any mode
+        rng = np.random.default_rng(self._sequence_seed(sequence_id))
+        
         # Initial Rabere position and parameters
-        x = random.randint(50, self.image_size[0] - 50)
-        y = random.randint(50, self.image_size[1] - 50)
-        direction = random.uniform(0, 2 * np.pi)
-        speed = random.uniform(0, self.movement_params["max_speed"])
-        activity_level = random.uniform(0.3, 0.7)
+        x = rng.integers(50, self.image_size[0] - 50, endpoint=True)
+        y = rng.integers(50, self.image_size[1] - 50, endpoint=True)
+        direction = rng.uniform(0, 2 * np.pi)
+        speed = rng.uniform(0, self.movement_params["max_speed"])
+        activity_level = rng.uniform(0.3, 0.7)
         
         for frame_idx in range(self.frames_per_sequence):
             # Create frame
             frame = np.zeros((*self.image_size, 3), dtype=np.uint8)
             
             # Update Rabere position
-            if random.random() < self.movement_params["direction_change_prob"]:
-                direction += random.uniform(-np.pi/4, np.pi/4)
+            if rng.random() < self.movement_params["direction_change_prob"]:
+                direction += rng.uniform(-np.pi/4, np.pi/4)
             
-            if random.random() < self.movement_params["activity_change_prob"]:
-                activity_level += random.uniform(-0.1, 0.1)
+            if rng.random() < self.movement_params["activity_change_prob"]:
+                activity_level += rng.uniform(-0.1, 0.1)
                 activity_level = np.clip(activity_level,
                                        self.movement_params["min_activity"],
                                        self.movement_params["max_activity"])
@@ -98,7 +128,7 @@ class RabereDatasetGenerator:
             cv2.circle(frame, (int(x), int(y)), Rabere_size//2, Rabere_color, -1)
             
             # Add noise and texture
-            noise = np.random.normal(0, 10, frame.shape).astype(np.uint8)
+            noise = rng.normal(0, 10, frame.shape).astype(np.uint8)
             frame = cv2.add(frame, noise)
             
             # Add random lighting variations
@@ -129,69 +159,212 @@ class RabereDatasetGenerator:
         
         return frames, annotations
 
-    def generate_dataset(self) -> None:
-        self.logger.info(f"Generating {self.num_sequences} sequences...")
+    def generate_Rabere_sequence_batched(
+        self,
+        sequence_id: int,
+        out: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, List[Dict]]:
+        rng = np.random.default_rng(self._sequence_seed(sequence_id))
+        return self.renderer.render(rng, self.frames_per_sequence, out=out)
+
+    def _sequence_seed(self, sequence_id: int) -> Optional[np.random.SeedSequence]:
+        if self.seed is None:
+            return None
+        return np.random.SeedSequence([self.seed, sequence_id])
+
+    def _generate_sequence(self, sequence_id: int) -> Tuple[List[np.ndarray], List[Dict]]:
+        if self.batched:
+            return self.generate_Rabere_sequence_batched(sequence_id)
+        return self.generate_Rabere_sequence(sequence_id)
+
+    def generate_dataset(
+        self,
+        num_workers: int = 8,
+        use_processes: bool = False,
+        max_in_flight: Optional[int] = None,
+        resume: bool = False
+    ) -> None:
+        pending_ids = [
+            seq_id for seq_id in range(self.num_sequences)
+            if not (resume and self._sequence_exists(seq_id))
+        ]
+        skipped = self.num_sequences - len(pending_ids)
+        if skipped:
+            self.logger.info(f"Resuming: {skipped} sequences already on disk")
         
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            futures = []
-            for seq_id in range(self.num_sequences):
-                futures.append(executor.submit(self.generate_Rabere_sequence, seq_id))
-            
-            for seq_id, future in enumerate(tqdm(futures)):
-                frames, annotations = future.result()
-                
-                # Save frames
-                seq_path = self.data_path / f"sequence_{seq_id:04d}"
-                seq_path.mkdir(exist_ok=True)
+        self.logger.info(f"Generating {len(pending_ids)} sequences...")
+        
+        # Workers generate and write whole sequences and only return their id,
+        # so at most max_in_flight sequences are ever held in memory
+        max_in_flight = max_in_flight or 2 * num_workers
+        executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        
+        with executor_cls(max_workers=num_workers) as executor, \
+                tqdm(total=self.num_sequences, initial=skipped) as pbar:
+            in_flight = set()
+            for seq_id in pending_ids:
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                        pbar.update(1)
                 
+                in_flight.add(executor.submit(self._generate_and_write, seq_id))
+            
+            for future in as_completed(in_flight):
+                future.result()
+                pbar.update(1)
+        
+        self.logger.info("Dataset generation completed!")
+
+    def _sequence_exists(self, seq_id: int) -> bool:
+        # Annotations are written last, so they mark a complete sequence
+        ann_path = self.annotation_path / f"sequence_{seq_id:04d}.json"
+        seq_path = self.data_path / f"sequence_{seq_id:04d}"
+        return ann_path.is_file() and seq_path.is_dir()
+
+    def _generate_and_write(self, seq_id: int) -> int:
+        seq_path = self.data_path / f"sequence_{seq_id:04d}"
+        seq_path.mkdir(exist_ok=True)
+        
+        if self.batched and self.storage_format == "packed":
+            # Render straight into the memory-mapped sequence file
+            packed = create_packed_sequence(seq_path, self.frames_per_sequence, self.image_size)
+            _, annotations = self.generate_Rabere_sequence_batched(seq_id, out=packed)
+            publish_packed_sequence(seq_path, packed)
+            del packed
+        else:
+            frames, annotations = self._generate_sequence(seq_id)
+            
+            if self.storage_format == "packed":
+                self._write_packed_frames(seq_path, frames)
+            elif self.storage_format == "video":
+                write_video_sequence(seq_path, frames, self.fps)
+            else:
                 for frame_idx, frame in enumerate(frames):
                     frame_path = seq_path / f"frame_{frame_idx:04d}.jpg"
                     cv2.imwrite(str(frame_path), frame)
-                
-                # Save annotations
-                ann_path = self.annotation_path / f"sequence_{seq_id:04d}.json"
-                with open(ann_path, 'w') as f:
-                    json.dump({
-                        "sequence_id": seq_id,
-                        "frames": annotations
-                    }, f, indent=2)
+            del frames
         
-        self.logger.info("Dataset generation completed!")
+        # Save annotations atomically so an interrupted run can be resumed
+        ann_path = self.annotation_path / f"sequence_{seq_id:04d}.json"
+        tmp_path = ann_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "sequence_id": seq_id,
+                "frames": annotations
+            }, f, indent=2)
+        os.replace(tmp_path, ann_path)
+        
+        return seq_id
+
+    def _write_packed_frames(self, seq_path: Path, frames: List[np.ndarray]) -> None:
+        packed = create_packed_sequence(seq_path, len(frames), frames[0].shape[:2])
+        for frame_idx, frame in enumerate(frames):
+            # Packed frames are stored RGB so the dataset can slice them directly
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=packed[frame_idx])
+        publish_packed_sequence(seq_path, packed)
 
 class RabereDataset(Dataset):
     def __init__(
         self,
         data_path: str,
         temporal_length: int = 16,
-        transform: Optional[A.Compose] = None,
-        split: str = "train"
+        transform: Optional[Union[A.Compose, ClipAugmentation]] = None,
+        split: str = "train",
+        cache_size: int = 0,
+        cache_workers: int = MAX_CACHE_WORKERS,
+        window_stride: int = 1,
+        frame_dilation: int = 1,
+        random_window_offset: bool = False,
+        seed: int = 0
     ):
+        if window_stride < 1 or frame_dilation < 1:
+            raise ValueError("window_stride and frame_dilation must be positive")
+        
         self.data_path = Path(data_path)
         self.temporal_length = temporal_length
+        self.window_stride = window_stride
+        self.frame_dilation = frame_dilation
+        self.random_window_offset = random_window_offset
+        self.seed = seed
         self.transform = transform or self._get_default_transform()
         self.split = split
         
         # Load all sequences
-        self.sequences = []
-        self.sequence_lengths = []
-        
-        for seq_path in sorted(self.data_path.glob("sequence_*")):
-            ann_path = self.data_path.parent / "annotations" / f"{seq_path.name}.json"
-            
-            with open(ann_path, 'r') as f:
-                annotation = json.load(f)
-            
-            self.sequences.append({
+        self.sequences = [
+            {
                 "path": seq_path,
-                "annotation": annotation
-            })
-            self.sequence_lengths.append(len(annotation["frames"]))
-            
+                "format": self._detect_format(seq_path)
+            }
+            for seq_path in sorted(self.data_path.glob("sequence_*"))
+        ]
+        
+        # Columnar annotations, built once per split and memory-mapped. Under
+        # DDP rank 0 builds the index, the other ranks open it once it is in place
+        annotation_path = self.data_path.parent / "annotations"
+        index_path = annotation_path / f"index_{self.data_path.name}"
+        if is_main_process():
+            self.annotations = AnnotationIndex.open_or_build(
+                annotation_path,
+                [sequence["path"].name for sequence in self.sequences],
+                index_path
+            )
+        barrier()
+        if not is_main_process():
+            self.annotations = AnnotationIndex(index_path)
+        self.sequence_lengths = self.annotations.lengths
+        
+        # Frames covered by one window, including the dilation gaps
+        self.window_span = (temporal_length - 1) * frame_dilation + 1
+        
         # Create frame indices for temporal sampling
-        self.frame_indices = []
-        for seq_idx, length in enumerate(self.sequence_lengths):
-            for i in range(0, length - temporal_length + 1):
-                self.frame_indices.append((seq_idx, i))
+        self.frame_indices = self._build_frame_indices(epoch=0)
+                
+        # Memory-mapped packed sequences, opened lazily in each worker
+        self._packed_frames: Dict[int, np.ndarray] = {}
+        
+        # Open video containers, bounded per worker
+        self.video_readers = VideoReaderPool()
+        
+        # Decoded JPEG frames shared between overlapping windows, per worker
+        self.frame_cache = FrameCache(cache_size, cache_workers) if cache_size > 0 else None
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state["_packed_frames"] = {}
+        return state
+
+    @staticmethod
+    def _detect_format(seq_path: Path) -> str:
+        if is_packed_sequence(seq_path):
+            return "packed"
+        if is_video_sequence(seq_path):
+            return "video"
+        return "jpeg"
+
+    def _build_frame_indices(self, epoch: int) -> np.ndarray:
+        # Window starts per sequence as one [N, 2] array of (sequence, start)
+        slack = np.maximum(self.sequence_lengths - self.window_span, -1)
+        num_windows = np.where(slack >= 0, slack // self.window_stride + 1, 0)
+        
+        offsets = np.zeros(len(self.sequences), dtype=np.int64)
+        if self.random_window_offset and self.window_stride > 1:
+            # Shift each sequence's window grid by a random offset that keeps
+            # the window count, so the epoch length stays constant
+            rng = np.random.default_rng([self.seed, epoch])
+            max_offset = np.minimum(slack - (num_windows - 1) * self.window_stride, self.window_stride - 1)
+            offsets = (rng.random(len(self.sequences)) * (np.maximum(max_offset, 0) + 1)).astype(np.int64)
+        
+        seq_ids = np.repeat(np.arange(len(self.sequences)), num_windows)
+        window_offsets = np.cumsum(num_windows) - num_windows
+        window_numbers = np.arange(len(seq_ids)) - np.repeat(window_offsets, num_windows)
+        starts = window_numbers * self.window_stride + offsets[seq_ids]
+        return np.stack([seq_ids, starts], axis=1).astype(np.int64)
+
+    def set_epoch(self, epoch: int) -> None:
+        if self.random_window_offset:
+            self.frame_indices = self._build_frame_indices(epoch)
 
     def _get_default_transform(self) -> A.Compose:
         return A.Compose([
@@ -205,30 +378,90 @@ class RabereDataset(Dataset):
                 std=[0.229, 0.224, 0.225]
             ),
             ToTensorV2()
-        ])
+        ], bbox_params=FRAME_BBOX_PARAMS)
+
+    def _load_clip(self, seq_idx: int, start_idx: int) -> List[np.ndarray]:
+        return self.load_frames(seq_idx, start_idx, start_idx + self.window_span, self.frame_dilation)
+
+    def load_frames(self, seq_idx: int, start_idx: int, end_idx: int, step: int = 1) -> List[np.ndarray]:
+        # Untransformed RGB frames start_idx:end_idx:step of one sequence
+        sequence = self.sequences[seq_idx]
+        
+        if sequence["format"] == "packed":
+            # Zero-copy (strided) slice of the memory-mapped [N, H, W, 3] array
+            return self._get_packed_frames(seq_idx)[start_idx:end_idx:step]
+        
+        if sequence["format"] == "video":
+            # Decoded forward from the nearest keyframe in one pass
+            return self.video_readers.read(
+                video_path(sequence["path"]),
+                list(range(start_idx, end_idx, step))
+            )
+        
+        return [
+            self._load_frame(seq_idx, i)
+            for i in range(start_idx, end_idx, step)
+        ]
+
+    def _load_frame(self, seq_idx: int, frame_idx: int) -> np.ndarray:
+        if self.frame_cache is not None:
+            frame = self.frame_cache.get((seq_idx, frame_idx))
+            if frame is not None:
+                return frame
+        
+        frame_path = self.sequences[seq_idx]["path"] / f"frame_{frame_idx:04d}.jpg"
+        frame = cv2.imread(str(frame_path))
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        
+        if self.frame_cache is not None:
+            # Cached frames are shared between windows and must stay untouched
+            frame.setflags(write=False)
+            self.frame_cache.put((seq_idx, frame_idx), frame)
+        return frame
+
+    def cache_stats(self) -> Optional[Dict[str, object]]:
+        if self.frame_cache is None:
+            return None
+        return self.frame_cache.stats()
+
+    def _get_packed_frames(self, seq_idx: int) -> np.ndarray:
+        if seq_idx not in self._packed_frames:
+            self._packed_frames[seq_idx] = open_packed_sequence(self.sequences[seq_idx]["path"])
+        return self._packed_frames[seq_idx]
 
     def __len__(self) -> int:
         return len(self.frame_indices)
 
     def __getitem__(self, idx: int) -> Dict[str, torch.Tensor]:
-        seq_idx, start_idx = self.frame_indices[idx]
-        sequence = self.sequences[seq_idx]
+        seq_idx, start_idx = (int(v) for v in self.frame_indices[idx])
         
         # Load temporal frames
         frames = []
         bboxes = []
         activities = []
         
-        for i in range(start_idx, start_idx + self.temporal_length):
-            # Load frame
-            frame_path = sequence["path"] / f"frame_{i:04d}.jpg"
-            frame = cv2.imread(str(frame_path))
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        clip = self._load_clip(seq_idx, start_idx)
+        rows = self.annotations.rows(seq_idx, start_idx, start_idx + self.window_span, self.frame_dilation)
+        clip_bboxes = self.annotations.column("bbox")[rows]
+        clip_activities = self.annotations.column("activity_level")[rows]
+        
+        if isinstance(self.transform, ClipAugmentation):
+            # Whole-clip vectorized augmentation with one set of parameters
+            frames, bboxes = self.transform(clip, clip_bboxes)
+            return {
+                "frames": frames,
+                "bboxes": bboxes,
+                "activities": torch.from_numpy(np.array(clip_activities)),
+                "sequence_id": seq_idx,
+                "start_frame": start_idx
+            }
+        
+        for i in range(self.temporal_length):
+            frame = clip[i]
             
             # Get annotation
-            ann = sequence["annotation"]["frames"][i]
-            bbox = np.array(ann["bbox"])
-            activity = ann["activity_level"]
+            bbox = clip_bboxes[i]
+            activity = float(clip_activities[i])
             
             if self.transform:
                 transformed = self.transform(image=frame, bboxes=[bbox])
@@ -247,13 +480,7 @@ class RabereDataset(Dataset):
             "start_frame": start_idx
         }
 
-def create_data_loaders(
-    data_path: str,
-    batch_size: int,
-    num_workers: int,
-    temporal_length: int = 16
-) -> Tuple[DataLoader, DataLoader, DataLoader]:
-    # Create transforms
+def _create_frame_transforms() -> Tuple[A.Compose, A.Compose]:
     train_transform = A.Compose([
         A.RandomBrightnessContrast(p=0.5),
         A.GaussNoise(p=0.5),
@@ -265,7 +492,7 @@ def create_data_loaders(
             std=[0.229, 0.224, 0.225]
         ),
         ToTensorV2()
-    ])
+    ], bbox_params=FRAME_BBOX_PARAMS)
     
     val_transform = A.Compose([
         A.Normalize(
@@ -273,53 +500,119 @@ def create_data_loaders(
             std=[0.229, 0.224, 0.225]
         ),
         ToTensorV2()
-    ])
+    ], bbox_params=FRAME_BBOX_PARAMS)
+    
+    return train_transform, val_transform
+
+def create_data_loaders(
+    data_path: str,
+    batch_size: int,
+    num_workers: int,
+    temporal_length: int = 16,
+    cache_size: int = 0,
+    sequence_locality: bool = False,
+    clip_augmentation: bool = False,
+    window_stride: int = 1,
+    frame_dilation: int = 1,
+    random_window_offset: bool = False,
+    prefetch_factor: int = 2,
+    output_stride: int = 4,
+    num_levels: int = 4,
+    distributed: bool = False
+) -> Tuple[DataLoader, DataLoader, DataLoader]:
+    # Create transforms
+    if clip_augmentation:
+        train_transform = ClipAugmentation(train=True)
+        val_transform = ClipAugmentation(train=False)
+    else:
+        train_transform, val_transform = _create_frame_transforms()
     
     # Create datasets
     train_dataset = RabereDataset(
         data_path=data_path + "/train",
         temporal_length=temporal_length,
         transform=train_transform,
-        split="train"
+        split="train",
+        cache_size=cache_size,
+        cache_workers=num_workers,
+        window_stride=window_stride,
+        frame_dilation=frame_dilation,
+        random_window_offset=random_window_offset
     )
     
     val_dataset = RabereDataset(
         data_path=data_path + "/val",
         temporal_length=temporal_length,
         transform=val_transform,
-        split="val"
+        split="val",
+        cache_size=cache_size,
+        cache_workers=num_workers,
+        window_stride=window_stride,
+        frame_dilation=frame_dilation
     )
     
     test_dataset = RabereDataset(
         data_path=data_path + "/test",
         temporal_length=temporal_length,
         transform=val_transform,
-        split="test"
+        split="test",
+        cache_size=cache_size,
+        cache_workers=num_workers,
+        window_stride=window_stride,
+        frame_dilation=frame_dilation
     )
     
+    # Keep windows of the same sequence on one worker so its frame cache hits
+    train_sampler = None
+    val_sampler = None
+    test_sampler = None
+    if distributed:
+        if sequence_locality:
+            raise ValueError("sequence_locality is not supported with distributed training")
+        # Each rank sees a disjoint, equally sized shard; the rank and world
+        # size come from the initialized process group
+        train_sampler = DistributedSampler(train_dataset, shuffle=True)
+        val_sampler = DistributedSampler(val_dataset, shuffle=False)
+        test_sampler = DistributedSampler(test_dataset, shuffle=False)
+    elif sequence_locality:
+        train_sampler = SequenceLocalitySampler(
+            train_dataset.frame_indices,
+            batch_size=batch_size,
+            num_workers=num_workers
+        )
+    
+    # Batches are written into reusable shared-memory slots as
+    # (frames, temporal_frames, targets) for the trainer
+    loader_kwargs = {"num_workers": num_workers, "pin_memory": True}
+    if num_workers > 0:
+        loader_kwargs["prefetch_factor"] = prefetch_factor
+    
     # Create data loaders
     train_loader = DataLoader(
         train_dataset,
         batch_size=batch_size,
-        shuffle=True,
-        num_workers=num_workers,
-        pin_memory=True
+        shuffle=train_sampler is None,
+        sampler=train_sampler,
+        collate_fn=ClipBatchCollator(batch_size, prefetch_factor, output_stride, num_levels),
+        **loader_kwargs
     )
     
     val_loader = DataLoader(
         val_dataset,
         batch_size=batch_size,
         shuffle=False,
-        num_workers=num_workers,
-        pin_memory=True
+        sampler=val_sampler,
+        collate_fn=ClipBatchCollator(batch_size, prefetch_factor, output_stride, num_levels),
+        **loader_kwargs
     )
     
     test_loader = DataLoader(
         test_dataset,
         batch_size=batch_size,
         shuffle=False,
-        num_workers=num_workers,
-        pin_memory=True
+        sampler=test_sampler,
+        collate_fn=ClipBatchCollator(batch_size, prefetch_factor, output_stride, num_levels),
+        **loader_kwargs
     )
     
     return train_loader, val_loader, test_loader 
\ No newline at end of file
@@ -0,0 +1,43 @@
+import os
+import torch
+import torch.distributed as dist
+from typing import Dict
+
+def is_distributed() -> bool:
+    return dist.is_available() and dist.is_initialized()
+
+def get_rank() -> int:
+    return dist.get_rank() if is_distributed() else 0
+
+def get_world_size() -> int:
+    return dist.get_world_size() if is_distributed() else 1
+
+def is_main_process() -> bool:
+    return get_rank() == 0
+
+def init_distributed(backend: str = "gloo") -> int:
+    # Reads RANK, WORLD_SIZE, MASTER_ADDR and MASTER_PORT as set by torchrun
+    # or by the spawn launcher in train.py; returns the local rank
+    dist.init_process_group(backend=backend, init_method="env://")
+    return int(os.environ.get("LOCAL_RANK", 0))
+
+def cleanup_distributed() -> None:
+    if is_distributed():
+        dist.destroy_process_group()
+
+def barrier() -> None:
+    if is_distributed():
+        dist.barrier()
+
+def all_reduce_mean(metrics: Dict[str, float]) -> Dict[str, float]:
+    # Mean of each per-rank average; ranks see equally many batches because
+    # DistributedSampler pads the shards
+    if not is_distributed():
+        return metrics
+
+    keys = sorted(metrics)
+    device = "cuda" if dist.get_backend() == "nccl" else "cpu"
+    values = torch.tensor([metrics[key] for key in keys], dtype=torch.float64, device=device)
+    dist.all_reduce(values, op=dist.ReduceOp.SUM)
+    values /= get_world_size()
+    return dict(zip(keys, values.tolist()))
@@ -0,0 +1,289 @@
+import argparse
+import copy
+import torch
+import torch.nn as nn
+import numpy as np
+from pathlib import Path
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+from torch.onnx import symbolic_helper
+from typing import Dict, List, Optional, Tuple
+import logging
+
+try:
+    import onnxruntime as ort
+except ImportError:  # Only needed to run exported graphs
+    ort = None
+
+from .model import RabereActivityNet
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_NAMES = ["bbox", "objectness", "activity"]
+
+# ONNX has DeformConv from opset 19 on, which the detection heads need
+DEFAULT_OPSET = 19
+
+_CONV_TYPES = (nn.Conv1d, nn.Conv2d, nn.Conv3d)
+_BN_TYPES = (nn.BatchNorm1d, nn.BatchNorm2d, nn.BatchNorm3d)
+
+@symbolic_helper.parse_args("v", "v", "v", "v", "v", "i", "i", "i", "i", "i", "i", "i", "i", "b")
+def _deform_conv2d_symbolic(
+    g, input, weight, offset, mask, bias,
+    stride_h, stride_w, pad_h, pad_w, dilation_h, dilation_w,
+    groups, offset_groups, use_mask
+):
+    # torchvision registers no ONNX symbolic for its deformable convolution;
+    # DeformConv takes the same (dy, dx) offset layout
+    inputs = [input, weight, offset, bias] + ([mask] if use_mask else [])
+    return g.op(
+        "DeformConv",
+        *inputs,
+        strides_i=[stride_h, stride_w],
+        pads_i=[pad_h, pad_w, pad_h, pad_w],
+        dilations_i=[dilation_h, dilation_w],
+        group_i=groups,
+        offset_group_i=offset_groups
+    )
+
+torch.onnx.register_custom_op_symbolic("torchvision::deform_conv2d", _deform_conv2d_symbolic, DEFAULT_OPSET)
+
+def fold_conv_bn(model: nn.Module) -> nn.Module:
+    # Returns an eval-mode copy with every Conv -> BatchNorm pair folded into
+    # the convolution and the BatchNorm replaced by Identity
+    model = copy.deepcopy(model).eval()
+    folded = 0
+
+    for module in model.modules():
+        children = list(module.named_children())
+
+        if isinstance(module, nn.Sequential):
+            # Sequential containers apply adjacent children back to back
+            pairs = [
+                (conv_name, bn_name)
+                for (conv_name, conv), (bn_name, bn) in zip(children, children[1:])
+                if isinstance(conv, _CONV_TYPES) and isinstance(bn, _BN_TYPES)
+            ]
+        else:
+            # torchvision residual blocks and stems name their pairs convN/bnN
+            names = dict(children)
+            pairs = [
+                (name, "bn" + name[len("conv"):])
+                for name, child in children
+                if name.startswith("conv") and isinstance(child, _CONV_TYPES)
+                and isinstance(names.get("bn" + name[len("conv"):]), _BN_TYPES)
+            ]
+
+        for conv_name, bn_name in pairs:
+            conv, bn = getattr(module, conv_name), getattr(module, bn_name)
+            setattr(module, conv_name, fuse_conv_bn_eval(conv, bn))
+            setattr(module, bn_name, nn.Identity())
+            folded += 1
+
+    logger.info(f"Folded {folded} Conv+BatchNorm pairs")
+    return model
+
+class SingleFrameModel(nn.Module):
+    def __init__(self, model: RabereActivityNet):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        outputs = self.model(x)
+        return outputs["bbox"], outputs["objectness"], outputs["activity"]
+
+class TemporalModel(nn.Module):
+    def __init__(self, model: RabereActivityNet):
+        super().__init__()
+        self.model = model
+
+    def forward(
+        self,
+        x: torch.Tensor,
+        temporal_features: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        # temporal_features are cached backbone features [B, T-1, C, h, w]
+        outputs = self.model(x, temporal_features, temporal_is_features=True)
+        return outputs["bbox"], outputs["objectness"], outputs["activity"]
+
+def example_inputs(
+    model: RabereActivityNet,
+    image_size: Tuple[int, int],
+    batch_size: int = 2
+) -> Dict[str, Tuple[torch.Tensor, ...]]:
+    x = torch.randn(batch_size, 3, *image_size)
+    with torch.no_grad():
+        last_features = model.extract_features(x)[-1]
+    history = max(model.temporal_length - 1, 1)
+    temporal_features = last_features.unsqueeze(1).repeat(1, history, 1, 1, 1)
+    return {
+        "single": (x,),
+        "temporal": (x, temporal_features)
+    }
+
+def export_torchscript(module: nn.Module, inputs: Tuple[torch.Tensor, ...], path: Path) -> torch.jit.ScriptModule:
+    with torch.no_grad():
+        traced = torch.jit.trace(module, inputs)
+        traced = torch.jit.freeze(traced)
+    traced.save(str(path))
+    return traced
+
+def export_onnx(
+    module: nn.Module,
+    inputs: Tuple[torch.Tensor, ...],
+    path: Path,
+    opset: int = DEFAULT_OPSET
+) -> None:
+    input_names = ["frames", "temporal_features"][:len(inputs)]
+    dynamic_axes = {name: {0: "batch"} for name in input_names + OUTPUT_NAMES}
+
+    # The fused eval-mode attention kernel has no ONNX symbolic; the
+    # unfused path exports as plain MatMul/Softmax
+    fastpath = torch.backends.mha.get_fastpath_enabled()
+    torch.backends.mha.set_fastpath_enabled(False)
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                module,
+                inputs,
+                str(path),
+                input_names=input_names,
+                output_names=OUTPUT_NAMES,
+                dynamic_axes=dynamic_axes,
+                opset_version=opset,
+                do_constant_folding=True,
+                # The TorchScript-based exporter, which applies the custom
+                # symbolic above
+                dynamo=False
+            )
+    finally:
+        torch.backends.mha.set_fastpath_enabled(fastpath)
+
+class OnnxRuntimeModel:
+    def __init__(
+        self,
+        path: str,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0
+    ):
+        if ort is None:
+            raise ImportError("onnxruntime is required to run exported ONNX models")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def __call__(
+        self,
+        x: torch.Tensor,
+        temporal_features: Optional[torch.Tensor] = None
+    ) -> Dict[str, torch.Tensor]:
+        feeds = {"frames": x.detach().cpu().numpy()}
+        if "temporal_features" in self.input_names:
+            if temporal_features is None:
+                raise ValueError("This graph was exported for the temporal path")
+            feeds["temporal_features"] = temporal_features.detach().cpu().numpy()
+
+        outputs = self.session.run(OUTPUT_NAMES, feeds)
+        return {name: torch.from_numpy(value) for name, value in zip(OUTPUT_NAMES, outputs)}
+
+def check_parity(
+    reference: nn.Module,
+    candidate,
+    inputs: Tuple[torch.Tensor, ...],
+    atol: float = 1e-3,
+    rtol: float = 1e-3
+) -> Dict[str, float]:
+    with torch.no_grad():
+        expected = reference(*inputs)
+        actual = candidate(*inputs)
+
+    if isinstance(actual, dict):
+        actual = tuple(actual[name] for name in OUTPUT_NAMES)
+
+    max_errors = {}
+    for name, exp, act in zip(OUTPUT_NAMES, expected, actual):
+        max_errors[name] = float((exp - act).abs().max())
+        if not np.allclose(act.numpy(), exp.numpy(), atol=atol, rtol=rtol):
+            raise AssertionError(f"Exported output {name} deviates from eager (max abs error {max_errors[name]:.2e})")
+    return max_errors
+
+def export_model(
+    model: RabereActivityNet,
+    output_dir: str,
+    image_size: Tuple[int, int] = (640, 640),
+    opset: int = DEFAULT_OPSET,
+    verify: bool = True
+) -> List[Path]:
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    model = model.eval()
+    folded = fold_conv_bn(model)
+    inputs = example_inputs(folded, image_size)
+
+    written = []
+    for path_name, wrapper_cls in (("single", SingleFrameModel), ("temporal", TemporalModel)):
+        eager = wrapper_cls(model).eval()
+        wrapper = wrapper_cls(folded).eval()
+
+        ts_path = output_dir / f"rabere_{path_name}.pt"
+        traced = export_torchscript(wrapper, inputs[path_name], ts_path)
+
+        onnx_path = output_dir / f"rabere_{path_name}.onnx"
+        export_onnx(wrapper, inputs[path_name], onnx_path, opset=opset)
+        written.extend([ts_path, onnx_path])
+
+        if verify:
+            # Folded, traced and ONNX Runtime outputs must all match eager
+            errors = {
+                "folded": check_parity(eager, wrapper, inputs[path_name]),
+                "torchscript": check_parity(eager, traced, inputs[path_name])
+            }
+            if ort is not None:
+                errors["onnxruntime"] = check_parity(eager, OnnxRuntimeModel(str(onnx_path)), inputs[path_name])
+            logger.info(f"{path_name} parity (max abs error): {errors}")
+
+    return written
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export RabereActivityNet to TorchScript and ONNX")
+    parser.add_argument("--checkpoint", required=True)
+    parser.add_argument("--output-dir", default="models/export")
+    parser.add_argument("--backbone", default="resnext101_32x8d")
+    parser.add_argument("--temporal-length", type=int, default=16)
+    parser.add_argument("--temporal-tokens", default="pool", choices=["pool", "grid"])
+    parser.add_argument("--temporal-grid-size", type=int, default=2)
+    parser.add_argument("--image-size", type=int, nargs=2, default=[640, 640])
+    parser.add_argument("--opset", type=int, default=DEFAULT_OPSET)
+    parser.add_argument("--no-verify", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    model = RabereActivityNet(
+        backbone=args.backbone,
+        pretrained=False,
+        temporal_length=args.temporal_length,
+        temporal_tokens=args.temporal_tokens,
+        temporal_grid_size=args.temporal_grid_size
+    )
+    state = torch.load(args.checkpoint, map_location="cpu")
+    model.load_state_dict(state.get("model_state_dict", state))
+
+    for path in export_model(
+        model,
+        args.output_dir,
+        image_size=tuple(args.image_size),
+        opset=args.opset,
+        verify=not args.no_verify
+    ):
+        logger.info(f"Wrote {path}")
+
+if __name__ == "__main__":
+    main()
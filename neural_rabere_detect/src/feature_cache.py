@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import torch
+import torch.nn as nn
+import albumentations as A
+from pathlib import Path
+from torch.utils.data import Dataset, DataLoader, DistributedSampler
+from typing import Any, Dict, List, Tuple
+import logging
+from tqdm import tqdm
+
+from .collate import FeatureBatchCollator
+from .dataset import RabereDataset, _create_frame_transforms
+from .distributed import barrier, is_main_process
+from .utils import publish_directory
+
+# One fp16 [N, C, h, w] array per backbone stage (strides 4, 8, 16, 32),
+# rows aligned with the annotation index of the split
+STAGE_NAMES = ["layer1", "layer2", "layer3", "layer4"]
+
+FEATURE_CACHE_VERSION = 1
+
+# Largest finite float16; features are clamped so none round to inf
+FP16_MAX = 65504.0
+
+logger = logging.getLogger(__name__)
+
+def backbone_hash(backbone: nn.Module) -> str:
+    # Content hash of the weights and buffers, so BN statistics count too
+    digest = hashlib.sha256()
+    for name, tensor in sorted(backbone.state_dict().items()):
+        tensor = tensor.detach().cpu().contiguous()
+        digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode())
+        digest.update(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()
+
+def preprocessing_config(dataset: RabereDataset, transform: A.Compose) -> Dict[str, Any]:
+    # Everything besides the backbone that decides the stored features;
+    # round-tripped through JSON so it compares equal to the stored copy
+    return json.loads(json.dumps({
+        "transform": A.to_dict(transform),
+        "data_path": str(dataset.data_path.resolve()),
+        "sequences": [sequence["path"].name for sequence in dataset.sequences],
+        "lengths": dataset.sequence_lengths.tolist(),
+        "source_mtime_ns": dataset.annotations.meta["source_mtime_ns"]
+    }))
+
+class FeatureStore:
+    def __init__(self, store_path: Path):
+        # Pinned to the version current at open time, like AnnotationIndex
+        self.store_path = Path(store_path).resolve()
+
+        with open(self.store_path / "meta.json", 'r') as f:
+            self.meta = json.load(f)
+
+        self.frame_size: Tuple[int, int] = tuple(self.meta["frame_size"])
+        self.offsets = np.load(self.store_path / "offsets.npy")
+
+        # Stages are memory-mapped lazily so every worker shares the page cache
+        self._stages: Dict[int, np.ndarray] = {}
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state["_stages"] = {}
+        return state
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def stage(self, idx: int) -> np.ndarray:
+        if idx not in self._stages:
+            self._stages[idx] = np.load(self.store_path / f"{STAGE_NAMES[idx]}.npy", mmap_mode="r")
+        return self._stages[idx]
+
+    def rows(self, seq_idx: int, start: int, stop: int, step: int = 1) -> slice:
+        offset = int(self.offsets[seq_idx])
+        return slice(offset + start, offset + stop, step)
+
+    @classmethod
+    @torch.no_grad()
+    def build(
+        cls,
+        dataset: RabereDataset,
+        backbone: nn.Module,
+        store_path: Path,
+        transform: A.Compose,
+        device: torch.device,
+        batch_size: int = 32
+    ) -> "FeatureStore":
+        store_path = Path(store_path)
+        offsets = dataset.annotations.offsets
+
+        # Write into a temporary directory and publish it in one atomic swap,
+        # so concurrent readers never see a half-written or missing store
+        tmp_path = store_path.with_name(store_path.name + f".tmp{os.getpid()}")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        was_training = backbone.training
+        backbone.eval()
+
+        stages = None
+        frame_size = None
+        for seq_idx, length in enumerate(tqdm(dataset.sequence_lengths, desc="Caching features")):
+            for start in range(0, int(length), batch_size):
+                frames = dataset.load_frames(seq_idx, start, min(start + batch_size, int(length)))
+                batch = torch.stack([transform(image=np.asarray(frame))["image"] for frame in frames])
+                features = backbone(batch.to(device))
+
+                if stages is None:
+                    frame_size = list(batch.shape[-2:])
+                    stages = [
+                        np.lib.format.open_memmap(
+                            str(tmp_path / f"{name}.npy"),
+                            mode="w+",
+                            dtype=np.float16,
+                            shape=(int(offsets[-1]), *feature.shape[1:])
+                        )
+                        for name, feature in zip(STAGE_NAMES, features)
+                    ]
+
+                row = int(offsets[seq_idx]) + start
+                for stage, feature in zip(stages, features):
+                    stage[row:row + len(frames)] = feature.clamp(-FP16_MAX, FP16_MAX).half().cpu().numpy()
+
+        backbone.train(was_training)
+        if stages is None:
+            raise ValueError(f"No frames to cache in {dataset.data_path}")
+        for stage in stages:
+            stage.flush()
+        del stages
+
+        np.save(tmp_path / "offsets.npy", offsets)
+        with open(tmp_path / "meta.json", 'w') as f:
+            json.dump({
+                "version": FEATURE_CACHE_VERSION,
+                "backbone_hash": backbone_hash(backbone),
+                "preprocessing": preprocessing_config(dataset, transform),
+                "frame_size": frame_size
+            }, f)
+
+        publish_directory(tmp_path, store_path)
+
+        logger.info(f"Cached backbone features of {int(offsets[-1])} frames at {store_path}")
+        return cls(store_path)
+
+    @classmethod
+    def open_or_build(
+        cls,
+        dataset: RabereDataset,
+        backbone: nn.Module,
+        store_path: Path,
+        transform: A.Compose,
+        device: torch.device,
+        batch_size: int = 32
+    ) -> "FeatureStore":
+        meta_path = Path(store_path) / "meta.json"
+
+        if meta_path.is_file():
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+
+            if (
+                meta.get("version") == FEATURE_CACHE_VERSION
+                and meta["backbone_hash"] == backbone_hash(backbone)
+                and meta["preprocessing"] == preprocessing_config(dataset, transform)
+            ):
+                return cls(store_path)
+            logger.info(f"Backbone weights or preprocessing changed, rebuilding {store_path}")
+
+        return cls.build(dataset, backbone, store_path, transform, device, batch_size)
+
+class FeatureCacheDataset(Dataset):
+    # The windows of a RabereDataset, served from a FeatureStore: all stages
+    # of the predicted frame and the last stage of the frames before it
+    def __init__(self, dataset: RabereDataset, store: FeatureStore):
+        self.dataset = dataset
+        self.store = store
+
+    def set_epoch(self, epoch: int) -> None:
+        self.dataset.set_epoch(epoch)
+
+    def __len__(self) -> int:
+        return len(self.dataset)
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        seq_idx, start_idx = (int(v) for v in self.dataset.frame_indices[idx])
+        end_idx = start_idx + self.dataset.window_span
+        rows = self.store.rows(seq_idx, start_idx, end_idx, self.dataset.frame_dilation)
+        last = rows.stop - 1
+
+        features = [
+            torch.from_numpy(np.array(self.store.stage(level)[last]))
+            for level in range(len(STAGE_NAMES))
+        ]
+        temporal_features = torch.from_numpy(np.array(self.store.stage(len(STAGE_NAMES) - 1)[rows][:-1]))
+
+        annotation_rows = self.dataset.annotations.rows(seq_idx, start_idx, end_idx, self.dataset.frame_dilation)
+        return {
+            "features": features,
+            "temporal_features": temporal_features,
+            "bbox": torch.from_numpy(np.array(self.dataset.annotations.column("bbox")[annotation_rows][-1])),
+            "activity": float(self.dataset.annotations.column("activity_level")[annotation_rows][-1]),
+            "frame_size": self.store.frame_size,
+            "sequence_id": seq_idx,
+            "start_frame": start_idx
+        }
+
+def create_feature_loaders(
+    data_path: str,
+    backbone: nn.Module,
+    cache_path: str,
+    device: torch.device,
+    batch_size: int,
+    num_workers: int,
+    temporal_length: int = 16,
+    window_stride: int = 1,
+    frame_dilation: int = 1,
+    random_window_offset: bool = False,
+    prefetch_factor: int = 2,
+    distributed: bool = False,
+    build_batch_size: int = 32
+) -> Tuple[DataLoader, DataLoader]:
+    # Features are computed once with the deterministic (validation)
+    # preprocessing, so training from the store sees no augmentation
+    _, transform = _create_frame_transforms()
+    backbone = backbone.to(device)
+
+    loader_kwargs = {"num_workers": num_workers, "pin_memory": True}
+    if num_workers > 0:
+        loader_kwargs["prefetch_factor"] = prefetch_factor
+
+    loaders: List[DataLoader] = []
+    for split in ("train", "val"):
+        dataset = RabereDataset(
+            data_path=f"{data_path}/{split}",
+            temporal_length=temporal_length,
+            transform=transform,
+            split=split,
+            window_stride=window_stride,
+            frame_dilation=frame_dilation,
+            random_window_offset=random_window_offset and split == "train"
+        )
+
+        # Rank 0 builds the store, the other ranks open it once it is in place
+        store_path = Path(cache_path) / split
+        if is_main_process():
+            store = FeatureStore.open_or_build(dataset, backbone, store_path, transform, device, build_batch_size)
+        barrier()
+        if not is_main_process():
+            store = FeatureStore(store_path)
+
+        cached = FeatureCacheDataset(dataset, store)
+        sampler = DistributedSampler(cached, shuffle=split == "train") if distributed else None
+        loaders.append(DataLoader(
+            cached,
+            batch_size=batch_size,
+            shuffle=split == "train" and sampler is None,
+            sampler=sampler,
+            collate_fn=FeatureBatchCollator(),
+            **loader_kwargs
+        ))
+
+    return loaders[0], loaders[1]
@@ -0,0 +1,339 @@
+import torch
+import torch.nn.functional as F
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence
+import logging
+
+from .model import RabereActivityNet
+
+logger = logging.getLogger(__name__)
+
+class FeatureRingBuffer:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.buffer: Optional[torch.Tensor] = None
+        self.count = 0
+        self.pos = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, features: torch.Tensor) -> None:
+        if self.capacity <= 0:
+            return
+
+        if self.buffer is None or self.buffer.shape[1:] != features.shape:
+            # Allocated once per stream, or again if the resolution changes
+            self.buffer = features.new_empty(self.capacity, *features.shape)
+            self.count = 0
+            self.pos = 0
+
+        self.buffer[self.pos].copy_(features)
+        self.pos = (self.pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def window(self) -> Optional[torch.Tensor]:
+        # Cached features in chronological order, [n, C, h, w]
+        if self.count == 0:
+            return None
+        if self.count < self.capacity:
+            return self.buffer[:self.count]
+        return torch.cat([self.buffer[self.pos:], self.buffer[:self.pos]])
+
+    def latest(self) -> Optional[torch.Tensor]:
+        # The most recently pushed features
+        if self.count == 0:
+            return None
+        return self.buffer[(self.pos - 1) % self.capacity]
+
+    def reset(self) -> None:
+        self.count = 0
+        self.pos = 0
+
+class StreamingInference:
+    def __init__(
+        self,
+        model: RabereActivityNet,
+        device: torch.device = torch.device("cpu"),
+        temporal_length: Optional[int] = None,
+        max_streams: int = 64
+    ):
+        self.model = model.to(device).eval()
+        self.device = device
+        self.max_streams = max_streams
+
+        # The current frame is appended by ActivityHead, so the buffer keeps
+        # the previous temporal_length - 1 frames
+        temporal_length = temporal_length or model.temporal_length
+        self.history = temporal_length - 1
+
+        self._streams: "OrderedDict[Hashable, FeatureRingBuffer]" = OrderedDict()
+
+    def _stream(self, camera_id: Hashable) -> FeatureRingBuffer:
+        stream = self._streams.get(camera_id)
+        if stream is None:
+            stream = FeatureRingBuffer(self.history)
+            self._streams[camera_id] = stream
+            while len(self._streams) > self.max_streams:
+                evicted_id, _ = self._streams.popitem(last=False)
+                logger.info(f"Dropping feature buffer of idle stream {evicted_id}")
+        else:
+            self._streams.move_to_end(camera_id)
+        return stream
+
+    def reset(self, camera_id: Optional[Hashable] = None) -> None:
+        if camera_id is None:
+            self._streams.clear()
+        else:
+            self._streams.pop(camera_id, None)
+
+    def _run_activity(
+        self,
+        current: torch.Tensor,
+        streams: List[FeatureRingBuffer],
+        indices: Iterable[int],
+        activity: torch.Tensor
+    ) -> None:
+        # Batch ActivityHead over cameras whose buffers hold the same number
+        # of frames, writing into activity
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for i in indices:
+            groups[len(streams[i])].append(i)
+
+        for history, group in groups.items():
+            index = torch.tensor(group, device=current.device)
+            temporal_features = None
+            if history > 0:
+                temporal_features = torch.stack([streams[i].window() for i in group])
+            activity[index] = self.model.activity_head(current[index], temporal_features)
+
+    @torch.no_grad()
+    def process_batch(
+        self,
+        camera_ids: Sequence[Hashable],
+        frames: torch.Tensor
+    ) -> Dict[str, torch.Tensor]:
+        if len(set(camera_ids)) != len(camera_ids):
+            raise ValueError("Each camera may contribute at most one frame per call")
+
+        frames = frames.to(self.device)
+        N = frames.shape[0]
+
+        # The backbone runs once per incoming frame
+        features = self.model.extract_features(frames)
+        bboxes, objectness = self.model.detect(features)
+        current = features[-1]
+
+        streams = [self._stream(camera_id) for camera_id in camera_ids]
+        activity = current.new_empty(N, 1)
+        self._run_activity(current, streams, range(N), activity)
+
+        for i, stream in enumerate(streams):
+            stream.push(current[i])
+
+        return {
+            "bbox": bboxes,
+            "objectness": objectness,
+            "activity": activity
+        }
+
+    def process(
+        self,
+        camera_ids: Sequence[Hashable],
+        frames: torch.Tensor
+    ) -> List[Dict[str, torch.Tensor]]:
+        outputs = self.process_batch(camera_ids, frames)
+        return [
+            {key: value[i] for key, value in outputs.items()}
+            for i in range(len(camera_ids))
+        ]
+
+    def process_frame(self, camera_id: Hashable, frame: torch.Tensor) -> Dict[str, torch.Tensor]:
+        if frame.dim() == 3:
+            frame = frame.unsqueeze(0)
+        return self.process([camera_id], frame)[0]
+
+class CameraState:
+    def __init__(self):
+        self.thumbnail: Optional[torch.Tensor] = None
+        self.last_output: Optional[Dict[str, torch.Tensor]] = None
+        self.reused = 0
+
+class CascadeInference(StreamingInference):
+    def __init__(
+        self,
+        model: RabereActivityNet,
+        device: torch.device = torch.device("cpu"),
+        temporal_length: Optional[int] = None,
+        max_streams: int = 64,
+        motion_threshold: float = 0.05,
+        motion_size: int = 32,
+        max_reuse: int = 30,
+        objectness_threshold: float = 0.3,
+        idle_activity: float = 0.0
+    ):
+        super().__init__(model, device, temporal_length, max_streams)
+        # Mean absolute change of a normalized grayscale thumbnail below
+        # which a frame reuses the camera's last result
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+        self.max_reuse = max_reuse
+
+        # Peak coarse-level objectness below which a frame is treated as
+        # empty: finer detection levels and ActivityHead are skipped
+        self.objectness_threshold = objectness_threshold
+        self.idle_activity = idle_activity
+
+        self._cameras: "OrderedDict[Hashable, CameraState]" = OrderedDict()
+        self.counters = {
+            "frames": 0,
+            "motion_skipped": 0,
+            "objectness_skipped": 0,
+            "full_runs": 0
+        }
+
+    @classmethod
+    def from_config(
+        cls,
+        model: RabereActivityNet,
+        config: Dict[str, Any],
+        device: torch.device = torch.device("cpu")
+    ) -> StreamingInference:
+        # With the cascade disabled every frame runs the full model
+        cascade = config["inference"]["cascade"]
+        if not cascade.get("enabled", True):
+            return StreamingInference(model, device=device)
+        return cls(
+            model,
+            device=device,
+            motion_threshold=cascade["motion_threshold"],
+            max_reuse=cascade["max_reuse"],
+            objectness_threshold=cascade["objectness_threshold"]
+        )
+
+    def _camera(self, camera_id: Hashable) -> CameraState:
+        state = self._cameras.get(camera_id)
+        if state is None:
+            state = CameraState()
+            self._cameras[camera_id] = state
+            while len(self._cameras) > self.max_streams:
+                self._cameras.popitem(last=False)
+        else:
+            self._cameras.move_to_end(camera_id)
+        return state
+
+    def reset(self, camera_id: Optional[Hashable] = None) -> None:
+        super().reset(camera_id)
+        if camera_id is None:
+            self._cameras.clear()
+        else:
+            self._cameras.pop(camera_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        frames = self.counters["frames"]
+        return {
+            **self.counters,
+            "motion_skip_rate": self.counters["motion_skipped"] / frames if frames else 0.0,
+            "objectness_skip_rate": self.counters["objectness_skipped"] / frames if frames else 0.0
+        }
+
+    def _motion(self, states: List[CameraState], thumbnails: torch.Tensor) -> torch.Tensor:
+        motion = thumbnails.new_full((len(states),), float("inf"))
+        known = [i for i, state in enumerate(states) if state.thumbnail is not None]
+        if known:
+            index = torch.tensor(known, device=thumbnails.device)
+            previous = torch.stack([states[i].thumbnail for i in known])
+            motion[index] = (thumbnails[index] - previous).abs().mean(dim=1)
+        return motion
+
+    def _run_gated(self, camera_ids: Sequence[Hashable], frames: torch.Tensor) -> Dict[str, torch.Tensor]:
+        N = frames.shape[0]
+        features = self.model.extract_features(frames)
+        current = features[-1]
+
+        # Low-resolution objectness pass: only the coarsest FPN level
+        num_levels = len(self.model.detection_heads)
+        (coarse_bbox,), (coarse_objectness,) = self.model.detect(features, levels=[num_levels - 1], per_level=True)
+        present = coarse_objectness.flatten(1).amax(dim=1) >= self.objectness_threshold
+        present_idx = present.nonzero().flatten()
+
+        # Empty frames get all-zero maps, which never pass the confidence
+        # threshold in post-processing
+        h, w = features[0].shape[-2:]
+        bboxes = frames.new_zeros(N, 4 * num_levels, h, w)
+        objectness = frames.new_zeros(N, num_levels, h, w)
+        if len(present_idx):
+            # The gate already ran the coarsest level on every frame, so only
+            # the finer levels are computed and the coarse maps are reused
+            level_bboxes, level_objectness = [], []
+            if num_levels > 1:
+                level_bboxes, level_objectness = self.model.detect(
+                    [feature[present_idx] for feature in features],
+                    levels=range(num_levels - 1),
+                    per_level=True
+                )
+            bboxes[present_idx], objectness[present_idx] = self.model.merge_levels(
+                [*level_bboxes, coarse_bbox[present_idx]],
+                [*level_objectness, coarse_objectness[present_idx]]
+            )
+
+        streams = [self._stream(camera_id) for camera_id in camera_ids]
+        activity = current.new_full((N, 1), self.idle_activity)
+        self._run_activity(current, streams, present_idx.tolist(), activity)
+
+        # Buffers advance for every frame; motion-skipped frames push their
+        # camera's last computed features in process_batch instead
+        for i, stream in enumerate(streams):
+            stream.push(current[i])
+
+        self.counters["objectness_skipped"] += N - len(present_idx)
+        self.counters["full_runs"] += len(present_idx)
+        return {
+            "bbox": bboxes,
+            "objectness": objectness,
+            "activity": activity
+        }
+
+    @torch.no_grad()
+    def process_batch(
+        self,
+        camera_ids: Sequence[Hashable],
+        frames: torch.Tensor
+    ) -> Dict[str, torch.Tensor]:
+        if len(set(camera_ids)) != len(camera_ids):
+            raise ValueError("Each camera may contribute at most one frame per call")
+
+        frames = frames.to(self.device)
+        N = frames.shape[0]
+        self.counters["frames"] += N
+
+        # Motion gate on small grayscale thumbnails, against the last frame
+        # that was actually computed for the camera
+        states = [self._camera(camera_id) for camera_id in camera_ids]
+        thumbnails = F.adaptive_avg_pool2d(frames.mean(dim=1, keepdim=True), self.motion_size).flatten(1)
+        motion = self._motion(states, thumbnails).tolist()
+
+        run = []
+        for i, state in enumerate(states):
+            if state.last_output is not None and state.reused < self.max_reuse and motion[i] < self.motion_threshold:
+                state.reused += 1
+                # A still frame repeats the last computed features, so
+                # activity windows keep covering temporal_length frames
+                stream = self._stream(camera_ids[i])
+                if len(stream):
+                    stream.push(stream.latest())
+            else:
+                run.append(i)
+        self.counters["motion_skipped"] += N - len(run)
+
+        if run:
+            outputs = self._run_gated([camera_ids[i] for i in run], frames[run])
+            for j, i in enumerate(run):
+                states[i].thumbnail = thumbnails[i].clone()
+                states[i].last_output = {key: value[j].clone() for key, value in outputs.items()}
+                states[i].reused = 0
+
+        return {
+            key: torch.stack([state.last_output[key] for state in states])
+            for key in ("bbox", "objectness", "activity")
+        }
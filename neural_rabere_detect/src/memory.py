@@ -0,0 +1,130 @@
+import gc
+import torch
+import torch.nn as nn
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .precision import PrecisionPolicy
+
+# (name, checkpoint backbone stages, checkpoint ActivityHead.conv_3d)
+CHECKPOINTING_VARIANTS = (
+    ("none", False, False),
+    ("backbone", True, False),
+    ("conv_3d", False, True),
+    ("backbone+conv_3d", True, True)
+)
+
+def _read_status_kb(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _reset_peak_rss() -> bool:
+    # Writing 5 resets VmHWM to the current resident set (Linux >= 4.0)
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def measure_peak_memory(fn: Callable[[], None], device: torch.device) -> Optional[float]:
+    # CUDA allocator peak in MB that fn adds on top of what is already
+    # allocated; None on other devices, which have no exact peak counter
+    if device.type != "cuda":
+        return None
+    gc.collect()
+    torch.cuda.synchronize(device)
+    torch.cuda.reset_peak_memory_stats(device)
+    baseline = torch.cuda.memory_allocated(device)
+    fn()
+    torch.cuda.synchronize(device)
+    return (torch.cuda.max_memory_allocated(device) - baseline) / 2**20
+
+def measure_peak_rss(fn: Callable[[], None]) -> Optional[float]:
+    # Approximate MB by which the process resident-set peak grows while fn
+    # runs. Pages the allocator kept from earlier steps are reused without
+    # showing up, so the same step can read anywhere from 0 to its full
+    # size; use it next to measure_saved_activations, never instead of it
+    gc.collect()
+    baseline = _read_status_kb("VmRSS")
+    if baseline is None or not _reset_peak_rss():
+        return None
+    fn()
+    return max(0.0, (_read_status_kb("VmHWM") - baseline) / 1024.0)
+
+def measure_saved_activations(fn: Callable[[], None], model: nn.Module) -> float:
+    # MB that autograd keeps alive for backward while fn runs, counted once
+    # per storage and without the parameters. Unlike the process RSS peak it
+    # does not depend on what the allocator kept from earlier steps
+    parameters = {parameter.untyped_storage().data_ptr() for parameter in model.parameters()}
+    saved: Dict[int, int] = {}
+
+    def pack(tensor: torch.Tensor) -> torch.Tensor:
+        storage = tensor.untyped_storage()
+        if storage.data_ptr() not in parameters:
+            saved[storage.data_ptr()] = storage.nbytes()
+        return tensor
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+        fn()
+    return sum(saved.values()) / 2**20
+
+def activation_memory_report(
+    model: nn.Module,
+    batch: Tuple[torch.Tensor, Optional[torch.Tensor], Dict[str, torch.Tensor]],
+    loss_fn: Callable,
+    precision: PrecisionPolicy,
+    accumulation_steps: int = 1,
+    temporal_is_features: bool = False
+) -> List[Dict[str, object]]:
+    # Saved activations, plus the allocator peak on CUDA or the approximate
+    # RSS peak on CPU, of one forward/backward for every checkpointing
+    # variant, on the full batch and on the micro-batch accumulation runs
+    frames, temporal_frames, targets = batch
+    # Frames may also be a list of cached backbone stage features
+    full_batch_size = (frames[0] if isinstance(frames, (list, tuple)) else frames).shape[0]
+    batch_sizes = [full_batch_size]
+    if accumulation_steps > 1:
+        batch_sizes.append(max(1, full_batch_size // accumulation_steps))
+
+    was_training = model.training
+    model.train()
+    results = []
+    try:
+        for name, backbone, conv_3d in CHECKPOINTING_VARIANTS:
+            model.set_activation_checkpointing(backbone=backbone, activity_head=conv_3d)
+            for batch_size in batch_sizes:
+                def step() -> None:
+                    model.zero_grad(set_to_none=True)
+                    with precision.autocast():
+                        predictions = model(
+                            precision.prepare_input(
+                                [feature[:batch_size] for feature in frames]
+                                if isinstance(frames, (list, tuple)) else frames[:batch_size]
+                            ),
+                            temporal_frames[:batch_size] if temporal_frames is not None else None,
+                            temporal_is_features=temporal_is_features
+                        )
+                        loss, _ = loss_fn(model, predictions, {k: v[:batch_size] for k, v in targets.items()})
+                    loss.backward()
+
+                # Saved activations are the primary figure everywhere; the
+                # exact allocator peak exists on CUDA only, CPU gets the
+                # approximate resident-set growth instead
+                on_cuda = precision.device.type == "cuda"
+                results.append({
+                    "checkpointing": name,
+                    "micro_batch_size": batch_size,
+                    "saved_activations_mb": measure_saved_activations(step, model),
+                    "peak_memory_mb": measure_peak_memory(step, precision.device) if on_cuda else None,
+                    "approx_rss_peak_mb": None if on_cuda else measure_peak_rss(step)
+                })
+    finally:
+        model.zero_grad(set_to_none=True)
+        model.train(was_training)
+    return results
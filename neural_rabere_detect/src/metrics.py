@@ -0,0 +1,61 @@
+import time
+import torch
+from typing import Dict, Sequence
+
+class MetricAccumulator:
+    def __init__(self, keys: Sequence[str], device: torch.device):
+        self.keys = list(keys)
+        self.device = device
+        self.reset()
+
+    def reset(self) -> None:
+        # Running sums live on the device, so updates never wait for it
+        self.sums = torch.zeros(len(self.keys), dtype=torch.float64, device=self.device)
+        self.count = 0
+
+    @torch.no_grad()
+    def update(self, values: Dict[str, torch.Tensor]) -> None:
+        self.sums += torch.stack([values[key].detach().to(torch.float64) for key in self.keys])
+        self.count += 1
+
+    def compute(self, prefix: str = "") -> Dict[str, float]:
+        # The only host sync: one transfer for all metrics
+        if self.count == 0:
+            return {f"{prefix}{key}": 0.0 for key in self.keys}
+        means = (self.sums / self.count).tolist()
+        return {f"{prefix}{key}": value for key, value in zip(self.keys, means)}
+
+class StepTimer:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.start = time.perf_counter()
+        self._last = self.start
+        self.steps = 0
+        self.data_wait = 0.0
+        self.compute = 0.0
+
+    def data_ready(self) -> None:
+        # Time since the previous step finished was spent waiting for data
+        now = time.perf_counter()
+        self.data_wait += now - self._last
+        self._last = now
+
+    def step_done(self) -> None:
+        # Host-side time; on CUDA work still queued at this point shows up
+        # in the next synchronizing call
+        now = time.perf_counter()
+        self.compute += now - self._last
+        self._last = now
+        self.steps += 1
+
+    def summary(self, prefix: str = "") -> Dict[str, float]:
+        elapsed = time.perf_counter() - self.start
+        steps = max(self.steps, 1)
+        return {
+            f"{prefix}steps_per_sec": self.steps / elapsed if elapsed > 0 else 0.0,
+            f"{prefix}data_wait_ms": self.data_wait * 1000.0 / steps,
+            f"{prefix}compute_ms": self.compute * 1000.0 / steps,
+            f"{prefix}data_wait_fraction": self.data_wait / elapsed if elapsed > 0 else 0.0
+        }
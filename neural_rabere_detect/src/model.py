@@ -1,8 +1,11 @@
 import torch
 import torch.nn as nn
-import torchvision.models as models
-from typing import Tuple, Dict, Optional, List
+from typing import Tuple, Dict, Optional, List, Sequence, Union
 import torch.nn.functional as F
+from torchvision.ops import deform_conv2d
+
+from .backbones import build_backbone
+from .utils import set_activation_checkpointing
 
 class FeaturePyramidNetwork(nn.Module):
     def __init__(self, in_channels: List[int], out_channels: int):
@@ -21,16 +24,27 @@ class FeaturePyramidNetwork(nn.Module):
             self.layer_blocks.append(layer_block)
 
     def forward(self, features: List[torch.Tensor]) -> List[torch.Tensor]:
+        # Loop over the blocks rather than the inputs so FX can trace this
+        return self.forward_levels(features, range(len(self.inner_blocks)))
+
+    def forward_levels(self, features: List[torch.Tensor], levels: Sequence[int]) -> List[torch.Tensor]:
+        # Outputs for the given levels only, in ascending order. The top-down
+        # path stops at the lowest requested level and output convs run only
+        # where they are needed
+        levels = sorted(set(levels))
         results = []
+
         last_inner = self.inner_blocks[-1](features[-1])
-        results.append(self.layer_blocks[-1](last_inner))
+        if levels[-1] == len(self.inner_blocks) - 1:
+            results.append(self.layer_blocks[-1](last_inner))
 
-        for idx in range(len(features) - 2, -1, -1):
+        for idx in range(len(self.inner_blocks) - 2, levels[0] - 1, -1):
             inner_lateral = self.inner_blocks[idx](features[idx])
             feat_shape = inner_lateral.shape[-2:]
             inner_top_down = F.interpolate(last_inner, size=feat_shape, mode="nearest")
             last_inner = inner_lateral + inner_top_down
-            results.insert(0, self.layer_blocks[idx](last_inner))
+            if idx in levels:
+                results.insert(0, self.layer_blocks[idx](last_inner))
 
         return results
 
@@ -39,10 +53,29 @@ class DeformableConv2d(nn.Module):
         super().__init__()
         self.offset_conv = nn.Conv2d(in_channels, 2 * kernel_size * kernel_size, kernel_size, stride, padding)
         self.conv = nn.Conv2d(in_channels, out_channels, kernel_size, stride, padding)
+        self.reset_offsets()
+
+    def reset_offsets(self) -> None:
+        # Zero offsets sample the regular grid, so training starts from a
+        # plain convolution
+        nn.init.zeros_(self.offset_conv.weight)
+        nn.init.zeros_(self.offset_conv.bias)
         
     def forward(self, x: torch.Tensor) -> torch.Tensor:
+        # (dy, dx) per kernel tap and output position
         offset = self.offset_conv(x)
-        return self.conv(x + offset)
+
+        # Sampled in fp32 under autocast: torchvision has no bf16 CPU kernel
+        # and autocasts the CUDA one to fp32 as well
+        with torch.autocast(device_type=x.device.type, enabled=False):
+            return deform_conv2d(
+                x.float(),
+                offset.float(),
+                self.conv.weight,
+                self.conv.bias,
+                stride=self.conv.stride,
+                padding=self.conv.padding
+            )
 
 class SpatialAttention(nn.Module):
     def __init__(self, in_channels: int):
@@ -62,7 +95,8 @@ class SpatialAttention(nn.Module):
 class TemporalAttention(nn.Module):
     def __init__(self, embed_dim: int, num_heads: int = 8):
         super().__init__()
-        self.self_attn = nn.MultiheadAttention(embed_dim, num_heads, dropout=0.1)
+        # Tokens arrive as [B, T, C]
+        self.self_attn = nn.MultiheadAttention(embed_dim, num_heads, dropout=0.1, batch_first=True)
         self.norm = nn.LayerNorm(embed_dim)
         self.dropout = nn.Dropout(0.1)
 
@@ -72,9 +106,22 @@ class TemporalAttention(nn.Module):
         x = self.norm(x)
         return x
 
+TEMPORAL_TOKEN_MODES = ("pool", "grid")
+
 class ActivityHead(nn.Module):
-    def __init__(self, in_channels: int, temporal_length: int):
+    def __init__(
+        self,
+        in_channels: int,
+        temporal_length: int,
+        temporal_tokens: str = "pool",
+        grid_size: int = 2
+    ):
         super().__init__()
+        if temporal_tokens not in TEMPORAL_TOKEN_MODES:
+            raise ValueError(f"temporal_tokens must be one of {TEMPORAL_TOKEN_MODES}, got {temporal_tokens}")
+        self.temporal_tokens = temporal_tokens
+        self.grid_size = grid_size
+
         self.spatial_attention = SpatialAttention(in_channels)
         
         self.conv_3d = nn.Sequential(
@@ -86,6 +133,12 @@ class ActivityHead(nn.Module):
             nn.ReLU(inplace=True)
         )
         
+        # One in_channels//4 token per frame whatever the input resolution:
+        # "pool" averages the whole map, "grid" keeps a grid_size x grid_size
+        # layout of cells and projects it down
+        if temporal_tokens == "grid":
+            self.token_projection = nn.Linear(in_channels//4 * grid_size * grid_size, in_channels//4)
+        
         self.temporal_attention = TemporalAttention(in_channels//4)
         
         self.lstm = nn.LSTM(
@@ -117,28 +170,39 @@ class ActivityHead(nn.Module):
         if temporal_features is not None:
             # Combine with temporal features
             x = torch.cat([temporal_features, x.unsqueeze(1)], dim=1)
-            
-            # 3D convolution for spatio-temporal features
-            x = x.permute(0, 2, 1, 3, 4)  # [B, C, T, H, W]
-            x = self.conv_3d(x)
-            
-            # Temporal attention
-            x = x.permute(0, 2, 1, 3, 4)  # [B, T, C, H, W]
-            B, T, C, H, W = x.shape
-            x = x.reshape(B, T, C * H * W)
-            x = self.temporal_attention(x)
-            
-            # LSTM processing
-            lstm_out, _ = self.lstm(x)
-            x = lstm_out[:, -1]  # Take last temporal state
         else:
-            x = F.adaptive_avg_pool2d(x, (1, 1))
-            x = x.flatten(1)
+            # A lone frame (a stream's first) is a one-frame clip, so the
+            # classifier always sees LSTM states; pooled backbone channels
+            # only fit it when the backbone happened to have 512
+            x = x.unsqueeze(1)
+        
+        # 3D convolution for spatio-temporal features
+        x = x.permute(0, 2, 1, 3, 4)  # [B, C, T, H, W]
+        x = self.conv_3d(x)
+        
+        # Temporal attention
+        x = x.permute(0, 2, 1, 3, 4)  # [B, T, C, H, W]
+        x = self._temporal_tokens(x)  # [B, T, C]
+        x = self.temporal_attention(x)
+        
+        # LSTM processing, kept in fp32 under autocast: the recurrence
+        # accumulates rounding error over time steps
+        with torch.autocast(device_type=x.device.type, enabled=False):
+            lstm_out, _ = self.lstm(x.float())
+        x = lstm_out[:, -1]  # Take last temporal state
         
         # Activity classification
         activity = self.activity_classifier(x)
         return activity
 
+    def _temporal_tokens(self, x: torch.Tensor) -> torch.Tensor:
+        B, T, C, H, W = x.shape
+        if self.temporal_tokens == "pool":
+            return x.mean(dim=(-2, -1))
+
+        x = F.adaptive_avg_pool2d(x.flatten(0, 1), self.grid_size)
+        return self.token_projection(x.reshape(B, T, C * self.grid_size * self.grid_size))
+
 class DetectionHead(nn.Module):
     def __init__(self, in_channels: int):
         super().__init__()
@@ -176,23 +240,24 @@ class DetectionHead(nn.Module):
         return bbox, objectness
 
 class RabereActivityNet(nn.Module):
+    # Detection outputs are merged on the grid of the finest FPN level, the
+    # stride 4 backbone stage; training targets must be built on that grid
+    output_stride = 4
+
     def __init__(
         self,
         backbone: str = "resnext101_32x8d",
         pretrained: bool = True,
-        temporal_length: int = 16
+        temporal_length: int = 16,
+        temporal_tokens: str = "pool",
+        temporal_grid_size: int = 2
     ):
         super().__init__()
+        self.temporal_length = temporal_length
         
-        # Backbone
-        if backbone == "resnext101_32x8d":
-            self.backbone = models.resnext101_32x8d(pretrained=pretrained)
-            backbone_channels = [256, 512, 1024, 2048]  # ResNext channels
-        else:
-            raise NotImplementedError(f"Backbone {backbone} not implemented")
-            
-        # Remove classification head
-        self.backbone = nn.Sequential(*list(self.backbone.children())[:-2])
+        # Backbone, see backbones.BACKBONES for the registered choices
+        self.backbone = build_backbone(backbone, pretrained=pretrained)
+        backbone_channels = self.backbone.out_channels
         
         # Feature Pyramid Network
         self.fpn = FeaturePyramidNetwork(backbone_channels, 256)
@@ -201,14 +266,23 @@ class RabereActivityNet(nn.Module):
         self.detection_heads = nn.ModuleList([
             DetectionHead(256) for _ in range(len(backbone_channels))
         ])
+        self.num_levels = len(self.detection_heads)
         
         # Activity recognition head
-        self.activity_head = ActivityHead(2048, temporal_length)
+        self.activity_head = ActivityHead(
+            backbone_channels[-1],
+            temporal_length,
+            temporal_tokens=temporal_tokens,
+            grid_size=temporal_grid_size
+        )
         
         self._initialize_weights()
 
     def _initialize_weights(self):
-        for m in self.modules():
+        # The backbone keeps its own (possibly pretrained) initialization
+        for name, m in self.named_modules():
+            if name.startswith("backbone"):
+                continue
             if isinstance(m, nn.Conv2d):
                 nn.init.kaiming_normal_(m.weight, mode='fan_out', nonlinearity='relu')
                 if m.bias is not None:
@@ -220,52 +294,111 @@ class RabereActivityNet(nn.Module):
                 nn.init.normal_(m.weight, 0, 0.01)
                 nn.init.constant_(m.bias, 0)
 
-    def forward(
+        for m in self.modules():
+            if isinstance(m, DeformableConv2d):
+                m.reset_offsets()
+
+    def set_activation_checkpointing(self, backbone: bool = False, activity_head: bool = False) -> None:
+        # Trades recomputation in backward for activation memory; no effect
+        # in eval mode or under no_grad
+        self.backbone.set_activation_checkpointing(backbone)
+        set_activation_checkpointing(self.activity_head.conv_3d, activity_head)
+
+    def extract_features(self, x: torch.Tensor) -> List[torch.Tensor]:
+        return self.backbone(x)
+
+    def encode_temporal_frames(self, frames: torch.Tensor) -> torch.Tensor:
+        # [B, T, 3, H, W] frames -> [B, T, C, h, w] last-stage features,
+        # computed as one backbone batch
+        B, T = frames.shape[:2]
+        features = self.extract_features(frames.flatten(0, 1))[-1]
+        return features.view(B, T, *features.shape[1:])
+
+    def detect(
         self,
-        x: torch.Tensor,
-        temporal_features: Optional[torch.Tensor] = None
-    ) -> Dict[str, torch.Tensor]:
-        # Extract backbone features
-        features = []
-        x = self.backbone.conv1(x)
-        x = self.backbone.bn1(x)
-        x = self.backbone.relu(x)
-        x = self.backbone.maxpool(x)
-
-        x = self.backbone.layer1(x)
-        features.append(x)
-        x = self.backbone.layer2(x)
-        features.append(x)
-        x = self.backbone.layer3(x)
-        features.append(x)
-        x = self.backbone.layer4(x)
-        features.append(x)
+        features: List[torch.Tensor],
+        levels: Optional[Sequence[int]] = None,
+        per_level: bool = False
+    ) -> Tuple[Union[torch.Tensor, List[torch.Tensor]], Union[torch.Tensor, List[torch.Tensor]]]:
+        num_levels = len(self.detection_heads)
 
         # FPN forward pass
-        fpn_features = self.fpn(features)
+        if levels is None:
+            levels = list(range(num_levels))
+            fpn_features = self.fpn(features)
+        else:
+            levels = sorted(set(levels))
+            if not levels or levels[0] < 0 or levels[-1] >= num_levels:
+                raise ValueError(f"FPN levels must be a non-empty subset of 0..{num_levels - 1}, got {levels}")
+            if hasattr(self.fpn, "forward_levels"):
+                fpn_features = self.fpn.forward_levels(features, levels)
+            else:
+                # Traced or quantized FPNs only expose the full forward
+                fpn_features = self.fpn(features)
+                fpn_features = [fpn_features[level] for level in levels]
 
-        # Detection branch
         all_bboxes = []
         all_objectness = []
-        for feat, det_head in zip(fpn_features, self.detection_heads):
-            bbox, obj = det_head(feat)
+        for level, feat in zip(levels, fpn_features):
+            bbox, obj = self.detection_heads[level](feat)
             all_bboxes.append(bbox)
             all_objectness.append(obj)
 
-        # Combine predictions from all FPN levels
-        bboxes = torch.cat([F.interpolate(bbox, size=all_bboxes[0].shape[-2:])
+        # Per-level maps at their native resolution
+        if per_level:
+            return all_bboxes, all_objectness
+
+        return self.merge_levels(all_bboxes, all_objectness)
+
+    @staticmethod
+    def merge_levels(
+        all_bboxes: List[torch.Tensor],
+        all_objectness: List[torch.Tensor]
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        # Combine per-level predictions, finest first, at the finest level
+        size = all_bboxes[0].shape[-2:]
+        bboxes = torch.cat([bbox if bbox.shape[-2:] == size else F.interpolate(bbox, size=size)
                            for bbox in all_bboxes], dim=1)
-        objectness = torch.cat([F.interpolate(obj, size=all_objectness[0].shape[-2:])
+        objectness = torch.cat([obj if obj.shape[-2:] == size else F.interpolate(obj, size=size)
                               for obj in all_objectness], dim=1)
 
+        return bboxes, objectness
+
+    def forward(
+        self,
+        x: Union[torch.Tensor, List[torch.Tensor]],
+        temporal_features: Optional[torch.Tensor] = None,
+        temporal_is_features: bool = False,
+        detection: bool = True,
+        activity: bool = True,
+        levels: Optional[Sequence[int]] = None,
+        per_level: bool = False
+    ) -> Dict[str, torch.Tensor]:
+        # Branches that are switched off are never run; their keys are left
+        # out of the outputs. With per_level, bbox and objectness are lists of
+        # per-level maps instead of one upsampled tensor
+        if not (detection or activity):
+            raise ValueError("At least one of detection and activity must be enabled")
+
+        # Extract backbone features; a list of stage features (e.g. from
+        # feature_cache) skips the backbone
+        features = list(x) if isinstance(x, (list, tuple)) else self.extract_features(x)
+        outputs = {}
+
+        # Detection branch
+        if detection:
+            outputs["bbox"], outputs["objectness"] = self.detect(features, levels, per_level)
+
         # Activity recognition branch
-        activity = self.activity_head(features[-1], temporal_features)
+        if activity:
+            # Raw temporal frames (e.g. from the data loader) are encoded
+            # first; cached backbone features are passed with
+            # temporal_is_features
+            if temporal_features is not None and not temporal_is_features:
+                temporal_features = self.encode_temporal_frames(temporal_features)
+            outputs["activity"] = self.activity_head(features[-1], temporal_features)
 
-        return {
-            "bbox": bboxes,
-            "objectness": objectness,
-            "activity": activity
-        }
+        return outputs
 
     def compute_loss(
         self,
@@ -284,15 +417,24 @@ class RabereActivityNet(nn.Module):
         target_obj = targets["objectness"]
         target_activity = targets["activity"]
         
-        # Compute individual losses with focal loss for objectness
-        bbox_loss = nn.SmoothL1Loss()(pred_bbox, target_bbox)
+        # Compute individual losses with focal loss for objectness. Boxes are
+        # only regressed where objectness is set; the 4 box channels of each
+        # level share that level's objectness map
+        bbox_mask = target_obj.repeat_interleave(4, dim=1)
+        bbox_loss = (
+            F.smooth_l1_loss(pred_bbox, target_bbox, reduction="none") * bbox_mask
+        ).sum() / bbox_mask.sum().clamp(min=1)
         
-        # Focal loss for objectness
+        # Focal loss for objectness, in fp32: log(pt) and (1 - pt)^gamma
+        # underflow in half precision
         alpha = 0.25
         gamma = 2.0
-        pt = pred_obj * target_obj + (1 - pred_obj) * (1 - target_obj)
-        focal_weight = (alpha * target_obj + (1 - alpha) * (1 - target_obj)) * (1 - pt).pow(gamma)
-        obj_loss = (-torch.log(pt) * focal_weight).mean()
+        with torch.autocast(device_type=pred_obj.device.type, enabled=False):
+            pred_obj, target_obj = pred_obj.float(), target_obj.float()
+            pt = pred_obj * target_obj + (1 - pred_obj) * (1 - target_obj)
+            focal_weight = (alpha * target_obj + (1 - alpha) * (1 - target_obj)) * (1 - pt).pow(gamma)
+            # A saturated sigmoid on the wrong side gives pt == 0
+            obj_loss = (-torch.log(pt.clamp(min=1e-6)) * focal_weight).mean()
         
         # Huber loss for activity
         activity_loss = F.smooth_l1_loss(pred_activity, target_activity)
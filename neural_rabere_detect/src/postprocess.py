@@ -0,0 +1,121 @@
+import torch
+from collections import OrderedDict
+from torchvision.ops import batched_nms
+from typing import Any, Dict, Hashable, Sequence, Tuple
+
+class DetectionPostProcessor:
+    def __init__(
+        self,
+        image_size: Tuple[int, int] = (640, 640),
+        confidence_threshold: float = 0.5,
+        nms_threshold: float = 0.45,
+        pre_nms_top_k: int = 1000,
+        max_detections: int = 100
+    ):
+        self.image_size = image_size
+        self.confidence_threshold = confidence_threshold
+        self.nms_threshold = nms_threshold
+        self.pre_nms_top_k = pre_nms_top_k
+        self.max_detections = max_detections
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DetectionPostProcessor":
+        return cls(
+            image_size=tuple(config["data"]["image_size"]),
+            confidence_threshold=config["inference"]["confidence_threshold"],
+            nms_threshold=config["inference"]["nms_threshold"]
+        )
+
+    def decode(self, bbox: torch.Tensor, objectness: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        # [B, 4L, h, w] / [B, L, h, w] -> [B, L*h*w, 4] boxes and [B, L*h*w] scores
+        B, L, h, w = objectness.shape
+        boxes = bbox.view(B, L, 4, h, w).permute(0, 1, 3, 4, 2).reshape(B, L * h * w, 4)
+        scores = objectness.reshape(B, L * h * w)
+
+        # Normalized (cx, cy, w, h) -> pixel (x1, y1, x2, y2)
+        H, W = self.image_size
+        scale = boxes.new_tensor([W, H, W, H])
+        cxcy, wh = boxes[..., :2], boxes[..., 2:]
+        boxes = torch.cat([cxcy - wh / 2, cxcy + wh / 2], dim=-1) * scale
+
+        return boxes, scores
+
+    @torch.no_grad()
+    def __call__(self, predictions: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        boxes, scores = self.decode(predictions["bbox"], predictions["objectness"])
+        B, N = scores.shape
+
+        # Top-k pre-filter across all levels before anything is thresholded
+        k = min(self.pre_nms_top_k, N)
+        top_scores, top_idx = scores.topk(k, dim=1)
+        top_boxes = boxes.gather(1, top_idx.unsqueeze(-1).expand(B, k, 4))
+
+        keep_mask = top_scores > self.confidence_threshold
+        batch_ids = torch.arange(B, device=scores.device).unsqueeze(1).expand(B, k)[keep_mask]
+        cand_boxes = top_boxes[keep_mask]
+        cand_scores = top_scores[keep_mask]
+
+        # One NMS call for the whole batch; boxes of different images never
+        # suppress each other
+        keep = batched_nms(cand_boxes, cand_scores, batch_ids, self.nms_threshold)
+        kept_batch = batch_ids[keep]
+
+        # Rank survivors inside their image (keep is sorted by score) and
+        # scatter the best max_detections into padded outputs
+        order = torch.sort(kept_batch, stable=True).indices
+        keep, kept_batch = keep[order], kept_batch[order]
+        counts = torch.bincount(kept_batch, minlength=B)
+        starts = torch.cumsum(counts, 0) - counts
+        rank = torch.arange(len(keep), device=scores.device) - starts[kept_batch]
+
+        selected = rank < self.max_detections
+        keep, kept_batch, rank = keep[selected], kept_batch[selected], rank[selected]
+
+        out_boxes = cand_boxes.new_zeros(B, self.max_detections, 4)
+        out_scores = cand_scores.new_zeros(B, self.max_detections)
+        out_boxes[kept_batch, rank] = cand_boxes[keep]
+        out_scores[kept_batch, rank] = cand_scores[keep]
+
+        return {
+            "boxes": out_boxes,
+            "scores": out_scores,
+            "num_detections": counts.clamp(max=self.max_detections)
+        }
+
+class ActivitySmoother:
+    def __init__(self, window: int = 5, max_streams: int = 1024):
+        self.window = window
+        self.max_streams = max_streams
+
+        # Per stream: ring of the last `window` activity values and its fill
+        self._history: "OrderedDict[Hashable, Tuple[torch.Tensor, int]]" = OrderedDict()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ActivitySmoother":
+        return cls(window=config["inference"]["activity_smoothing_window"])
+
+    def reset(self, stream_id: Hashable = None) -> None:
+        if stream_id is None:
+            self._history.clear()
+        else:
+            self._history.pop(stream_id, None)
+
+    @torch.no_grad()
+    def __call__(self, stream_ids: Sequence[Hashable], activity: torch.Tensor) -> torch.Tensor:
+        activity = activity.reshape(len(stream_ids))
+        rings = []
+        for i, stream_id in enumerate(stream_ids):
+            ring, count = self._history.pop(stream_id, (None, 0))
+            if ring is None:
+                ring = activity.new_zeros(self.window)
+            ring[count % self.window] = activity[i]
+            self._history[stream_id] = (ring, count + 1)
+            rings.append((ring, min(count + 1, self.window)))
+
+        while len(self._history) > self.max_streams:
+            self._history.popitem(last=False)
+
+        # Mean over each stream's filled part of the window, in one op
+        stacked = torch.stack([ring for ring, _ in rings])
+        filled = activity.new_tensor([n for _, n in rings])
+        return stacked.sum(dim=1) / filled
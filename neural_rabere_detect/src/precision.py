@@ -0,0 +1,146 @@
+import copy
+import time
+import torch
+import torch.nn as nn
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+PRECISIONS = ("float32", "bfloat16", "float16", "mixed")
+
+# Conv-heavy parts that benefit from NHWC kernels
+CHANNELS_LAST_MODULES = ("backbone", "fpn", "detection_heads")
+
+class PrecisionPolicy:
+    def __init__(self, precision: str, device: torch.device, channels_last: bool = True):
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}, got {precision}")
+
+        self.precision = precision
+        self.device = device
+        self.channels_last = channels_last
+
+        # "mixed" picks the fast half type for the device: fp16 on CUDA,
+        # bf16 on CPU where fp16 autocast has little kernel coverage
+        if precision == "mixed":
+            self.dtype = torch.float16 if device.type == "cuda" else torch.bfloat16
+        else:
+            self.dtype = {
+                "float32": None,
+                "bfloat16": torch.bfloat16,
+                "float16": torch.float16
+            }[precision]
+
+        # Only fp16 needs loss scaling; bf16 has the fp32 exponent range
+        self.scaler = torch.amp.GradScaler(
+            device.type,
+            enabled=self.dtype == torch.float16 and device.type == "cuda"
+        )
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], device: torch.device) -> "PrecisionPolicy":
+        system = config["system"]
+        return cls(
+            system["precision"],
+            device,
+            channels_last=system.get("channels_last", True)
+        )
+
+    @property
+    def name(self) -> str:
+        return "float32" if self.dtype is None else str(self.dtype).replace("torch.", "")
+
+    def autocast(self) -> torch.autocast:
+        return torch.autocast(
+            device_type=self.device.type,
+            dtype=self.dtype or torch.float32,
+            enabled=self.dtype is not None
+        )
+
+    def prepare_model(self, model: nn.Module) -> nn.Module:
+        memory_format = torch.channels_last if self.channels_last else torch.contiguous_format
+        for name in CHANNELS_LAST_MODULES:
+            model.get_submodule(name).to(memory_format=memory_format)
+        return model
+
+    def prepare_input(self, frames: Union[torch.Tensor, List[torch.Tensor]]) -> Union[torch.Tensor, List[torch.Tensor]]:
+        if isinstance(frames, (list, tuple)):
+            # Cached backbone stage features
+            return [self.prepare_input(feature) for feature in frames]
+        if self.channels_last and frames.dim() == 4:
+            return frames.contiguous(memory_format=torch.channels_last)
+        return frames
+
+    def backward(self, loss: torch.Tensor) -> None:
+        # With the scaler disabled these calls are plain backward/step
+        self.scaler.scale(loss).backward()
+
+    def step(
+        self,
+        optimizer: torch.optim.Optimizer,
+        parameters,
+        grad_clip: Optional[float] = None
+    ) -> None:
+        if grad_clip:
+            self.scaler.unscale_(optimizer)
+            torch.nn.utils.clip_grad_norm_(parameters, grad_clip)
+        self.scaler.step(optimizer)
+        self.scaler.update()
+
+    def backward_and_step(
+        self,
+        loss: torch.Tensor,
+        optimizer: torch.optim.Optimizer,
+        parameters,
+        grad_clip: Optional[float] = None
+    ) -> None:
+        self.backward(loss)
+        self.step(optimizer, parameters, grad_clip)
+
+def measure_step_time(
+    model: nn.Module,
+    batch: Tuple[torch.Tensor, Optional[torch.Tensor], Dict[str, torch.Tensor]],
+    policy: PrecisionPolicy,
+    loss_fn: Callable,
+    num_steps: int = 10,
+    warmup_steps: int = 2
+) -> float:
+    # Mean training step time in ms on a private copy of the model
+    model = policy.prepare_model(copy.deepcopy(model)).train()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.0)
+    frames, temporal_frames, targets = batch
+    frames = policy.prepare_input(frames)
+
+    def step() -> None:
+        optimizer.zero_grad(set_to_none=True)
+        with policy.autocast():
+            predictions = model(frames, temporal_frames, temporal_is_features=False)
+            loss, _ = loss_fn(model, predictions, targets)
+        policy.backward_and_step(loss, optimizer, model.parameters())
+
+    for _ in range(warmup_steps):
+        step()
+    if policy.device.type == "cuda":
+        torch.cuda.synchronize()
+
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        step()
+    if policy.device.type == "cuda":
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) * 1000.0 / num_steps
+
+def compare_step_times(
+    model: nn.Module,
+    batch: Tuple[torch.Tensor, Optional[torch.Tensor], Dict[str, torch.Tensor]],
+    device: torch.device,
+    loss_fn: Callable,
+    precisions: Sequence[str] = ("float32", "mixed"),
+    channels_last: Sequence[bool] = (False, True),
+    num_steps: int = 10
+) -> Dict[str, float]:
+    results = {}
+    for precision in precisions:
+        for use_channels_last in channels_last:
+            policy = PrecisionPolicy(precision, device, channels_last=use_channels_last)
+            key = f"{policy.name}{'_channels_last' if use_channels_last else ''}"
+            results[key] = measure_step_time(model, batch, policy, loss_fn, num_steps=num_steps)
+    return results
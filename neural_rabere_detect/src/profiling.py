@@ -0,0 +1,305 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+import torch
+import torch.nn as nn
+import numpy as np
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+
+from .model import DeformableConv2d, RabereActivityNet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODULES = (
+    "backbone",
+    "fpn",
+    "detection_heads",
+    "activity_head",
+    "activity_head.conv_3d",
+    "activity_head.temporal_attention",
+    "activity_head.lstm"
+)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return 0
+
+def _tensor_bytes(output: Any) -> int:
+    if isinstance(output, torch.Tensor):
+        return output.numel() * output.element_size()
+    if isinstance(output, (list, tuple)):
+        return sum(_tensor_bytes(item) for item in output)
+    if isinstance(output, dict):
+        return sum(_tensor_bytes(item) for item in output.values())
+    return 0
+
+def _first_tensor(value: Any) -> Optional[torch.Tensor]:
+    if isinstance(value, torch.Tensor):
+        return value
+    if isinstance(value, (list, tuple)) and value:
+        return _first_tensor(value[0])
+    return None
+
+def estimate_flops(module: nn.Module, inputs: tuple, output: Any) -> int:
+    # Multiply-adds counted as two FLOPs, for the layers that dominate cost
+    out = _first_tensor(output)
+    if out is None:
+        return 0
+
+    if isinstance(module, (nn.Conv1d, nn.Conv2d, nn.Conv3d)):
+        kernel = math.prod(module.kernel_size)
+        return 2 * out.numel() * (module.in_channels // module.groups) * kernel
+
+    if isinstance(module, DeformableConv2d):
+        # The sampling convolution runs through deform_conv2d, not
+        # module.conv; offset_conv is counted by its own hook
+        conv = module.conv
+        return 2 * out.numel() * (conv.in_channels // conv.groups) * math.prod(conv.kernel_size)
+
+    if isinstance(module, nn.Linear):
+        return 2 * out.numel() * module.in_features
+
+    if isinstance(module, nn.LSTM):
+        x = inputs[0]
+        steps = x.shape[0] * x.shape[1]  # batch * time
+        directions = 2 if module.bidirectional else 1
+        flops = 0
+        input_size = module.input_size
+        for _ in range(module.num_layers):
+            gates = 4 * module.hidden_size
+            flops += 2 * steps * directions * gates * (input_size + module.hidden_size)
+            input_size = module.hidden_size * directions
+        return flops
+
+    if isinstance(module, nn.MultiheadAttention):
+        query = inputs[0]
+        tokens = query.shape[0] * query.shape[1]
+        length = query.shape[1] if module.batch_first else query.shape[0]
+        E = module.embed_dim
+        projections = 2 * tokens * E * 4 * E  # q, k, v and output
+        attention = 2 * 2 * tokens * length * E  # scores and weighted sum
+        return projections + attention
+
+    return 0
+
+_FLOP_TYPES = (nn.Conv1d, nn.Conv2d, nn.Conv3d, DeformableConv2d, nn.Linear, nn.LSTM, nn.MultiheadAttention)
+
+class ModuleProfiler:
+    def __init__(
+        self,
+        model: nn.Module,
+        module_names: Sequence[str] = DEFAULT_MODULES,
+        synchronize: Optional[bool] = None,
+        max_trace_events: int = 100000
+    ):
+        self.model = model
+        self.module_names = list(module_names)
+        # Device work is asynchronous, so timings need a sync on CUDA
+        self.synchronize = torch.cuda.is_available() if synchronize is None else synchronize
+        self.max_trace_events = max_trace_events
+
+        self._handles: List[Any] = []
+        self._open: Dict[str, List[Dict[str, float]]] = defaultdict(list)
+        self._active: List[str] = []
+        self._origin = time.perf_counter_ns()
+        self.records: Dict[str, List[Dict[str, float]]] = defaultdict(list)
+        self.trace_events: List[Dict[str, Any]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._handles)
+
+    def enable(self) -> "ModuleProfiler":
+        # Hooks only exist while profiling, so a disabled profiler costs nothing
+        if self.enabled:
+            return self
+
+        leaves = {}
+        for name in self._resolve_names():
+            module = self.model.get_submodule(name)
+            self._handles.append(module.register_forward_pre_hook(self._pre_hook(name)))
+            self._handles.append(module.register_forward_hook(self._post_hook(name)))
+
+            for leaf in module.modules():
+                if isinstance(leaf, _FLOP_TYPES):
+                    leaves[id(leaf)] = leaf
+
+        # One FLOP hook per layer, even when profiled modules are nested. It
+        # runs ahead of the timing hooks, so a profiled layer such as an LSTM
+        # is still active when its own FLOPs are credited
+        for leaf in leaves.values():
+            self._handles.append(leaf.register_forward_hook(self._flop_hook, prepend=True))
+
+        return self
+
+    def _resolve_names(self) -> List[str]:
+        # Containers such as ModuleList are never called themselves, so
+        # their children are profiled instead
+        names = []
+        for name in self.module_names:
+            module = self.model.get_submodule(name)
+            if isinstance(module, nn.ModuleList):
+                names.extend(f"{name}.{idx}" for idx in range(len(module)))
+            else:
+                names.append(name)
+        return names
+
+    def disable(self) -> None:
+        for handle in self._handles:
+            handle.remove()
+        self._handles.clear()
+        self._open.clear()
+        self._active.clear()
+
+    def reset(self) -> None:
+        self.records.clear()
+        self.trace_events.clear()
+        self._origin = time.perf_counter_ns()
+
+    def __enter__(self) -> "ModuleProfiler":
+        return self.enable()
+
+    def __exit__(self, *exc) -> None:
+        self.disable()
+
+    def _memory(self) -> int:
+        if torch.cuda.is_available():
+            return torch.cuda.memory_allocated()
+        return _rss_bytes()
+
+    def _pre_hook(self, name: str):
+        def hook(module: nn.Module, inputs: tuple) -> None:
+            if self.synchronize:
+                torch.cuda.synchronize()
+            self._open[name].append({
+                "start_ns": time.perf_counter_ns(),
+                "memory": self._memory(),
+                "flops": 0
+            })
+            self._active.append(name)
+        return hook
+
+    def _post_hook(self, name: str):
+        def hook(module: nn.Module, inputs: tuple, output: Any) -> None:
+            if self.synchronize:
+                torch.cuda.synchronize()
+            end_ns = time.perf_counter_ns()
+            call = self._open[name].pop()
+            self._active.remove(name)
+
+            record = {
+                "time_ms": (end_ns - call["start_ns"]) / 1e6,
+                "output_bytes": _tensor_bytes(output),
+                "allocated_bytes": self._memory() - call["memory"],
+                "flops": call["flops"]
+            }
+            self.records[name].append(record)
+
+            if len(self.trace_events) < self.max_trace_events:
+                self.trace_events.append({
+                    "name": name,
+                    "ph": "X",
+                    "ts": (call["start_ns"] - self._origin) / 1e3,
+                    "dur": (end_ns - call["start_ns"]) / 1e3,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": record
+                })
+        return hook
+
+    def _flop_hook(self, module: nn.Module, inputs: tuple, output: Any) -> None:
+        # Credited to every profiled module the layer is running inside
+        flops = estimate_flops(module, inputs, output)
+        for name in set(self._active):
+            self._open[name][-1]["flops"] += flops
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        for name, records in self.records.items():
+            times = np.asarray([record["time_ms"] for record in records])
+            flops = np.asarray([record["flops"] for record in records], dtype=np.float64)
+            summary[name] = {
+                "calls": len(records),
+                "total_ms": float(times.sum()),
+                "mean_ms": float(times.mean()),
+                "p50_ms": float(np.percentile(times, 50)),
+                "p90_ms": float(np.percentile(times, 90)),
+                "p99_ms": float(np.percentile(times, 99)),
+                "mean_output_mb": float(np.mean([record["output_bytes"] for record in records])) / 2**20,
+                "mean_allocated_mb": float(np.mean([record["allocated_bytes"] for record in records])) / 2**20,
+                "mean_gflops": float(flops.mean()) / 1e9,
+                "gflops_per_sec": float(flops.sum() / times.sum() / 1e6) if times.sum() > 0 else 0.0
+            }
+        return summary
+
+    def export_json(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump({
+                "memory_source": "cuda_allocated" if torch.cuda.is_available() else "process_rss",
+                "modules": self.summary()
+            }, f, indent=2)
+
+    def export_chrome_trace(self, path: str) -> None:
+        # Loadable in chrome://tracing or Perfetto
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": self.trace_events, "displayTimeUnit": "ms"}, f)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-module profile of RabereActivityNet forward passes")
+    parser.add_argument("--backbone", default="resnext101_32x8d")
+    parser.add_argument("--temporal-length", type=int, default=16)
+    parser.add_argument("--temporal-tokens", default="pool", choices=["pool", "grid"])
+    parser.add_argument("--image-size", type=int, nargs=2, default=[640, 640])
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES))
+    parser.add_argument("--output", default="module_profile.json")
+    parser.add_argument("--trace", default="module_trace.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    model = RabereActivityNet(
+        backbone=args.backbone,
+        pretrained=False,
+        temporal_length=args.temporal_length,
+        temporal_tokens=args.temporal_tokens
+    ).eval()
+
+    frames = torch.randn(args.batch_size, 3, *args.image_size)
+    temporal_frames = None
+    if args.temporal_length > 1:
+        temporal_frames = torch.randn(args.batch_size, args.temporal_length - 1, 3, *args.image_size)
+
+    profiler = ModuleProfiler(model, [name for name in args.modules.split(",") if name])
+    with torch.no_grad():
+        for _ in range(args.warmup):
+            model(frames, temporal_frames, temporal_is_features=False)
+
+        with profiler:
+            for _ in range(args.iterations):
+                model(frames, temporal_frames, temporal_is_features=False)
+
+    profiler.export_json(args.output)
+    profiler.export_chrome_trace(args.trace)
+
+    for name, stats in profiler.summary().items():
+        logger.info(
+            f"{name}: {stats['calls']} calls, p50 {stats['p50_ms']:.1f} ms, "
+            f"{stats['mean_gflops']:.2f} GFLOPs/call"
+        )
+    logger.info(f"Wrote {args.output} and {args.trace}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import argparse
+import copy
+import io
+import json
+import time
+import torch
+import torch.nn as nn
+import numpy as np
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.fx.custom_config import PrepareCustomConfig
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+from torch.utils.data import DataLoader
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from .dataset import create_data_loaders
+from .model import DeformableConv2d, RabereActivityNet
+
+logger = logging.getLogger(__name__)
+
+# Convolutional parts that get static int8 with calibrated activations
+STATIC_MODULES = ("backbone", "fpn", "detection_heads")
+
+def _iter_batches(loader: DataLoader, num_batches: int) -> Iterable[Tuple[torch.Tensor, Optional[torch.Tensor]]]:
+    # Loader batches carry raw temporal frames, not backbone features
+    for batch_idx, (frames, temporal_frames, _) in enumerate(loader):
+        if batch_idx >= num_batches:
+            break
+        yield frames, temporal_frames
+
+def _set_submodule(model: nn.Module, name: str, module: nn.Module) -> None:
+    parent_name, _, child_name = name.rpartition(".")
+    parent = model.get_submodule(parent_name) if parent_name else model
+    setattr(parent, child_name, module)
+
+def _static_targets(model: RabereActivityNet) -> List[str]:
+    names = []
+    for name in STATIC_MODULES:
+        module = model.get_submodule(name)
+        if isinstance(module, nn.ModuleList):
+            names.extend(f"{name}.{idx}" for idx in range(len(module)))
+        else:
+            names.append(name)
+    return names
+
+@torch.no_grad()
+def _capture_inputs(
+    model: nn.Module,
+    names: List[str],
+    frames: torch.Tensor,
+    temporal_frames: Optional[torch.Tensor]
+) -> Dict[str, tuple]:
+    # Example inputs for FX preparation, taken from one float forward
+    captured = {}
+
+    def capture(name: str):
+        # Pre-hooks that return a value replace the module's inputs, so this
+        # one must return None: the backbone runs again on temporal frames
+        def hook(module: nn.Module, args: tuple) -> None:
+            captured.setdefault(name, args)
+        return hook
+
+    handles = [
+        model.get_submodule(name).register_forward_pre_hook(capture(name))
+        for name in names
+    ]
+    try:
+        model(frames, temporal_frames, temporal_is_features=False)
+    finally:
+        for handle in handles:
+            handle.remove()
+    return captured
+
+@torch.no_grad()
+def quantize_model(
+    model: RabereActivityNet,
+    calibration_loader: DataLoader,
+    num_calibration_batches: int = 8,
+    backend: str = "x86",
+    static: bool = True,
+    dynamic: bool = True
+) -> RabereActivityNet:
+    torch.backends.quantized.engine = backend
+    model = copy.deepcopy(model).cpu().eval()
+
+    if static:
+        # Deformable convolutions have no int8 kernel and are not FX
+        # traceable; they stay float, with (de)quantization around them
+        qconfig_mapping = get_default_qconfig_mapping(backend).set_object_type(DeformableConv2d, None)
+        custom_config = PrepareCustomConfig().set_non_traceable_module_classes([DeformableConv2d])
+        names = _static_targets(model)
+        batches = _iter_batches(calibration_loader, num_calibration_batches)
+
+        first = next(batches)
+        example_inputs = _capture_inputs(model, names, *first)
+
+        # Observers are inserted in place, so calibration runs the whole
+        # network and every part sees the activations it will see at runtime
+        for name in names:
+            prepared = prepare_fx(
+                model.get_submodule(name),
+                qconfig_mapping,
+                example_inputs[name],
+                prepare_custom_config=custom_config
+            )
+            _set_submodule(model, name, prepared)
+
+        model(*first, temporal_is_features=False)
+        for frames, temporal_frames in batches:
+            model(frames, temporal_frames, temporal_is_features=False)
+
+        for name in names:
+            _set_submodule(model, name, convert_fx(model.get_submodule(name)))
+
+    if dynamic:
+        # Weights-only int8 for the recurrent and fully connected layers
+        model.activity_head = quantize_dynamic(
+            model.activity_head,
+            {nn.LSTM, nn.Linear},
+            dtype=torch.qint8
+        )
+
+    return model
+
+def model_size_mb(model: nn.Module) -> float:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2**20
+
+@torch.no_grad()
+def measure_latency(
+    model: nn.Module,
+    frames: torch.Tensor,
+    temporal_frames: Optional[torch.Tensor],
+    num_runs: int = 20,
+    warmup_runs: int = 3
+) -> Dict[str, float]:
+    for _ in range(warmup_runs):
+        model(frames, temporal_frames, temporal_is_features=False)
+
+    latencies = []
+    for _ in range(num_runs):
+        start = time.perf_counter()
+        model(frames, temporal_frames, temporal_is_features=False)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    latencies = np.asarray(latencies)
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "mean_ms": float(latencies.mean())
+    }
+
+@torch.no_grad()
+def output_errors(
+    reference: nn.Module,
+    candidate: nn.Module,
+    loader: DataLoader,
+    num_batches: int = 8
+) -> Dict[str, float]:
+    sums = {"bbox": 0.0, "objectness": 0.0, "activity": 0.0}
+    maxima = dict.fromkeys(sums, 0.0)
+    count = 0
+
+    for frames, temporal_frames in _iter_batches(loader, num_batches):
+        expected = reference(frames, temporal_frames, temporal_is_features=False)
+        actual = candidate(frames, temporal_frames, temporal_is_features=False)
+        for name in sums:
+            diff = (expected[name] - actual[name]).abs()
+            sums[name] += float(diff.mean())
+            maxima[name] = max(maxima[name], float(diff.max()))
+        count += 1
+
+    errors = {}
+    for name in sums:
+        errors[f"{name}_mae"] = sums[name] / max(count, 1)
+        errors[f"{name}_max_error"] = maxima[name]
+    return errors
+
+def quantization_report(
+    fp32_model: RabereActivityNet,
+    int8_model: RabereActivityNet,
+    eval_loader: DataLoader,
+    num_eval_batches: int = 8,
+    latency_runs: int = 20
+) -> Dict[str, object]:
+    frames, temporal_frames = next(_iter_batches(eval_loader, 1))
+
+    fp32_latency = measure_latency(fp32_model, frames, temporal_frames, num_runs=latency_runs)
+    int8_latency = measure_latency(int8_model, frames, temporal_frames, num_runs=latency_runs)
+    fp32_size = model_size_mb(fp32_model)
+    int8_size = model_size_mb(int8_model)
+
+    return {
+        "latency": {
+            "batch_size": frames.shape[0],
+            "fp32": fp32_latency,
+            "int8": int8_latency,
+            "speedup": fp32_latency["p50_ms"] / int8_latency["p50_ms"]
+        },
+        "size_mb": {
+            "fp32": fp32_size,
+            "int8": int8_size,
+            "compression": fp32_size / int8_size
+        },
+        "errors": output_errors(fp32_model, int8_model, eval_loader, num_eval_batches)
+    }
+
+def check_tolerance(report: Dict[str, object], max_bbox_error: float, max_activity_error: float) -> None:
+    errors = report["errors"]
+    failures = []
+    if errors["bbox_mae"] > max_bbox_error:
+        failures.append(f"bbox MAE {errors['bbox_mae']:.4f} > {max_bbox_error}")
+    if errors["activity_mae"] > max_activity_error:
+        failures.append(f"activity MAE {errors['activity_mae']:.4f} > {max_activity_error}")
+    if failures:
+        raise RuntimeError("Quantized model regresses past tolerance: " + "; ".join(failures))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Post-training int8 quantization of RabereActivityNet")
+    parser.add_argument("--checkpoint", required=True)
+    parser.add_argument("--data-path", required=True)
+    parser.add_argument("--output", default="models/rabere_int8.pt")
+    parser.add_argument("--report", default="quantization_report.json")
+    parser.add_argument("--backbone", default="resnext101_32x8d")
+    parser.add_argument("--temporal-length", type=int, default=16)
+    parser.add_argument("--temporal-tokens", default="pool", choices=["pool", "grid"])
+    parser.add_argument("--temporal-grid-size", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--num-workers", type=int, default=2)
+    parser.add_argument("--backend", default="x86", choices=["x86", "fbgemm", "qnnpack"])
+    parser.add_argument("--calibration-batches", type=int, default=8)
+    parser.add_argument("--eval-batches", type=int, default=8)
+    parser.add_argument("--latency-runs", type=int, default=20)
+    parser.add_argument("--no-static", action="store_true")
+    parser.add_argument("--no-dynamic", action="store_true")
+    parser.add_argument("--max-bbox-error", type=float, default=0.02)
+    parser.add_argument("--max-activity-error", type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    model = RabereActivityNet(
+        backbone=args.backbone,
+        pretrained=False,
+        temporal_length=args.temporal_length,
+        temporal_tokens=args.temporal_tokens,
+        temporal_grid_size=args.temporal_grid_size
+    )
+    state = torch.load(args.checkpoint, map_location="cpu")
+    model.load_state_dict(state.get("model_state_dict", state))
+    model.eval()
+
+    # Calibrate on the validation split, measure errors on the test split
+    _, val_loader, test_loader = create_data_loaders(
+        args.data_path,
+        batch_size=args.batch_size,
+        num_workers=args.num_workers,
+        temporal_length=args.temporal_length
+    )
+
+    int8_model = quantize_model(
+        model,
+        val_loader,
+        num_calibration_batches=args.calibration_batches,
+        backend=args.backend,
+        static=not args.no_static,
+        dynamic=not args.no_dynamic
+    )
+
+    report = quantization_report(
+        model,
+        int8_model,
+        test_loader,
+        num_eval_batches=args.eval_batches,
+        latency_runs=args.latency_runs
+    )
+    report["config"] = vars(args)
+
+    # The report is written either way so regressions can be inspected
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote quantization report to {args.report}")
+
+    check_tolerance(report, args.max_bbox_error, args.max_activity_error)
+
+    torch.save(int8_model, args.output)
+    logger.info(
+        f"Wrote int8 model to {args.output} "
+        f"({report['size_mb']['int8']:.1f} MB, {report['latency']['speedup']:.2f}x faster)"
+    )
+
+if __name__ == "__main__":
+    main()
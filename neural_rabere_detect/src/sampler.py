@@ -0,0 +1,77 @@
+import random
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Iterator, List
+from torch.utils.data import Sampler
+
+class SequenceLocalitySampler(Sampler[int]):
+    def __init__(
+        self,
+        frame_indices: np.ndarray,
+        batch_size: int,
+        num_workers: int,
+        chunk_size: int = 64,
+        sequences_per_batch: int = 4,
+        seed: int = 0
+    ):
+        self.frame_indices = frame_indices
+        self.batch_size = batch_size
+        self.num_workers = max(1, num_workers)
+        self.chunk_size = chunk_size
+        self.sequences_per_batch = max(1, sequences_per_batch)
+        self.seed = seed
+        self.epoch = 0
+
+        self._windows_by_sequence: Dict[int, List[int]] = defaultdict(list)
+        for idx, seq_idx in enumerate(np.asarray(frame_indices)[:, 0].tolist()):
+            self._windows_by_sequence[seq_idx].append(idx)
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def __len__(self) -> int:
+        return len(self.frame_indices)
+
+    def __iter__(self) -> Iterator[int]:
+        rng = random.Random(self.seed + self.epoch)
+
+        # Split every sequence into runs of neighbouring windows, which share
+        # most of their frames
+        chunks = []
+        for windows in self._windows_by_sequence.values():
+            for i in range(0, len(windows), self.chunk_size):
+                chunks.append(windows[i:i + self.chunk_size])
+        rng.shuffle(chunks)
+
+        # Deal chunks to one lane per worker, keeping lanes balanced
+        lanes: List[List[int]] = [[] for _ in range(self.num_workers)]
+        for group_start in range(0, len(chunks), self.sequences_per_batch):
+            group = chunks[group_start:group_start + self.sequences_per_batch]
+            lane = min(lanes, key=len)
+
+            # Mix a few chunks together so batches still span several sequences
+            mixed = [idx for chunk in group for idx in chunk]
+            rng.shuffle(mixed)
+            lane.extend(mixed)
+
+        # DataLoader hands batch k to worker k % num_workers, so the lanes are
+        # emitted round-robin one whole batch at a time. A partial batch would
+        # shift every later batch off its lane, so the lanes are first evened
+        # out to the same number of whole batches, moving windows off the
+        # ends of the longest lanes; fewer than one batch per lane is left
+        # over, and it goes last
+        rounds = len(self.frame_indices) // (self.batch_size * self.num_workers)
+        lane_size = rounds * self.batch_size
+        leftover = [idx for lane in lanes for idx in lane[lane_size:]]
+        lanes = [lane[:lane_size] for lane in lanes]
+        for lane in lanes:
+            missing = lane_size - len(lane)
+            lane.extend(leftover[:missing])
+            del leftover[:missing]
+
+        for batch_idx in range(rounds):
+            for lane in lanes:
+                start = batch_idx * self.batch_size
+                yield from lane[start:start + self.batch_size]
+
+        yield from leftover
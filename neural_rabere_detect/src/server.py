@@ -0,0 +1,460 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import cv2
+import torch
+import numpy as np
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import logging
+
+from .inference import CascadeInference, StreamingInference
+from .model import RabereActivityNet
+from .postprocess import ActivitySmoother, DetectionPostProcessor
+
+logger = logging.getLogger(__name__)
+
+class InferenceError(RuntimeError):
+    # The model or postprocessing failed on a batch; not the client's fault
+    pass
+
+class InferenceRequest:
+    def __init__(self, camera_id: Hashable, frame: torch.Tensor):
+        self.camera_id = camera_id
+        self.frame = frame
+        self.enqueued_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.future: Future = Future()
+
+class LatencyMetrics:
+    def __init__(self, window: int = 10000):
+        self._lock = threading.Lock()
+        self._queue_ms = deque(maxlen=window)
+        self._inference_ms = deque(maxlen=window)
+        self._total_ms = deque(maxlen=window)
+        self.counters = {
+            "accepted": 0,
+            "completed": 0,
+            "shed": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "batches": 0,
+            "batched_requests": 0
+        }
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def record(self, queue_ms: float, inference_ms: float, total_ms: float) -> None:
+        with self._lock:
+            self._queue_ms.append(queue_ms)
+            self._inference_ms.append(inference_ms)
+            self._total_ms.append(total_ms)
+            self.counters["completed"] += 1
+
+    @staticmethod
+    def _summary(values: List[float]) -> Dict[str, float]:
+        if not values:
+            return {}
+        values = np.asarray(values)
+        return {
+            "p50": float(np.percentile(values, 50)),
+            "p90": float(np.percentile(values, 90)),
+            "p99": float(np.percentile(values, 99)),
+            "max": float(values.max())
+        }
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counters = dict(self.counters)
+            queue_ms, inference_ms, total_ms = list(self._queue_ms), list(self._inference_ms), list(self._total_ms)
+
+        batches = counters["batches"]
+        return {
+            **counters,
+            "mean_batch_size": counters["batched_requests"] / batches if batches else 0.0,
+            "queue_ms": self._summary(queue_ms),
+            "inference_ms": self._summary(inference_ms),
+            "total_ms": self._summary(total_ms)
+        }
+
+class BatchWorker(threading.Thread):
+    def __init__(
+        self,
+        engine: StreamingInference,
+        postprocessor: DetectionPostProcessor,
+        smoother: ActivitySmoother,
+        metrics: LatencyMetrics,
+        max_batch_size: int,
+        max_latency: float,
+        max_queue_size: int
+    ):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.postprocessor = postprocessor
+        self.smoother = smoother
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.requests: "queue.Queue[Optional[InferenceRequest]]" = queue.Queue(maxsize=max_queue_size)
+
+        # Request held back from a batch that already had its camera
+        self._deferred: Optional[InferenceRequest] = None
+
+    def submit(self, request: InferenceRequest) -> None:
+        # Raises queue.Full, which the server turns into load shedding
+        self.requests.put_nowait(request)
+
+    def stop(self) -> None:
+        self.requests.put(None)
+
+    def _collect_batch(self, first: InferenceRequest) -> List[InferenceRequest]:
+        batch = [first]
+        cameras = {first.camera_id}
+        deadline = first.enqueued_at + self.max_latency
+
+        # Wait for more requests until the batch is full or the oldest
+        # request's latency budget is spent
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self.requests.put(None)
+                break
+            if request.camera_id in cameras:
+                # A camera's frames must be processed in order, one per batch
+                self._deferred = request
+                break
+            batch.append(request)
+            cameras.add(request.camera_id)
+
+        return batch
+
+    def run(self) -> None:
+        while True:
+            if self._deferred is not None:
+                first, self._deferred = self._deferred, None
+            else:
+                first = self.requests.get()
+            if first is None:
+                break
+
+            # Requests whose caller already timed out were cancelled and are
+            # dropped here; the rest can no longer be cancelled
+            batch = [
+                request for request in self._collect_batch(first)
+                if request.future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            for request in batch:
+                request.started_at = start
+
+            camera_ids = [request.camera_id for request in batch]
+            try:
+                frames = torch.stack([request.frame for request in batch])
+                outputs = self.engine.process_batch(camera_ids, frames)
+                
+                # Decoding, NMS and smoothing run once for the whole batch
+                detections = self.postprocessor(outputs)
+                smoothed = self.smoother(camera_ids, outputs["activity"])
+            except Exception as e:
+                logger.exception("Batch inference failed")
+                self.metrics.increment("errors", len(batch))
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            self.metrics.increment("batches")
+            self.metrics.increment("batched_requests", len(batch))
+            for i, request in enumerate(batch):
+                num_detections = int(detections["num_detections"][i])
+                request.future.set_result({
+                    "activity": float(outputs["activity"][i]),
+                    "smoothed_activity": float(smoothed[i]),
+                    "boxes": detections["boxes"][i, :num_detections].tolist(),
+                    "scores": detections["scores"][i, :num_detections].tolist()
+                })
+
+class InferenceServer:
+    def __init__(
+        self,
+        model: RabereActivityNet,
+        image_size: Tuple[int, int] = (640, 640),
+        max_batch_size: int = 8,
+        max_latency_ms: float = 20.0,
+        max_queue_size: int = 64,
+        num_workers: Optional[int] = None,
+        num_threads: Optional[int] = None,
+        max_request_bytes: int = 16 * 2**20,
+        confidence_threshold: float = 0.5,
+        nms_threshold: float = 0.45,
+        activity_smoothing_window: int = 5,
+        cascade: bool = False,
+        motion_threshold: float = 0.05,
+        objectness_threshold: float = 0.3
+    ):
+        cores = os.cpu_count() or 1
+        self.num_workers = num_workers or max(1, cores // 4)
+        # torch's intra-op thread pool is process-wide and shared by all
+        # workers, so it is sized once here; by default the workers running
+        # at the same time roughly fill the cores
+        self.num_threads = num_threads or max(1, cores // self.num_workers)
+        torch.set_num_threads(self.num_threads)
+        self.max_request_bytes = max_request_bytes
+
+        self.image_size = image_size
+        self.mean = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255.0
+        self.std = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255.0
+        self.metrics = LatencyMetrics()
+
+        # Cameras are pinned to one worker so their feature buffers are only
+        # ever touched by a single thread, and their frames stay in order
+        model.eval()
+
+        def make_engine() -> StreamingInference:
+            if cascade:
+                return CascadeInference(
+                    model,
+                    motion_threshold=motion_threshold,
+                    objectness_threshold=objectness_threshold
+                )
+            return StreamingInference(model)
+
+        self.workers = [
+            BatchWorker(
+                make_engine(),
+                DetectionPostProcessor(
+                    image_size=image_size,
+                    confidence_threshold=confidence_threshold,
+                    nms_threshold=nms_threshold
+                ),
+                ActivitySmoother(window=activity_smoothing_window),
+                self.metrics,
+                max_batch_size=max_batch_size,
+                max_latency=max_latency_ms / 1000.0,
+                max_queue_size=max_queue_size
+            )
+            for _ in range(self.num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def preprocess(self, image_bytes: bytes) -> torch.Tensor:
+        if not image_bytes:
+            raise ValueError("Empty request body")
+        try:
+            image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        except cv2.error as e:
+            raise ValueError(f"Could not decode image: {e}") from e
+        if image is None:
+            raise ValueError("Could not decode image")
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if image.shape[:2] != tuple(self.image_size):
+            image = cv2.resize(image, (self.image_size[1], self.image_size[0]))
+        image = (image.astype(np.float32) - self.mean) / self.std
+        return torch.from_numpy(image).permute(2, 0, 1).contiguous()
+
+    def submit(self, camera_id: Hashable, frame: torch.Tensor) -> InferenceRequest:
+        request = InferenceRequest(camera_id, frame)
+        worker = self.workers[hash(camera_id) % len(self.workers)]
+        try:
+            worker.submit(request)
+        except queue.Full:
+            self.metrics.increment("shed")
+            raise
+        self.metrics.increment("accepted")
+        return request
+
+    def infer(self, camera_id: Hashable, image_bytes: bytes, timeout: float = 5.0) -> Dict[str, object]:
+        request = self.submit(camera_id, self.preprocess(image_bytes))
+        try:
+            output = request.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Unless the worker has started on it, the frame is skipped
+            request.future.cancel()
+            self.metrics.increment("timeouts")
+            raise
+        except Exception as e:
+            raise InferenceError(f"Inference failed: {e}") from e
+
+        done = time.perf_counter()
+        queue_ms = (request.started_at - request.enqueued_at) * 1000.0
+        inference_ms = (done - request.started_at) * 1000.0
+        total_ms = (done - request.enqueued_at) * 1000.0
+        self.metrics.record(queue_ms, inference_ms, total_ms)
+
+        return {
+            "camera_id": camera_id,
+            **output,
+            "latency_ms": {
+                "queue": queue_ms,
+                "inference": inference_ms,
+                "total": total_ms
+            }
+        }
+
+    def snapshot(self) -> Dict[str, object]:
+        snapshot = self.metrics.snapshot()
+        cascade_stats = [worker.engine.stats() for worker in self.workers if isinstance(worker.engine, CascadeInference)]
+        if cascade_stats:
+            counters = {
+                key: sum(stats[key] for stats in cascade_stats)
+                for key in ("frames", "motion_skipped", "objectness_skipped", "full_runs")
+            }
+            frames = counters["frames"]
+            snapshot["cascade"] = {
+                **counters,
+                "motion_skip_rate": counters["motion_skipped"] / frames if frames else 0.0,
+                "objectness_skip_rate": counters["objectness_skipped"] / frames if frames else 0.0
+            }
+        return snapshot
+
+    def shutdown(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            worker.join()
+
+def make_handler(server: InferenceServer):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: Dict[str, object]) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if urlparse(self.path).path == "/metrics":
+                self._send_json(200, server.snapshot())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            url = urlparse(self.path)
+            if url.path != "/infer":
+                self._send_json(404, {"error": "not found"})
+                return
+
+            camera_id = parse_qs(url.query).get("camera", [None])[0] or self.headers.get("X-Camera-Id")
+            if camera_id is None:
+                self._send_json(400, {"error": "missing camera id"})
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                if length < 0:
+                    raise ValueError(f"Invalid Content-Length {length}")
+                if length > server.max_request_bytes:
+                    # Refused before the body is read; the unread body
+                    # means the connection cannot be reused
+                    self.close_connection = True
+                    self._send_json(413, {"error": f"request body over {server.max_request_bytes} bytes"})
+                    return
+                body = self.rfile.read(length)
+                result = server.infer(camera_id, body)
+            except queue.Full:
+                # Shed load instead of letting the queue grow without bound
+                self._send_json(503, {"error": "overloaded"})
+            except FutureTimeoutError:
+                self._send_json(504, {"error": "inference timed out"})
+            except ValueError as e:
+                # Bad Content-Length, or a body that is not a decodable image
+                self._send_json(400, {"error": str(e)})
+            except InferenceError as e:
+                self._send_json(500, {"error": str(e)})
+            except Exception as e:
+                logger.exception("Request failed")
+                self._send_json(500, {"error": str(e)})
+            else:
+                self._send_json(200, result)
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug(format % args)
+
+    return Handler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local dynamic-batching inference server")
+    parser.add_argument("--checkpoint", required=True)
+    parser.add_argument("--backbone", default="resnext101_32x8d")
+    parser.add_argument("--temporal-length", type=int, default=16)
+    parser.add_argument("--temporal-tokens", default="pool", choices=["pool", "grid"])
+    parser.add_argument("--temporal-grid-size", type=int, default=2)
+    parser.add_argument("--image-size", type=int, nargs=2, default=[640, 640])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-latency-ms", type=float, default=20.0)
+    parser.add_argument("--max-queue-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--num-threads", type=int, default=None, help="intra-op threads for the whole process")
+    parser.add_argument("--max-request-bytes", type=int, default=16 * 2**20)
+    parser.add_argument("--confidence-threshold", type=float, default=0.5)
+    parser.add_argument("--nms-threshold", type=float, default=0.45)
+    parser.add_argument("--activity-smoothing-window", type=int, default=5)
+    parser.add_argument("--cascade", action="store_true")
+    parser.add_argument("--motion-threshold", type=float, default=0.05)
+    parser.add_argument("--objectness-threshold", type=float, default=0.3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    model = RabereActivityNet(
+        backbone=args.backbone,
+        pretrained=False,
+        temporal_length=args.temporal_length,
+        temporal_tokens=args.temporal_tokens,
+        temporal_grid_size=args.temporal_grid_size
+    )
+    state = torch.load(args.checkpoint, map_location="cpu")
+    model.load_state_dict(state.get("model_state_dict", state))
+
+    server = InferenceServer(
+        model,
+        image_size=tuple(args.image_size),
+        max_batch_size=args.max_batch_size,
+        max_latency_ms=args.max_latency_ms,
+        max_queue_size=args.max_queue_size,
+        num_workers=args.workers,
+        num_threads=args.num_threads,
+        max_request_bytes=args.max_request_bytes,
+        confidence_threshold=args.confidence_threshold,
+        nms_threshold=args.nms_threshold,
+        activity_smoothing_window=args.activity_smoothing_window,
+        cascade=args.cascade,
+        motion_threshold=args.motion_threshold,
+        objectness_threshold=args.objectness_threshold
+    )
+
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(server))
+    logger.info(
+        f"Serving on http://{args.host}:{args.port} with {server.num_workers} workers "
+        f"sharing {server.num_threads} threads"
+    )
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
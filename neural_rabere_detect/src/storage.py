@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+import os
+from pathlib import Path
+from typing import Tuple, Optional
+import logging
+
+# Packed sequences keep all frames of a sequence in one uint8 [N, H, W, 3]
+# RGB array next to (or instead of) the per-frame JPEGs.
+PACKED_FRAMES_FILE = "frames.npy"
+
+logger = logging.getLogger(__name__)
+
+def packed_frames_path(seq_path: Path) -> Path:
+    return Path(seq_path) / PACKED_FRAMES_FILE
+
+def is_packed_sequence(seq_path: Path) -> bool:
+    return packed_frames_path(seq_path).is_file()
+
+def create_packed_sequence(
+    seq_path: Path,
+    num_frames: int,
+    frame_shape: Tuple[int, int]
+) -> np.memmap:
+    seq_path = Path(seq_path)
+    seq_path.mkdir(parents=True, exist_ok=True)
+
+    # Preallocate the whole sequence so frames can be written in place. It
+    # is written next to frames.npy and only moved there by
+    # publish_packed_sequence, so an interrupted write is never taken for a
+    # packed sequence
+    return np.lib.format.open_memmap(
+        str(packed_frames_path(seq_path).with_suffix(".npy.tmp")),
+        mode="w+",
+        dtype=np.uint8,
+        shape=(num_frames, *frame_shape, 3)
+    )
+
+def publish_packed_sequence(seq_path: Path, packed: np.memmap) -> Path:
+    # Flush the frames written into create_packed_sequence's array and
+    # atomically move them into place
+    packed.flush()
+    path = packed_frames_path(seq_path)
+    os.replace(path.with_suffix(".npy.tmp"), path)
+    return path
+
+def open_packed_sequence(seq_path: Path) -> np.ndarray:
+    return np.load(str(packed_frames_path(seq_path)), mmap_mode="r")
+
+def convert_jpeg_sequence(
+    seq_path: Path,
+    remove_jpeg: bool = False
+) -> Optional[Path]:
+    seq_path = Path(seq_path)
+    frame_paths = sorted(seq_path.glob("frame_*.jpg"))
+    if not frame_paths:
+        return None
+
+    first = cv2.imread(str(frame_paths[0]))
+    packed = create_packed_sequence(seq_path, len(frame_paths), first.shape[:2])
+
+    for frame_idx, frame_path in enumerate(frame_paths):
+        frame = first if frame_idx == 0 else cv2.imread(str(frame_path))
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=packed[frame_idx])
+
+    publish_packed_sequence(seq_path, packed)
+    del packed
+
+    if remove_jpeg:
+        for frame_path in frame_paths:
+            frame_path.unlink()
+
+    return packed_frames_path(seq_path)
+
+def convert_jpeg_dataset(data_path: str, remove_jpeg: bool = False) -> int:
+    converted = 0
+    for seq_path in sorted(Path(data_path).glob("sequence_*")):
+        if is_packed_sequence(seq_path):
+            continue
+        if convert_jpeg_sequence(seq_path, remove_jpeg=remove_jpeg) is not None:
+            converted += 1
+
+    logger.info(f"Converted {converted} sequences in {data_path} to packed format")
+    return converted
@@ -0,0 +1,207 @@
+import cv2
+import math
+import numpy as np
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+NOISE_TABLE_SIZE = 2**16
+
+class BatchedSequenceRenderer:
+    def __init__(
+        self,
+        image_size: Tuple[int, int],
+        movement_params: Dict[str, float],
+        block_size: int = 32,
+        phase_bins: int = 32,
+        noise_block_frames: int = 4
+    ):
+        self.image_size = image_size
+        self.movement_params = movement_params
+        self.block_size = block_size
+        self.phase_bins = phase_bins
+        self.noise_block_frames = noise_block_frames
+        self._noise_table = self._make_noise_table()
+
+        self.color = (100, 100, 100)
+        self.leg_angles = np.linspace(0, 2 * np.pi, 8, endpoint=False)
+
+        # Sprite lookup table keyed by (body size, leg phase bin)
+        self._sprites: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def compute_trajectory(self, rng: np.random.Generator, num_frames: int) -> Dict[str, np.ndarray]:
+        params = self.movement_params
+        frame_idx = np.arange(num_frames)
+
+        x0 = rng.integers(50, self.image_size[0] - 50, endpoint=True)
+        y0 = rng.integers(50, self.image_size[1] - 50, endpoint=True)
+        direction0 = rng.uniform(0, 2 * np.pi)
+        activity0 = rng.uniform(0.3, 0.7)
+
+        # Direction is a random walk over the frames where it changes
+        direction_turns = rng.random(num_frames) < params["direction_change_prob"]
+        direction = direction0 + np.cumsum(
+            np.where(direction_turns, rng.uniform(-np.pi / 4, np.pi / 4, num_frames), 0.0)
+        )
+
+        # Activity is clipped after every change, so only walk the change events
+        activity_changes = np.flatnonzero(rng.random(num_frames) < params["activity_change_prob"])
+        activity_deltas = rng.uniform(-0.1, 0.1, len(activity_changes))
+        activity = np.full(num_frames, activity0)
+        level = activity0
+        for change_idx, delta in zip(activity_changes, activity_deltas):
+            level = float(np.clip(level + delta, params["min_activity"], params["max_activity"]))
+            activity[change_idx:] = level
+
+        speed = activity * params["max_speed"]
+        dx = speed * np.cos(direction)
+        dy = speed * np.sin(direction)
+
+        # Positions are clamped to the frame at every step
+        x = self._clamped_walk(x0, dx, self.image_size[0])
+        y = self._clamped_walk(y0, dy, self.image_size[1])
+
+        size = (30 * (1 + 0.2 * np.sin(frame_idx * 0.1))).astype(np.int64)  # Breathing effect
+
+        return {
+            "x": x,
+            "y": y,
+            "direction": direction,
+            "activity": activity,
+            "speed": speed,
+            "size": size
+        }
+
+    @staticmethod
+    def _clamped_walk(start: float, steps: np.ndarray, upper: float) -> np.ndarray:
+        walk = itertools.accumulate(
+            steps.tolist(),
+            lambda pos, step: min(max(pos + step, 0.0), upper),
+            initial=float(start)
+        )
+        return np.fromiter(walk, dtype=np.float64, count=len(steps) + 1)[1:]
+
+    def _phase_bin(self, frame_idx: int) -> int:
+        phase = (frame_idx * 0.2) % (2 * np.pi)
+        return int(round(phase / (2 * np.pi) * self.phase_bins)) % self.phase_bins
+
+    def _get_sprite(self, size: int, phase_bin: int) -> np.ndarray:
+        key = (size, phase_bin)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            return sprite
+
+        phase = phase_bin * 2 * np.pi / self.phase_bins
+        radius = int(np.ceil(size * 1.7)) + 2
+        sprite = np.zeros((2 * radius + 1, 2 * radius + 1, 3), dtype=np.uint8)
+
+        for angle in self.leg_angles:
+            leg_length = size * (1.5 + 0.2 * np.sin(phase + angle))
+            end_x = int(radius + leg_length * np.cos(angle))
+            end_y = int(radius + leg_length * np.sin(angle))
+            cv2.line(sprite, (radius, radius), (end_x, end_y), self.color, 2)
+
+        cv2.circle(sprite, (radius, radius), size // 2, self.color, -1)
+
+        self._sprites[key] = sprite
+        return sprite
+
+    def _paste_sprite(self, frame: np.ndarray, sprite: np.ndarray, cx: int, cy: int) -> None:
+        radius = sprite.shape[0] // 2
+        height, width = frame.shape[:2]
+
+        top, left = cy - radius, cx - radius
+        y0, x0 = max(top, 0), max(left, 0)
+        y1, x1 = min(top + sprite.shape[0], height), min(left + sprite.shape[1], width)
+        if y0 >= y1 or x0 >= x1:
+            return
+
+        region = frame[y0:y1, x0:x1]
+        np.maximum(region, sprite[y0 - top:y1 - top, x0 - left:x1 - left], out=region)
+
+    @staticmethod
+    def _make_noise_table(sigma: float = 10.0) -> np.ndarray:
+        # Inverse CDF of the uint8 cast of N(0, sigma) noise (truncated toward
+        # zero, negative values wrapping like the per-frame generator does),
+        # at 2**16 evenly spaced quantiles
+        values = np.arange(-int(6 * sigma), int(6 * sigma) + 1)
+        # trunc(X) <= k  <=>  X < k + 1 for k >= 0, and X <= k for k < 0
+        upper = np.where(values >= 0, values + 1, values) / (sigma * math.sqrt(2))
+        cdf = 0.5 * (1 + np.vectorize(math.erf)(upper))
+        quantiles = (np.arange(NOISE_TABLE_SIZE) + 0.5) / NOISE_TABLE_SIZE
+        index = np.minimum(np.searchsorted(cdf, quantiles), len(values) - 1)
+        return values[index].astype(np.int16).astype(np.uint8)
+
+    def _draw_noise(self, rng: np.random.Generator, num_frames: int, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        # Fresh noise for every frame; 16-bit uniforms through the table cost
+        # a third of drawing normals
+        uniforms = rng.integers(0, NOISE_TABLE_SIZE, (num_frames, *frame_shape), dtype=np.uint16)
+        return self._noise_table[uniforms]
+
+    def render(
+        self,
+        rng: np.random.Generator,
+        num_frames: int,
+        out: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, List[Dict]]:
+        trajectory = self.compute_trajectory(rng, num_frames)
+
+        frame_shape = (*self.image_size, 3)
+        if out is None:
+            out = np.empty((num_frames, *frame_shape), dtype=np.uint8)
+
+        # Noise is drawn a few frames at a time, so no two frames share it
+        # and the draw stays small at full resolution
+        noise = None
+
+        # Per-frame brightness as uint8 lookup tables
+        brightness = 1.0 + 0.2 * np.sin(np.arange(num_frames) * 0.05)
+        luts = (np.arange(256)[None, :] * brightness[:, None]).clip(0, 255).astype(np.uint8)
+
+        centers_x = trajectory["x"].astype(np.int64)
+        centers_y = trajectory["y"].astype(np.int64)
+
+        for block_start in range(0, num_frames, self.block_size):
+            block = out[block_start:block_start + self.block_size]
+            block.fill(0)
+
+            for offset, frame in enumerate(block):
+                frame_idx = block_start + offset
+                sprite = self._get_sprite(int(trajectory["size"][frame_idx]), self._phase_bin(frame_idx))
+                self._paste_sprite(frame, sprite, centers_x[frame_idx], centers_y[frame_idx])
+
+                noise_idx = frame_idx % self.noise_block_frames
+                if noise_idx == 0:
+                    noise = self._draw_noise(rng, self.noise_block_frames, frame_shape)
+                cv2.add(frame, noise[noise_idx], dst=frame)
+                cv2.LUT(frame, luts[frame_idx], dst=frame)
+
+        return out, self._build_annotations(trajectory)
+
+    def _build_annotations(self, trajectory: Dict[str, np.ndarray]) -> List[Dict]:
+        x, y = trajectory["x"], trajectory["y"]
+        half_bbox = (trajectory["size"] * 3) // 2
+        bboxes = np.stack([
+            np.maximum(0, x - half_bbox),
+            np.maximum(0, y - half_bbox),
+            np.minimum(self.image_size[0], x + half_bbox),
+            np.minimum(self.image_size[1], y + half_bbox)
+        ], axis=1)
+
+        positions = np.stack([x, y], axis=1).tolist()
+        return [
+            {
+                "frame_id": frame_idx,
+                "bbox": bbox,
+                "activity_level": activity,
+                "Rabere_position": position,
+                "Rabere_direction": direction,
+                "Rabere_speed": speed
+            }
+            for frame_idx, (bbox, activity, position, direction, speed) in enumerate(zip(
+                bboxes.tolist(),
+                trajectory["activity"].tolist(),
+                positions,
+                trajectory["direction"].tolist(),
+                trajectory["speed"].tolist()
+            ))
+        ]
@@ -0,0 +1,134 @@
+import argparse
+import os
+import random
+import socket
+import torch
+import torch.multiprocessing as mp
+import numpy as np
+import yaml
+from pathlib import Path
+from typing import Any, Dict
+import logging
+
+from .dataset import create_data_loaders
+from .distributed import cleanup_distributed, get_rank, init_distributed
+from .feature_cache import create_feature_loaders
+from .model import RabereActivityNet
+from .trainer import rabereTrainer
+
+logger = logging.getLogger(__name__)
+
+def load_config(path: str) -> Dict[str, Any]:
+    with open(path, 'r') as f:
+        config = yaml.safe_load(f)
+    # rabereTrainer reads the logging keys at the top level
+    return {**config, **config["logging"]}
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("", 0))
+        return sock.getsockname()[1]
+
+def _select_device(config: Dict[str, Any], local_rank: int) -> torch.device:
+    if config["system"]["device"] == "cuda" and torch.cuda.is_available():
+        torch.cuda.set_device(local_rank)
+        return torch.device("cuda", local_rank)
+    return torch.device("cpu")
+
+def run(config: Dict[str, Any]) -> None:
+    distributed = config["system"]["distributed"]
+    local_rank = 0
+    if distributed:
+        local_rank = init_distributed(config["system"].get("dist_backend", "gloo"))
+
+    try:
+        # Ranks share the seed so model initialization matches before DDP
+        # broadcasts it anyway; samplers shuffle per rank themselves
+        seed = config["system"]["seed"]
+        random.seed(seed + get_rank())
+        np.random.seed(seed + get_rank())
+        torch.manual_seed(seed)
+
+        device = _select_device(config, local_rank)
+        data = config["data"]
+
+        model = RabereActivityNet(
+            backbone=config["model"]["backbone"],
+            pretrained=config["model"]["pretrained"],
+            temporal_length=data["temporal_length"],
+            temporal_tokens=config["model"]["temporal_tokens"],
+            temporal_grid_size=config["model"]["temporal_grid_size"]
+        )
+
+        feature_cache = config["training"].get("feature_cache", {})
+        if feature_cache.get("enabled", False):
+            # The backbone runs once per frame to fill the store and stays
+            # frozen; FPN and heads train from the stored features
+            model.backbone.requires_grad_(False)
+            train_loader, val_loader = create_feature_loaders(
+                str(Path(data["train_path"]).parent),
+                model.backbone,
+                feature_cache["path"],
+                device,
+                batch_size=data["batch_size"],
+                num_workers=data["num_workers"],
+                temporal_length=data["temporal_length"],
+                window_stride=data["window_stride"],
+                frame_dilation=data["frame_dilation"],
+                random_window_offset=data["random_window_offset"],
+                distributed=distributed,
+                build_batch_size=feature_cache.get("build_batch_size", 32)
+            )
+        else:
+            train_loader, val_loader, _ = create_data_loaders(
+                str(Path(data["train_path"]).parent),
+                batch_size=data["batch_size"],
+                num_workers=data["num_workers"],
+                temporal_length=data["temporal_length"],
+                window_stride=data["window_stride"],
+                frame_dilation=data["frame_dilation"],
+                random_window_offset=data["random_window_offset"],
+                output_stride=model.output_stride,
+                num_levels=model.num_levels,
+                distributed=distributed
+            )
+
+        trainer = rabereTrainer(config, model, train_loader, val_loader, device)
+        trainer.train(config["training"]["num_epochs"])
+    finally:
+        cleanup_distributed()
+
+def _spawn_worker(local_rank: int, config: Dict[str, Any], nproc: int) -> None:
+    os.environ["RANK"] = str(local_rank)
+    os.environ["LOCAL_RANK"] = str(local_rank)
+    os.environ["WORLD_SIZE"] = str(nproc)
+    run(config)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Train RabereActivityNet. For several nodes, start this module "
+                    "with torchrun; --nproc-per-node spawns ranks on one machine"
+    )
+    parser.add_argument("--config", default="configs/default_config.yaml")
+    parser.add_argument("--nproc-per-node", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = load_config(args.config)
+
+    nproc = args.nproc_per_node or config["system"]["num_gpus"]
+    if "RANK" in os.environ:
+        # Launched by torchrun, which already set up the rank environment
+        config["system"]["distributed"] = True
+        run(config)
+    elif config["system"]["distributed"] and nproc > 1:
+        os.environ.setdefault("MASTER_ADDR", "127.0.0.1")
+        os.environ.setdefault("MASTER_PORT", str(_free_port()))
+        logger.info(f"Spawning {nproc} training processes")
+        mp.spawn(_spawn_worker, args=(config, nproc), nprocs=nproc, join=True)
+    else:
+        config["system"]["distributed"] = False
+        run(config)
+
+if __name__ == "__main__":
+    main()
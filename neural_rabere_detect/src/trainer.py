@@ -1,27 +1,56 @@
+import contextlib
 import torch
 import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
 from torch.utils.data import DataLoader
 from typing import Dict, Any
 import logging
+import time
 import wandb
 from tqdm import tqdm
 import numpy as np
 from pathlib import Path
 
-from .model import rabereActivityNet
+from .collate import ClipBatchCollator
+from .distributed import all_reduce_mean, is_distributed, is_main_process
+from .memory import activation_memory_report
+from .metrics import MetricAccumulator, StepTimer
+from .model import RabereActivityNet
+from .precision import PrecisionPolicy, compare_step_times
 from .utils import setup_logging, save_checkpoint
 
 class rabereTrainer:
     def __init__(
         self,
         config: Dict[str, Any],
-        model: rabereActivityNet,
+        model: RabereActivityNet,
         train_loader: DataLoader,
         val_loader: DataLoader,
         device: torch.device
     ):
         self.config = config
-        self.model = model.to(device)
+        self.is_main = is_main_process()
+        self.precision = PrecisionPolicy.from_config(config, device)
+        
+        # Effective batch size is batch_size * accumulation_steps per rank
+        self.accumulation_steps = config["training"].get("accumulation_steps", 1)
+        self.checkpointing = config["training"].get("activation_checkpointing", {})
+        
+        # Loaders built from the feature cache yield backbone features
+        # instead of raw temporal frames
+        self.temporal_is_features = config["training"].get("feature_cache", {}).get("enabled", False)
+        
+        # raw_model is the unwrapped network for losses and checkpoints
+        self.raw_model = self.precision.prepare_model(model.to(device))
+        self._apply_activation_checkpointing()
+        self.model = self.raw_model
+        if is_distributed():
+            self.model = DistributedDataParallel(
+                self.raw_model,
+                device_ids=[device.index] if device.type == "cuda" else None,
+                find_unused_parameters=config["system"].get("find_unused_parameters", False)
+            )
+        self._check_target_grid(model, train_loader, val_loader)
         self.train_loader = train_loader
         self.val_loader = val_loader
         self.device = device
@@ -37,11 +66,13 @@ class rabereTrainer:
             eta_min=config["scheduler"]["eta_min"]
         )
         
-        # Initialize logging
+        # Initialize logging, only rank 0 reports progress
         self.logger = setup_logging()
+        if not self.is_main:
+            self.logger.setLevel(logging.WARNING)
         
         # Initialize weights & biases
-        if config["use_wandb"]:
+        if config["use_wandb"] and self.is_main:
             wandb.init(
                 project=config["wandb_project"],
                 config=config
@@ -50,10 +81,34 @@ class rabereTrainer:
         self.best_val_loss = float('inf')
         self.patience_counter = 0
         
+        self.logger.info(
+            f"Training in {self.precision.name} "
+            f"(channels_last={self.precision.channels_last}, "
+            f"grad scaling={self.precision.scaler.is_enabled()})"
+        )
+        
+    @staticmethod
+    def _check_target_grid(model: RabereActivityNet, *loaders: DataLoader) -> None:
+        # Clip batches build their targets for a fixed output grid, which
+        # must be the one the model predicts on
+        for loader in loaders:
+            collate_fn = getattr(loader, "collate_fn", None)
+            if not isinstance(collate_fn, ClipBatchCollator):
+                continue
+            if (collate_fn.output_stride, collate_fn.num_levels) != (model.output_stride, model.num_levels):
+                raise ValueError(
+                    f"Targets are built for output_stride={collate_fn.output_stride}, "
+                    f"num_levels={collate_fn.num_levels}, but the model predicts "
+                    f"output_stride={model.output_stride}, num_levels={model.num_levels}"
+                )
+        
     def _create_optimizer(self) -> optim.Optimizer:
+        # Frozen parameters (e.g. the backbone under the feature cache) are
+        # left out
+        parameters = [p for p in self.model.parameters() if p.requires_grad]
         if self.config["optimizer"]["name"] == "Adam":
             return optim.Adam(
-                self.model.parameters(),
+                parameters,
                 lr=self.config["optimizer"]["lr"],
                 weight_decay=self.config["optimizer"]["weight_decay"]
             )
@@ -62,112 +117,224 @@ class rabereTrainer:
                 f"Optimizer {self.config['optimizer']['name']} not implemented"
             )
             
+    METRIC_KEYS = ("loss", "bbox_loss", "obj_loss", "activity_loss")
+    
+    @staticmethod
+    def _metric_values(loss_components: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        return {
+            "loss": loss_components["total_loss"],
+            "bbox_loss": loss_components["bbox_loss"],
+            "obj_loss": loss_components["objectness_loss"],
+            "activity_loss": loss_components["activity_loss"]
+        }
+        
+    def _log_interval(self, metrics: MetricAccumulator, timer: StepTimer, pbar: tqdm) -> None:
+        # Materializes the window's metrics: the only host sync in the loop
+        values = {**metrics.compute("train_"), **timer.summary("train_")}
+        lr = self.optimizer.param_groups[0]['lr']
+        pbar.set_postfix({
+            "loss": f"{values['train_loss']:.4f}",
+            "lr": f"{lr:.6f}",
+            "it/s": f"{values['train_steps_per_sec']:.2f}",
+            "wait": f"{values['train_data_wait_fraction']:.0%}"
+        })
+        if self.config["use_wandb"] and self.is_main:
+            wandb.log({**values, "lr": lr})
+        metrics.reset()
+        timer.reset()
+        
+    def _compute_loss(self, model, predictions, targets):
+        return model.compute_loss(
+            predictions,
+            targets,
+            lambda_bbox=self.config["training"]["lambda_bbox"],
+            lambda_obj=self.config["training"]["lambda_obj"],
+            lambda_activity=self.config["training"]["lambda_activity"]
+        )
+        
+    def _apply_activation_checkpointing(self) -> None:
+        self.raw_model.set_activation_checkpointing(
+            backbone=self.checkpointing.get("backbone", False),
+            activity_head=self.checkpointing.get("activity_head", False)
+        )
+        
+    def _to_device(self, frames, temporal_frames, targets):
+        # ClipBatchCollator recycles its shared-memory slots, and on CPU .to()
+        # would hand back the slot itself, so batches are copied out there
+        copy = self.device.type == "cpu"
+        if isinstance(frames, (list, tuple)):
+            # Cached fp16 backbone features are widened once on the device
+            frames = [feature.to(self.device).float() for feature in frames]
+            if temporal_frames is not None:
+                temporal_frames = temporal_frames.to(self.device).float()
+        else:
+            frames = frames.to(self.device, copy=copy)
+            if temporal_frames is not None:
+                temporal_frames = temporal_frames.to(self.device, copy=copy)
+        return frames, temporal_frames, {k: v.to(self.device, copy=copy) for k, v in targets.items()}
+        
+    def _first_batch(self):
+        return self._to_device(*next(iter(self.train_loader)))
+        
+    def log_memory_report(self):
+        # Activation memory of each checkpointing option, on the full batch
+        # and on the accumulation micro-batch
+        results = activation_memory_report(
+            self.raw_model,
+            self._first_batch(),
+            self._compute_loss,
+            self.precision,
+            self.accumulation_steps,
+            self.temporal_is_features
+        )
+        self._apply_activation_checkpointing()
+        
+        for result in results:
+            peak = result["peak_memory_mb"]
+            rss = result["approx_rss_peak_mb"]
+            self.logger.info(
+                f"Memory checkpointing={result['checkpointing']} "
+                f"micro_batch={result['micro_batch_size']}: "
+                f"saved activations {result['saved_activations_mb']:.0f} MB"
+                + (f", peak {peak:.0f} MB" if peak is not None else "")
+                + (f", RSS peak ~{rss:.0f} MB (approximate)" if rss is not None else "")
+            )
+        return results
+        
+    def log_precision_ab(self, num_steps: int) -> Dict[str, float]:
+        # Step time of fp32 against the configured precision, with and
+        # without channels_last, on one real training batch
+        results = compare_step_times(
+            self.raw_model,
+            self._first_batch(),
+            self.device,
+            self._compute_loss,
+            precisions=("float32", self.precision.precision),
+            num_steps=num_steps
+        )
+        baseline = results["float32"]
+        for name, step_ms in results.items():
+            self.logger.info(f"Step time {name}: {step_ms:.1f} ms ({baseline / step_ms:.2f}x vs float32)")
+        return results
+        
     def train_epoch(self) -> Dict[str, float]:
         self.model.train()
-        epoch_metrics = {
-            "train_loss": 0.0,
-            "train_bbox_loss": 0.0,
-            "train_obj_loss": 0.0,
-            "train_activity_loss": 0.0
-        }
         
-        pbar = tqdm(self.train_loader, desc="Training")
+        # Losses are summed on the device and only read every log_interval
+        # steps and at the end of the epoch
+        epoch_metrics = MetricAccumulator(self.METRIC_KEYS, self.device)
+        interval_metrics = MetricAccumulator(self.METRIC_KEYS, self.device)
+        epoch_timer = StepTimer()
+        interval_timer = StepTimer()
+        log_interval = self.config["log_interval"]
+        
+        num_batches = len(self.train_loader)
+        accumulation_steps = self.accumulation_steps
+        
+        start = time.perf_counter()
+        self.optimizer.zero_grad()
+        pbar = tqdm(self.train_loader, desc="Training", disable=not self.is_main)
         for batch_idx, (frames, temporal_frames, targets) in enumerate(pbar):
-            # Move data to device
-            frames = frames.to(self.device)
-            if temporal_frames is not None:
-                temporal_frames = temporal_frames.to(self.device)
-            targets = {k: v.to(self.device) for k, v in targets.items()}
+            epoch_timer.data_ready()
+            interval_timer.data_ready()
             
-            # Forward pass
-            self.optimizer.zero_grad()
-            predictions = self.model(frames, temporal_frames)
-            
-            # Compute loss
-            loss, loss_components = self.model.compute_loss(
-                predictions,
-                targets,
-                lambda_bbox=self.config["training"]["lambda_bbox"],
-                lambda_obj=self.config["training"]["lambda_obj"],
-                lambda_activity=self.config["training"]["lambda_activity"]
-            )
+            # Micro-batches are grouped into optimizer steps; the last group
+            # of the epoch may be shorter
+            group_start = batch_idx - batch_idx % accumulation_steps
+            group_size = min(accumulation_steps, num_batches - group_start)
+            is_step = batch_idx + 1 == group_start + group_size
             
-            # Backward pass
-            loss.backward()
+            # Move data to device
+            frames, temporal_frames, targets = self._to_device(frames, temporal_frames, targets)
+            frames = self.precision.prepare_input(frames)
             
-            # Gradient clipping
-            torch.nn.utils.clip_grad_norm_(
-                self.model.parameters(),
-                self.config["training"]["grad_clip"]
-            )
+            # DDP only all-reduces gradients on the micro-batch that steps
+            sync = contextlib.nullcontext()
+            if self.model is not self.raw_model and not is_step:
+                sync = self.model.no_sync()
             
-            self.optimizer.step()
+            with sync:
+                # Forward pass
+                with self.precision.autocast():
+                    predictions = self.model(frames, temporal_frames, temporal_is_features=self.temporal_is_features)
+                    
+                    # Compute loss
+                    loss, loss_components = self._compute_loss(self.raw_model, predictions, targets)
+                
+                # Backward pass, scaled where needed
+                self.precision.backward(loss / group_size)
             
-            # Update metrics
-            epoch_metrics["train_loss"] += loss.item()
-            epoch_metrics["train_bbox_loss"] += loss_components["bbox_loss"].item()
-            epoch_metrics["train_obj_loss"] += loss_components["objectness_loss"].item()
-            epoch_metrics["train_activity_loss"] += loss_components["activity_loss"].item()
+            # Optimizer step with gradient clipping once per group
+            if is_step:
+                self.precision.step(
+                    self.optimizer,
+                    self.model.parameters(),
+                    self.config["training"]["grad_clip"]
+                )
+                self.optimizer.zero_grad()
+            
+            # Update metrics without waiting for the device
+            values = self._metric_values(loss_components)
+            epoch_metrics.update(values)
+            interval_metrics.update(values)
+            epoch_timer.step_done()
+            interval_timer.step_done()
             
             # Update progress bar
-            pbar.set_postfix({
-                "loss": f"{loss.item():.4f}",
-                "lr": f"{self.optimizer.param_groups[0]['lr']:.6f}"
-            })
+            if (batch_idx + 1) % log_interval == 0:
+                self._log_interval(interval_metrics, interval_timer, pbar)
             
         # Compute epoch averages
-        num_batches = len(self.train_loader)
-        for key in epoch_metrics:
-            epoch_metrics[key] /= num_batches
+        results = {**epoch_metrics.compute("train_"), **epoch_timer.summary("train_")}
+        results["train_step_time_ms"] = (time.perf_counter() - start) * 1000.0 / num_batches
             
-        return epoch_metrics
+        # Averages over all ranks, so every rank makes the same decisions
+        return all_reduce_mean(results)
         
     @torch.no_grad()
     def validate(self) -> Dict[str, float]:
         self.model.eval()
-        val_metrics = {
-            "val_loss": 0.0,
-            "val_bbox_loss": 0.0,
-            "val_obj_loss": 0.0,
-            "val_activity_loss": 0.0
-        }
+        val_metrics = MetricAccumulator(self.METRIC_KEYS, self.device)
+        timer = StepTimer()
         
-        for frames, temporal_frames, targets in tqdm(self.val_loader, desc="Validation"):
+        for frames, temporal_frames, targets in tqdm(self.val_loader, desc="Validation", disable=not self.is_main):
+            timer.data_ready()
+            
             # Move data to device
-            frames = frames.to(self.device)
-            if temporal_frames is not None:
-                temporal_frames = temporal_frames.to(self.device)
-            targets = {k: v.to(self.device) for k, v in targets.items()}
+            frames, temporal_frames, targets = self._to_device(frames, temporal_frames, targets)
+            frames = self.precision.prepare_input(frames)
             
             # Forward pass
-            predictions = self.model(frames, temporal_frames)
-            
-            # Compute loss
-            loss, loss_components = self.model.compute_loss(
-                predictions,
-                targets,
-                lambda_bbox=self.config["training"]["lambda_bbox"],
-                lambda_obj=self.config["training"]["lambda_obj"],
-                lambda_activity=self.config["training"]["lambda_activity"]
-            )
+            with self.precision.autocast():
+                predictions = self.model(frames, temporal_frames, temporal_is_features=self.temporal_is_features)
+                
+                # Compute loss
+                loss, loss_components = self._compute_loss(self.raw_model, predictions, targets)
             
-            # Update metrics
-            val_metrics["val_loss"] += loss.item()
-            val_metrics["val_bbox_loss"] += loss_components["bbox_loss"].item()
-            val_metrics["val_obj_loss"] += loss_components["objectness_loss"].item()
-            val_metrics["val_activity_loss"] += loss_components["activity_loss"].item()
+            # Update metrics without waiting for the device
+            val_metrics.update(self._metric_values(loss_components))
+            timer.step_done()
             
         # Compute epoch averages
-        num_batches = len(self.val_loader)
-        for key in val_metrics:
-            val_metrics[key] /= num_batches
+        results = {**val_metrics.compute("val_"), **timer.summary("val_")}
             
-        return val_metrics
+        return all_reduce_mean(results)
         
     def train(self, num_epochs: int):
+        ab_steps = self.config["system"].get("precision_ab_steps", 0)
+        if ab_steps > 0:
+            self.log_precision_ab(ab_steps)
+        if self.config["training"].get("memory_report", False):
+            self.log_memory_report()
+            
         for epoch in range(num_epochs):
             self.logger.info(f"Epoch {epoch+1}/{num_epochs}")
             
+            # Let the dataset and sampler reshuffle their windows
+            for target in (self.train_loader.dataset, self.train_loader.sampler):
+                if hasattr(target, "set_epoch"):
+                    target.set_epoch(epoch)
+            
             # Training phase
             train_metrics = self.train_epoch()
             
@@ -181,10 +348,13 @@ class rabereTrainer:
             metrics = {**train_metrics, **val_metrics}
             self.logger.info(
                 f"Train Loss: {metrics['train_loss']:.4f}, "
-                f"Val Loss: {metrics['val_loss']:.4f}"
+                f"Val Loss: {metrics['val_loss']:.4f}, "
+                f"Step: {metrics['train_step_time_ms']:.1f} ms ({self.precision.name}), "
+                f"{metrics['train_steps_per_sec']:.2f} steps/s, "
+                f"data wait {metrics['train_data_wait_ms']:.1f} ms / compute {metrics['train_compute_ms']:.1f} ms"
             )
             
-            if self.config["use_wandb"]:
+            if self.config["use_wandb"] and self.is_main:
                 wandb.log(metrics)
                 
             # Model checkpointing
@@ -192,14 +362,15 @@ class rabereTrainer:
                 self.best_val_loss = val_metrics["val_loss"]
                 self.patience_counter = 0
                 
-                save_checkpoint(
-                    self.model,
-                    self.optimizer,
-                    self.scheduler,
-                    epoch,
-                    val_metrics["val_loss"],
-                    Path(self.config["checkpoint_dir"]) / "best_model.pth"
-                )
+                if self.is_main:
+                    save_checkpoint(
+                        self.raw_model,
+                        self.optimizer,
+                        self.scheduler,
+                        epoch,
+                        val_metrics["val_loss"],
+                        Path(self.config["checkpoint_dir"]) / "best_model.pth"
+                    )
             else:
                 self.patience_counter += 1
                 
@@ -0,0 +1,82 @@
+import functools
+import os
+import shutil
+import time
+import types
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.checkpoint import checkpoint
+from pathlib import Path
+from typing import Any
+import logging
+
+def setup_logging(level: int = logging.INFO) -> logging.Logger:
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    return logging.getLogger("rabere")
+
+def save_checkpoint(
+    model: nn.Module,
+    optimizer: optim.Optimizer,
+    scheduler: Any,
+    epoch: int,
+    val_loss: float,
+    path: Path
+) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Written next to the target first so a crash never leaves a torn file
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    torch.save({
+        "epoch": epoch,
+        "val_loss": val_loss,
+        "model_state_dict": model.state_dict(),
+        "optimizer_state_dict": optimizer.state_dict(),
+        "scheduler_state_dict": scheduler.state_dict()
+    }, tmp_path)
+    tmp_path.replace(path)
+
+def publish_directory(build_path: Path, path: Path) -> None:
+    # Swaps a fully written directory in at path. path is a symlink to a
+    # versioned sibling and replacing a symlink is one atomic rename, so
+    # readers find either the old or the new version, never neither
+    build_path, path = Path(build_path), Path(path)
+    version = path.with_name(f"{path.name}.v{time.time_ns()}")
+    os.replace(build_path, version)
+
+    previous = os.readlink(path) if path.is_symlink() else None
+    if path.is_dir() and not path.is_symlink():
+        # Written in place by a build that predates versioning; kept as the
+        # previous version like any other
+        previous = f"{path.name}.v0"
+        os.replace(path, path.with_name(previous))
+
+    link = path.with_name(f"{path.name}.link{os.getpid()}")
+    if link.is_symlink():
+        link.unlink()
+    os.symlink(version.name, link)
+    os.replace(link, path)
+
+    # Readers still on the previous version keep it until the next swap
+    for stale in path.parent.glob(f"{path.name}.v*"):
+        if stale.name not in (version.name, previous):
+            shutil.rmtree(stale, ignore_errors=True)
+
+def _checkpointed_forward(self: nn.Module, *args):
+    forward = functools.partial(type(self).forward, self)
+    if self.training and torch.is_grad_enabled():
+        return checkpoint(forward, *args, use_reentrant=False)
+    return forward(*args)
+
+def set_activation_checkpointing(module: nn.Module, enabled: bool) -> None:
+    # Recompute the module's activations in backward instead of storing them.
+    # Only the instance forward is overridden, so parameters, state_dict keys
+    # and deep copies are unaffected
+    if enabled:
+        module.forward = types.MethodType(_checkpointed_forward, module)
+    elif "forward" in module.__dict__:
+        del module.forward
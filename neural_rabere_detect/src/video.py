@@ -0,0 +1,213 @@
+import cv2
+import os
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import av
+except ImportError:  # PyAV is optional; cv2 is used for reading and writing without it
+    av = None
+
+VIDEO_FILE = "video.mp4"
+VIDEO_INDEX_FILE = "video_index.npz"
+
+def video_path(seq_path: Path) -> Path:
+    return Path(seq_path) / VIDEO_FILE
+
+def is_video_sequence(seq_path: Path) -> bool:
+    return video_path(seq_path).is_file()
+
+def write_video_sequence(
+    seq_path: Path,
+    frames: Sequence[np.ndarray],
+    fps: int,
+    gop_size: int = 16,
+    codec: str = "h264"
+) -> Path:
+    # Frames are BGR like the rest of the generator output
+    path = video_path(seq_path)
+    height, width = frames[0].shape[:2]
+
+    if av is not None:
+        with av.open(str(path), mode="w") as container:
+            stream = container.add_stream(codec, rate=fps)
+            stream.width = width
+            stream.height = height
+            stream.pix_fmt = "yuv420p"
+            # Short GOPs keep the decode distance from a keyframe small
+            stream.codec_context.gop_size = gop_size
+
+            for frame in frames:
+                video_frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(frame), format="bgr24")
+                for packet in stream.encode(video_frame):
+                    container.mux(packet)
+            for packet in stream.encode():
+                container.mux(packet)
+
+        VideoFrameIndex.build(path)
+    else:
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+
+    return path
+
+class VideoFrameIndex:
+    def __init__(self, pts: np.ndarray, keyframes: np.ndarray):
+        # Presentation timestamps of every frame in display order
+        self.pts = pts
+        self.keyframes = keyframes
+        self.keyframe_numbers = np.flatnonzero(keyframes)
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    @staticmethod
+    def index_path(path: Path) -> Path:
+        return Path(path).parent / VIDEO_INDEX_FILE
+
+    @classmethod
+    def build(cls, path: Path) -> "VideoFrameIndex":
+        # Demux only: packet timestamps and keyframe flags, no decoding
+        pts, keyframes = [], []
+        with av.open(str(path)) as container:
+            stream = container.streams.video[0]
+            for packet in container.demux(stream):
+                if packet.pts is None:
+                    continue
+                pts.append(packet.pts)
+                keyframes.append(packet.is_keyframe)
+
+        pts = np.asarray(pts, dtype=np.int64)
+        order = np.argsort(pts, kind="stable")
+        index = cls(pts[order], np.asarray(keyframes, dtype=bool)[order])
+
+        # Written next to the target and renamed over it, so a concurrent
+        # reader never loads a torn index
+        index_path = cls.index_path(path)
+        tmp_path = index_path.with_name(index_path.name + f".tmp{os.getpid()}")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, pts=index.pts, keyframes=index.keyframes)
+        os.replace(tmp_path, index_path)
+        return index
+
+    @classmethod
+    def load_or_build(cls, path: Path) -> "VideoFrameIndex":
+        index_path = cls.index_path(path)
+        if index_path.is_file() and index_path.stat().st_mtime_ns >= Path(path).stat().st_mtime_ns:
+            with np.load(index_path) as data:
+                return cls(data["pts"], data["keyframes"])
+        return cls.build(path)
+
+    def keyframe_before(self, frame_number: int) -> int:
+        pos = np.searchsorted(self.keyframe_numbers, frame_number, side="right") - 1
+        return int(self.keyframe_numbers[max(pos, 0)]) if len(self.keyframe_numbers) else 0
+
+    def frame_number(self, pts: int) -> int:
+        return int(np.searchsorted(self.pts, pts))
+
+class VideoClipReader:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.index: Optional[VideoFrameIndex] = None
+        self._container = None
+        self._capture = None
+
+    def close(self) -> None:
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def read(self, frame_numbers: Sequence[int]) -> np.ndarray:
+        if av is not None:
+            return self._read_av(frame_numbers)
+        return self._read_cv2(frame_numbers)
+
+    def _read_av(self, frame_numbers: Sequence[int]) -> np.ndarray:
+        if self._container is None:
+            self.index = VideoFrameIndex.load_or_build(self.path)
+            self._container = av.open(str(self.path))
+        stream = self._container.streams.video[0]
+
+        first, last = frame_numbers[0], frame_numbers[-1]
+        positions = {number: pos for pos, number in enumerate(frame_numbers)}
+        clip: Optional[np.ndarray] = None
+        filled = np.zeros(len(frame_numbers), dtype=bool)
+
+        # Seek to the nearest keyframe and decode forward through the window
+        keyframe = self.index.keyframe_before(first)
+        self._container.seek(int(self.index.pts[keyframe]), stream=stream, backward=True, any_frame=False)
+
+        for frame in self._container.decode(stream):
+            number = self.index.frame_number(frame.pts)
+            if number < first:
+                continue
+
+            pos = positions.get(number)
+            if pos is not None:
+                image = frame.to_ndarray(format="rgb24")
+                if clip is None:
+                    clip = np.empty((len(frame_numbers), *image.shape), dtype=np.uint8)
+                clip[pos] = image
+                filled[pos] = True
+
+            if number >= last:
+                break
+
+        # The stream can end early, or skip frames the index lists
+        if not filled.all():
+            missing = [frame_numbers[pos] for pos in np.flatnonzero(~filled)]
+            raise IOError(f"Failed to read frames {missing} from {self.path}")
+        return clip
+
+    def _read_cv2(self, frame_numbers: Sequence[int]) -> np.ndarray:
+        if self._capture is None:
+            self._capture = cv2.VideoCapture(str(self.path))
+
+        first, last = frame_numbers[0], frame_numbers[-1]
+        positions = {number: pos for pos, number in enumerate(frame_numbers)}
+        clip: Optional[np.ndarray] = None
+
+        # OpenCV seeks to the preceding keyframe and decodes up to first
+        self._capture.set(cv2.CAP_PROP_POS_FRAMES, first)
+        for number in range(first, last + 1):
+            ok, frame = self._capture.read()
+            if not ok:
+                raise IOError(f"Failed to read frame {number} from {self.path}")
+
+            pos = positions.get(number)
+            if pos is not None:
+                if clip is None:
+                    clip = np.empty((len(frame_numbers), *frame.shape), dtype=np.uint8)
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=clip[pos])
+
+        return clip
+
+class VideoReaderPool:
+    def __init__(self, max_open: int = 16):
+        self.max_open = max_open
+        self._readers: "OrderedDict[Path, VideoClipReader]" = OrderedDict()
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state["_readers"] = OrderedDict()
+        return state
+
+    def read(self, path: Path, frame_numbers: List[int]) -> np.ndarray:
+        reader = self._readers.get(path)
+        if reader is None:
+            reader = VideoClipReader(path)
+            self._readers[path] = reader
+            # Bound the number of open containers per worker
+            while len(self._readers) > self.max_open:
+                _, evicted = self._readers.popitem(last=False)
+                evicted.close()
+        else:
+            self._readers.move_to_end(path)
+        return reader.read(frame_numbers)
@@ -0,0 +1,39 @@
+import pytest
+import torch
+from pathlib import Path
+
+from src.benchmark import generate_benchmark_split
+
+IMAGE_SIZE = 128
+FRAMES_PER_SEQUENCE = 24
+
+def make_split(root: Path, storage_format: str, num_sequences: int = 3) -> Path:
+    # train/val/test all point at the same sequences, like the benchmark
+    return generate_benchmark_split(
+        root,
+        storage_format,
+        num_sequences=num_sequences,
+        frames_per_sequence=FRAMES_PER_SEQUENCE,
+        image_size=IMAGE_SIZE,
+        seed=0
+    )
+
+@pytest.fixture(scope="session")
+def packed_root(tmp_path_factory) -> Path:
+    return make_split(tmp_path_factory.mktemp("data"), "packed")
+
+@pytest.fixture(scope="session")
+def jpeg_root(tmp_path_factory) -> Path:
+    return make_split(tmp_path_factory.mktemp("data"), "jpeg")
+
+def make_model(backbone: str = "mobilenet_v3_small", temporal_length: int = 4, **kwargs):
+    # Small random-weight model in eval mode, seeded so tolerances hold
+    from src.model import RabereActivityNet
+
+    torch.manual_seed(0)
+    return RabereActivityNet(
+        backbone=backbone,
+        pretrained=False,
+        temporal_length=temporal_length,
+        **kwargs
+    ).eval()
@@ -0,0 +1,84 @@
+import json
+import os
+import numpy as np
+
+from src.annotations import AnnotationIndex
+from src.utils import publish_directory
+
+def write_annotations(annotation_path, name: str, num_frames: int, activity: float) -> None:
+    annotation_path.mkdir(parents=True, exist_ok=True)
+    frames = [
+        {
+            "frame_id": idx,
+            "bbox": [idx, idx, idx + 10, idx + 10],
+            "activity_level": activity,
+            "Rabere_position": [idx + 5, idx + 5],
+            "Rabere_direction": 0.5,
+            "Rabere_speed": 2.0
+        }
+        for idx in range(num_frames)
+    ]
+    with open(annotation_path / f"{name}.json", 'w') as f:
+        json.dump({"sequence_id": 0, "frames": frames}, f)
+
+def test_index_columns_and_rows(tmp_path):
+    write_annotations(tmp_path, "sequence_0000", 5, 0.25)
+    write_annotations(tmp_path, "sequence_0001", 3, 0.75)
+    index = AnnotationIndex.build(tmp_path, ["sequence_0000", "sequence_0001"], tmp_path / "index_train")
+
+    np.testing.assert_array_equal(index.lengths, [5, 3])
+    bbox = index.column("bbox")
+    assert bbox.shape == (8, 4) and bbox.dtype == np.float32
+    assert isinstance(bbox, np.memmap)
+
+    rows = index.rows(1, 0, 3, 2)
+    np.testing.assert_array_equal(index.column("frame_id")[rows], [0, 2])
+    np.testing.assert_allclose(index.column("activity_level")[rows], 0.75)
+
+def test_open_or_build_rebuilds_on_change(tmp_path):
+    names = ["sequence_0000"]
+    write_annotations(tmp_path, names[0], 4, 0.25)
+    index_path = tmp_path / "index_train"
+    first = AnnotationIndex.open_or_build(tmp_path, names, index_path)
+    assert AnnotationIndex.open_or_build(tmp_path, names, index_path).index_path == first.index_path
+
+    write_annotations(tmp_path, names[0], 6, 0.5)
+    ann_path = tmp_path / f"{names[0]}.json"
+    os.utime(ann_path, ns=(ann_path.stat().st_atime_ns, ann_path.stat().st_mtime_ns + 10**9))
+    rebuilt = AnnotationIndex.open_or_build(tmp_path, names, index_path)
+    assert rebuilt.index_path != first.index_path
+    np.testing.assert_array_equal(rebuilt.lengths, [6])
+
+def test_open_reader_survives_rebuild(tmp_path):
+    names = ["sequence_0000"]
+    index_path = tmp_path / "index_train"
+    write_annotations(tmp_path, names[0], 4, 0.25)
+    old = AnnotationIndex.build(tmp_path, names, index_path)
+    assert index_path.is_symlink()
+
+    # A reader opened before the swap loads its columns lazily from the
+    # version it pinned, which the swap keeps
+    write_annotations(tmp_path, names[0], 6, 0.5)
+    new = AnnotationIndex.build(tmp_path, names, index_path)
+    assert len(old.column("frame_id")) == 4
+    np.testing.assert_allclose(old.column("activity_level"), 0.25)
+    assert len(new.column("frame_id")) == 6
+
+    # Only the current and previous versions are kept
+    AnnotationIndex.build(tmp_path, names, index_path)
+    assert len(list(tmp_path.glob("index_train.v*"))) == 2
+    assert not old.index_path.exists()
+
+def test_publish_retires_unversioned_directory(tmp_path):
+    path = tmp_path / "index"
+    path.mkdir()
+    (path / "old.txt").write_text("old")
+    build = tmp_path / "build"
+    build.mkdir()
+    (build / "new.txt").write_text("new")
+
+    publish_directory(build, path)
+    assert path.is_symlink()
+    assert (path / "new.txt").read_text() == "new"
+    assert (tmp_path / "index.v0" / "old.txt").read_text() == "old"
+    assert not build.exists()
@@ -0,0 +1,76 @@
+import math
+import numpy as np
+import pytest
+import torch
+
+from src.augmentation import ClipAugmentation
+
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+def square_clip(num_frames: int = 3, height: int = 64, width: int = 96):
+    # A bright square whose box is known exactly
+    clip = np.zeros((num_frames, height, width, 3), dtype=np.uint8)
+    clip[:, 10:20, 60:80] = 255
+    bboxes = np.tile(np.array([[60, 10, 80, 20]], dtype=np.float32), (num_frames, 1))
+    return clip, bboxes
+
+def only(**probs) -> ClipAugmentation:
+    defaults = {
+        "brightness_contrast_prob": 0.0,
+        "noise_prob": 0.0,
+        "horizontal_flip_prob": 0.0,
+        "vertical_flip_prob": 0.0,
+        "rotation_prob": 0.0
+    }
+    defaults.update(probs)
+    return ClipAugmentation(train=True, **defaults)
+
+def bright_extent(frames: torch.Tensor) -> list:
+    # Box around the pixels brighter than the normalized midpoint
+    mid = (0.5 - MEAN[0]) / STD[0]
+    ys, xs = torch.nonzero(frames[0, 0] > mid, as_tuple=True)
+    return [xs.min().item(), ys.min().item(), xs.max().item() + 1, ys.max().item() + 1]
+
+def test_eval_only_normalizes():
+    clip, bboxes = square_clip()
+    frames, out_bboxes = ClipAugmentation(train=False)(clip, bboxes)
+    assert frames.shape == (3, 3, 64, 96)
+    assert frames.dtype == torch.float32 and frames.is_contiguous()
+
+    expected = (torch.from_numpy(clip).permute(0, 3, 1, 2).float() / 255 - torch.tensor(MEAN).view(1, 3, 1, 1)) \
+        / torch.tensor(STD).view(1, 3, 1, 1)
+    torch.testing.assert_close(frames, expected)
+    np.testing.assert_array_equal(out_bboxes.numpy(), bboxes)
+
+def test_horizontal_flip_moves_boxes_with_pixels():
+    clip, bboxes = square_clip()
+    frames, out_bboxes = only(horizontal_flip_prob=1.0)(clip, bboxes)
+    np.testing.assert_array_equal(out_bboxes[0].numpy(), [16, 10, 36, 20])
+    assert bright_extent(frames) == [16, 10, 36, 20]
+
+def test_vertical_flip_moves_boxes_with_pixels():
+    clip, bboxes = square_clip()
+    frames, out_bboxes = only(vertical_flip_prob=1.0)(clip, bboxes)
+    np.testing.assert_array_equal(out_bboxes[0].numpy(), [60, 44, 80, 54])
+    assert bright_extent(frames) == [60, 44, 80, 54]
+
+@pytest.mark.parametrize("degrees", [-25.0, 90.0])
+def test_rotation_moves_boxes_with_pixels(degrees):
+    clip, bboxes = square_clip(height=96, width=96)
+    augmentation = only()
+    frames, _ = augmentation(clip, bboxes)
+    frames, out_bboxes = augmentation._rotate(frames, torch.from_numpy(bboxes), math.radians(degrees))
+
+    # The rotated box encloses the rotated square, up to interpolation
+    np.testing.assert_allclose(bright_extent(frames), out_bboxes[0].numpy(), atol=2)
+
+def test_clip_shares_one_transform():
+    clip, bboxes = square_clip(num_frames=4)
+    torch.manual_seed(0)
+    augmentation = ClipAugmentation(train=True, noise_prob=0.0)
+    for _ in range(5):
+        frames, out_bboxes = augmentation(clip, bboxes)
+        assert all(torch.equal(frames[0], frame) for frame in frames[1:])
+        assert all(torch.equal(out_bboxes[0], box) for box in out_bboxes[1:])
+        assert (out_bboxes[:, 2:] >= out_bboxes[:, :2]).all()
@@ -0,0 +1,35 @@
+import pytest
+import torch
+import torchvision.models as models
+
+from src.backbones import BACKBONES, available_backbones, build_backbone, register_backbone
+
+from conftest import make_model
+
+@pytest.mark.parametrize("name", available_backbones())
+@torch.no_grad()
+def test_backbone_stages(name):
+    backbone = build_backbone(name, pretrained=False).eval()
+    features = backbone(torch.randn(1, 3, 128, 96))
+
+    assert len(features) == 4
+    assert [feature.shape[1] for feature in features] == backbone.out_channels
+    assert [tuple(feature.shape[-2:]) for feature in features] == [(32, 24), (16, 12), (8, 6), (4, 3)]
+
+def test_unknown_backbone_lists_choices():
+    with pytest.raises(NotImplementedError, match="mobilenet_v3_small"):
+        build_backbone("vgg11", pretrained=False)
+
+def test_registry_requires_four_stages():
+    with pytest.raises(ValueError):
+        register_backbone("resnet18_short", models.resnet18, ["layer1", "layer2", "layer3"])
+    assert "resnet18_short" not in BACKBONES
+
+@pytest.mark.parametrize("backbone", ["mobilenet_v3_small", "mobilenet_v2"])
+@torch.no_grad()
+def test_model_runs_on_light_backbones(backbone):
+    model = make_model(backbone, temporal_length=3)
+    outputs = model(torch.randn(2, 3, 64, 64), torch.randn(2, 2, 3, 64, 64))
+    assert outputs["bbox"].shape == (2, 16, 16, 16)
+    assert outputs["objectness"].shape == (2, 4, 16, 16)
+    assert outputs["activity"].shape == (2, 1)
@@ -0,0 +1,58 @@
+import argparse
+import json
+import pytest
+
+from src.benchmark import SPLITS, generate_benchmark_split, run_benchmarks, run_variant
+
+def test_split_layout(packed_root):
+    for split in SPLITS:
+        assert (packed_root / split).is_symlink()
+        assert len(list((packed_root / split).glob("sequence_*"))) == 3
+    assert len(list((packed_root / "annotations").glob("sequence_*.json"))) == 3
+
+def test_split_generation_resumes(tmp_path):
+    root = generate_benchmark_split(tmp_path, "packed", 2, 8, 128, seed=0)
+    ann_path = root / "annotations" / "sequence_0000.json"
+    mtime = ann_path.stat().st_mtime_ns
+
+    assert generate_benchmark_split(tmp_path, "packed", 2, 8, 128, seed=0) == root
+    assert ann_path.stat().st_mtime_ns == mtime
+
+def test_split_regenerates_when_parameters_change(tmp_path):
+    root = generate_benchmark_split(tmp_path, "packed", 2, 8, 128, seed=0)
+    assert json.loads((root / "manifest.json").read_text())["frames_per_sequence"] == 8
+
+    # Same directory and format, different content: nothing stale is kept
+    assert generate_benchmark_split(tmp_path, "packed", 1, 12, 128, seed=0) == root
+    assert json.loads((root / "manifest.json").read_text())["frames_per_sequence"] == 12
+    annotations = sorted((root / "annotations").glob("sequence_*.json"))
+    assert [path.name for path in annotations] == ["sequence_0000.json"]
+    assert len(json.loads(annotations[0].read_text())["frames"]) == 12
+
+@pytest.mark.parametrize("num_workers, clip_augmentation", [(0, False), (2, True)])
+def test_run_variant_reports_throughput(packed_root, num_workers, clip_augmentation):
+    result = run_variant(
+        packed_root,
+        num_workers=num_workers,
+        batch_size=2,
+        temporal_length=4,
+        clip_augmentation=clip_augmentation,
+        max_batches=3,
+        warmup_batches=1,
+        latency_samples=4
+    )
+    assert result["num_batches"] == 3
+    assert result["samples_per_sec"] > 0
+    assert result["augmentation"] == ("clip" if clip_augmentation else "frame")
+    assert set(result["sample_latency"]) == {"p50_ms", "p90_ms", "p99_ms", "mean_ms"}
+    assert len(result["worker_rss_mb"]) == num_workers
+
+def test_report_is_json(tmp_path):
+    args = argparse.Namespace(
+        work_dir=str(tmp_path), storage="packed", num_sequences=2, frames_per_sequence=8,
+        image_size=128, num_workers="0", batch_sizes="2", temporal_lengths="2,4",
+        augmentation="clip", max_batches=2, warmup_batches=1, latency_samples=2, seed=0
+    )
+    report = run_benchmarks(args)
+    assert [result["temporal_length"] for result in report["results"]] == [2, 4]
+    assert json.loads(json.dumps(report))["environment"]["cpu_count"]
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from src.cache import FrameCache
+from src.dataset import RabereDataset
+
+def frame(value: int) -> np.ndarray:
+    return np.full((2, 2, 3), value, dtype=np.uint8)
+
+def test_lru_eviction_and_counters():
+    cache = FrameCache(capacity=2)
+    assert cache.get("a") is None
+    cache.put("a", frame(1))
+    cache.put("b", frame(2))
+    assert cache.get("a")[0, 0, 0] == 1  # a becomes most recent
+    cache.put("c", frame(3))  # evicts b
+
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 2, 1)
+    assert stats["bytes"] == 2 * frame(0).nbytes
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+    cache.reset_stats()
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["bytes"] == 2 * frame(0).nbytes
+
+class _CacheProbe(Dataset):
+    def __init__(self, cache: FrameCache):
+        self.cache = cache
+
+    def __len__(self) -> int:
+        return 4
+
+    def __getitem__(self, idx: int) -> int:
+        self.cache.get(idx)
+        return idx
+
+def test_worker_counters_are_kept_apart():
+    cache = FrameCache(capacity=4, num_workers=2)
+    loader = DataLoader(_CacheProbe(cache), batch_size=1, num_workers=2)
+    assert sorted(int(batch) for batch in loader) == [0, 1, 2, 3]
+
+    per_worker = {entry["worker"]: entry["misses"] for entry in cache.stats()["per_worker"]}
+    assert per_worker == {0: 2, 1: 2}
+
+def test_too_many_workers_raise_instead_of_merging():
+    cache = FrameCache(capacity=4, num_workers=1)
+    loader = DataLoader(_CacheProbe(cache), batch_size=1, num_workers=2)
+    with pytest.raises(RuntimeError, match="counters for 1 DataLoader workers"):
+        list(loader)
+
+def test_overlapping_windows_hit_the_cache(jpeg_root):
+    dataset = RabereDataset(str(jpeg_root / "train"), temporal_length=4, cache_size=64)
+    dataset[0]
+    dataset[1]  # shares three of its four frames with window 0
+
+    stats = dataset.cache_stats()
+    assert stats["misses"] == 5
+    assert stats["hits"] == 3
@@ -0,0 +1,96 @@
+import torch
+
+from src.inference import CascadeInference, StreamingInference
+
+from conftest import make_model
+
+def head_calls(model):
+    calls = []
+    handles = [
+        head.register_forward_hook(lambda module, args, output, level=level: calls.append(level))
+        for level, head in enumerate(model.detection_heads)
+    ]
+    return calls, handles
+
+def test_open_gate_matches_streaming():
+    model = make_model(temporal_length=3)
+    streaming = StreamingInference(model)
+    # No motion skipping and every frame passes the objectness gate
+    cascade = CascadeInference(model, motion_threshold=-1.0, objectness_threshold=0.0)
+    frames = torch.randn(4, 2, 3, 64, 64)
+
+    for t in range(len(frames)):
+        expected = streaming.process_batch(["a", "b"], frames[t])
+        calls, handles = head_calls(model)
+        try:
+            actual = cascade.process_batch(["a", "b"], frames[t])
+        finally:
+            for handle in handles:
+                handle.remove()
+
+        # The coarse head runs once, for the gate, and is not repeated
+        assert sorted(calls) == [0, 1, 2, 3]
+        for key in ("bbox", "objectness", "activity"):
+            torch.testing.assert_close(actual[key], expected[key])
+
+    assert cascade.stats()["full_runs"] == 8
+
+def test_closed_gate_skips_fine_levels_and_activity():
+    model = make_model(temporal_length=3)
+    cascade = CascadeInference(model, motion_threshold=-1.0, objectness_threshold=2.0, idle_activity=-1.0)
+    calls, handles = head_calls(model)
+    try:
+        outputs = cascade.process_batch(["a", "b"], torch.randn(2, 3, 64, 64))
+    finally:
+        for handle in handles:
+            handle.remove()
+
+    assert calls == [3]
+    assert not outputs["objectness"].any() and not outputs["bbox"].any()
+    torch.testing.assert_close(outputs["activity"], torch.full((2, 1), -1.0))
+
+    # Feature buffers still advance for frames the gate closes on
+    assert len(cascade._streams["a"]) == 1
+    assert cascade.stats()["objectness_skip_rate"] == 1.0
+
+def test_still_frames_reuse_results():
+    cascade = CascadeInference(make_model(temporal_length=3), motion_threshold=0.5, objectness_threshold=0.0, max_reuse=2)
+    frame = torch.randn(1, 3, 64, 64)
+
+    first = cascade.process_batch(["a"], frame)
+    for _ in range(2):
+        torch.testing.assert_close(cascade.process_batch(["a"], frame + 0.01), first)
+    assert cascade.counters["motion_skipped"] == 2
+
+    # After max_reuse a fresh result is computed even without motion
+    cascade.process_batch(["a"], frame)
+    assert cascade.counters["full_runs"] == 2
+
+    # A changed frame is computed at once
+    cascade.process_batch(["a"], frame + 5.0)
+    assert cascade.counters["full_runs"] == 3
+
+def test_skipped_frames_advance_the_feature_window():
+    model = make_model(temporal_length=4)
+    cascade = CascadeInference(model, motion_threshold=0.5, objectness_threshold=0.0)
+    frame = torch.randn(1, 3, 64, 64)
+
+    cascade.process_batch(["a"], frame)
+    cascade.process_batch(["a"], frame + 0.01)
+    assert cascade.counters["motion_skipped"] == 1
+
+    # The skipped frame holds the computed frame's features, one window slot each
+    window = cascade._streams["a"].window()
+    assert len(window) == 2
+    torch.testing.assert_close(window[1], window[0])
+    torch.testing.assert_close(window[0], model.extract_features(frame)[-1][0])
+
+def test_disabled_cascade_config_builds_plain_streaming():
+    config = {"inference": {"cascade": {
+        "enabled": False, "motion_threshold": 0.05, "max_reuse": 30, "objectness_threshold": 0.3
+    }}}
+    model = make_model(temporal_length=3)
+    assert type(CascadeInference.from_config(model, config)) is StreamingInference
+
+    config["inference"]["cascade"]["enabled"] = True
+    assert isinstance(CascadeInference.from_config(model, config), CascadeInference)
@@ -0,0 +1,114 @@
+import pytest
+import torch
+from types import SimpleNamespace
+from torch.utils.data import DataLoader
+
+from conftest import make_model
+from src.collate import ClipBatchCollator, encode_targets
+from src.trainer import rabereTrainer
+
+def make_samples(batch_size: int, temporal_length: int = 3, size: int = 32):
+    return [
+        {
+            "frames": torch.full((temporal_length, 3, size, size), float(i)) + torch.arange(temporal_length).view(-1, 1, 1, 1),
+            "bboxes": torch.tensor([[0.0, 0.0, 4.0, 4.0]] * (temporal_length - 1) + [[4.0 * i, 8.0, 4.0 * i + 8, 24.0]]),
+            "activities": torch.tensor([0.0] * (temporal_length - 1) + [0.1 * i])
+        }
+        for i in range(batch_size)
+    ]
+
+def test_encode_targets_normalizes_and_marks_center_cell():
+    bboxes = torch.tensor([[16.0, 8.0, 48.0, 24.0], [0.0, 0.0, 64.0, 32.0]])
+    target_bbox = torch.empty(2, 8, 4, 8)
+    target_obj = torch.full((2, 2, 4, 8), 5.0)
+    target_activity = torch.empty(2, 1)
+    encode_targets(bboxes, torch.tensor([0.25, 0.75]), (32, 64), target_bbox, target_obj, target_activity)
+
+    # Normalized (cx, cy, w, h), repeated on every level and cell
+    expected = torch.tensor([[0.5, 0.5, 0.5, 0.5], [0.5, 0.5, 1.0, 1.0]])
+    boxes = target_bbox.view(2, 2, 4, 4, 8)
+    torch.testing.assert_close(boxes, expected.view(2, 1, 4, 1, 1).expand_as(boxes))
+
+    # One positive per level, at the cell holding the center
+    assert target_obj.sum().item() == 4
+    assert (target_obj[:, :, 2, 4] == 1).all()
+    torch.testing.assert_close(target_activity, torch.tensor([[0.25], [0.75]]))
+
+def test_collator_predicts_last_frame():
+    collator = ClipBatchCollator(batch_size=4, output_stride=4, num_levels=2)
+    frames, temporal_frames, targets = collator(make_samples(3))
+
+    assert frames.shape == (3, 3, 32, 32)
+    assert temporal_frames.shape == (3, 2, 3, 32, 32)
+    assert frames.is_shared() and temporal_frames.is_shared()
+    torch.testing.assert_close(frames[:, 0, 0, 0], torch.tensor([2.0, 3.0, 4.0]))
+    torch.testing.assert_close(temporal_frames[1, :, 0, 0, 0], torch.tensor([1.0, 2.0]))
+
+    assert targets["objectness"].shape == (3, 2, 8, 8)
+    assert targets["bbox"].shape == (3, 8, 8, 8)
+    torch.testing.assert_close(targets["activity"].view(-1), torch.tensor([0.0, 0.1, 0.2]))
+
+def test_single_frame_clips_have_no_temporal_frames():
+    frames, temporal_frames, _ = ClipBatchCollator(batch_size=2)(make_samples(2, temporal_length=1))
+    assert frames.shape == (2, 3, 32, 32)
+    assert temporal_frames is None
+
+def test_slots_are_reused_after_a_full_ring():
+    collator = ClipBatchCollator(batch_size=2, prefetch_factor=1)
+    assert collator.num_slots == 3
+
+    batches = [collator(make_samples(2)) for _ in range(collator.num_slots + 1)]
+    pointers = [batch[0].data_ptr() for batch in batches]
+    assert len(set(pointers[:collator.num_slots])) == collator.num_slots
+    assert pointers[collator.num_slots] == pointers[0]
+
+def test_cpu_batches_are_copied_out_of_their_slot():
+    collator = ClipBatchCollator(batch_size=2, prefetch_factor=1)
+    trainer = SimpleNamespace(device=torch.device("cpu"))
+    frames, temporal_frames, targets = rabereTrainer._to_device(trainer, *collator(make_samples(2)))
+    kept = frames.clone()
+
+    # Wrapping around the ring overwrites the slot, not the moved batch
+    for _ in range(collator.num_slots):
+        collator([{**sample, "frames": sample["frames"] + 100} for sample in make_samples(2)])
+    torch.testing.assert_close(frames, kept)
+    assert not frames.is_shared() and not targets["objectness"].is_shared()
+
+@torch.no_grad()
+def test_forward_encodes_temporal_frames_unless_told_they_are_features():
+    model = make_model(temporal_length=3)
+    x = torch.randn(2, 3, 64, 64)
+    temporal_frames = torch.randn(2, 2, 3, 64, 64)
+    temporal_features = model.encode_temporal_frames(temporal_frames)
+
+    from_frames = model(x, temporal_frames)["activity"]
+    from_features = model(x, temporal_features, temporal_is_features=True)["activity"]
+    torch.testing.assert_close(from_frames, from_features)
+
+    # Features are never mistaken for frames by their shape
+    with pytest.raises(RuntimeError):
+        model(x, temporal_features)
+
+def test_bbox_loss_only_counts_cells_with_objectness():
+    model = make_model(temporal_length=1)
+    target_obj = torch.zeros(1, 2, 4, 4)
+    target_obj[0, 1, 2, 3] = 1.0
+    targets = {"bbox": torch.full((1, 8, 4, 4), 0.5), "objectness": target_obj, "activity": torch.zeros(1, 1)}
+    predictions = {"bbox": torch.rand(1, 8, 4, 4), "objectness": torch.full((1, 2, 4, 4), 0.5), "activity": torch.zeros(1, 1)}
+    _, losses = model.compute_loss(predictions, targets)
+
+    # Only level 1's four box channels at the positive cell are regressed
+    predictions["bbox"][0, 4:8, 2, 3] = 0.5
+    _, matched = model.compute_loss(predictions, targets)
+    assert losses["bbox_loss"] > 0
+    assert matched["bbox_loss"] == 0
+
+def test_trainer_rejects_targets_on_another_grid():
+    model = make_model(temporal_length=3)
+    assert (model.output_stride, model.num_levels) == (4, 4)
+    matching = DataLoader(make_samples(2), collate_fn=ClipBatchCollator(2))
+    rabereTrainer._check_target_grid(model, matching)
+
+    coarse = DataLoader(make_samples(2), collate_fn=ClipBatchCollator(2, output_stride=8))
+    with pytest.raises(ValueError, match="output_stride=8"):
+        rabereTrainer._check_target_grid(model, matching, coarse)
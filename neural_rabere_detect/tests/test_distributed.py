@@ -0,0 +1,79 @@
+import json
+import os
+import shutil
+import socket
+import torch.multiprocessing as mp
+
+from src.dataset import create_data_loaders
+from src.distributed import (
+    all_reduce_mean,
+    barrier,
+    cleanup_distributed,
+    get_rank,
+    get_world_size,
+    init_distributed,
+    is_distributed,
+    is_main_process
+)
+
+WORLD_SIZE = 2
+
+def test_single_process_helpers():
+    assert not is_distributed()
+    assert get_rank() == 0 and get_world_size() == 1 and is_main_process()
+    barrier()
+    metrics = {"loss": 1.5, "accuracy": 0.25}
+    assert all_reduce_mean(metrics) == metrics
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _rank_worker(rank: int, port: int, data_root: str, output_dir: str) -> None:
+    os.environ.update({
+        "RANK": str(rank),
+        "WORLD_SIZE": str(WORLD_SIZE),
+        "MASTER_ADDR": "127.0.0.1",
+        "MASTER_PORT": str(port)
+    })
+    init_distributed("gloo")
+    try:
+        metrics = all_reduce_mean({"loss": float(rank), "count": 2.0 * (rank + 1)})
+
+        # Rank 0 builds the annotation index, the other rank waits and opens it
+        train_loader, _, _ = create_data_loaders(
+            data_root, batch_size=2, num_workers=0, temporal_length=4, distributed=True
+        )
+        seen = [int(idx) for idx in train_loader.sampler]
+        result = {
+            "rank": get_rank(),
+            "metrics": metrics,
+            "index_path": str(train_loader.dataset.annotations.index_path),
+            "indices": seen
+        }
+    finally:
+        cleanup_distributed()
+
+    with open(os.path.join(output_dir, f"rank{rank}.json"), 'w') as f:
+        json.dump(result, f)
+
+def test_two_rank_gloo(packed_root, tmp_path):
+    # A private copy of the split, so the index is built inside the ranks
+    root = tmp_path / "split"
+    shutil.copytree(packed_root, root, symlinks=True, ignore=shutil.ignore_patterns("index_*"))
+
+    mp.spawn(_rank_worker, args=(_free_port(), str(root), str(tmp_path)), nprocs=WORLD_SIZE, join=True)
+    results = [json.loads((tmp_path / f"rank{rank}.json").read_text()) for rank in range(WORLD_SIZE)]
+
+    for result in results:
+        assert result["metrics"] == {"count": 3.0, "loss": 0.5}
+    # Both ranks read the one index rank 0 published
+    assert results[0]["index_path"] == results[1]["index_path"]
+    assert len(list((root / "annotations").glob("index_train.v*"))) == 1
+
+    # The shards split the 63 training windows between the ranks, padded to
+    # equal length by repeating one window
+    shards = [result["indices"] for result in results]
+    assert len(shards[0]) == len(shards[1]) == 32
+    assert set(shards[0]) | set(shards[1]) == set(range(63))
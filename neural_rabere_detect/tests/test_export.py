@@ -0,0 +1,97 @@
+import inspect
+import pytest
+import torch
+import warnings
+
+from src.export import (
+    OnnxRuntimeModel,
+    SingleFrameModel,
+    TemporalModel,
+    check_parity,
+    example_inputs,
+    export_model,
+    export_onnx,
+    export_torchscript,
+    fold_conv_bn,
+    ort
+)
+from src.model import DeformableConv2d, RabereActivityNet
+
+from conftest import make_model
+
+IMAGE_SIZE = (128, 128)
+
+@pytest.fixture(scope="module")
+def model():
+    return make_model(temporal_length=4)
+
+@pytest.fixture(scope="module")
+def inputs(model):
+    torch.manual_seed(0)
+    return example_inputs(model, IMAGE_SIZE)
+
+def test_folding_removes_batchnorm_and_keeps_outputs(model, inputs):
+    folded = fold_conv_bn(model)
+    assert not any(isinstance(m, torch.nn.BatchNorm2d) for m in folded.backbone.modules())
+    assert any(isinstance(m, torch.nn.BatchNorm2d) for m in model.backbone.modules())
+    check_parity(SingleFrameModel(model), SingleFrameModel(folded), inputs["single"])
+
+def test_onnx_graph_keeps_deformable_convolution(model, inputs, tmp_path):
+    onnx = pytest.importorskip("onnx")
+    assert any(isinstance(m, DeformableConv2d) for m in model.detection_heads.modules())
+
+    onnx_path = tmp_path / "model.onnx"
+    export_onnx(SingleFrameModel(fold_conv_bn(model)).eval(), inputs["single"], onnx_path)
+    op_types = {node.op_type for node in onnx.load(str(onnx_path)).graph.node}
+    assert "DeformConv" in op_types
+
+@pytest.mark.parametrize("path_name, wrapper_cls", [("single", SingleFrameModel), ("temporal", TemporalModel)])
+def test_torchscript_matches_eager(model, inputs, tmp_path, path_name, wrapper_cls):
+    wrapper = wrapper_cls(fold_conv_bn(model)).eval()
+    traced = export_torchscript(wrapper, inputs[path_name], tmp_path / "model.pt")
+    check_parity(wrapper_cls(model), traced, inputs[path_name])
+
+    # The saved file loads on its own and gives the same outputs
+    loaded = torch.jit.load(str(tmp_path / "model.pt"))
+    check_parity(wrapper_cls(model), loaded, inputs[path_name])
+
+def test_temporal_trace_has_no_data_dependent_branch_in_forward(model, inputs, tmp_path):
+    lines, start = inspect.getsourcelines(RabereActivityNet.forward)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", torch.jit.TracerWarning)
+        export_torchscript(TemporalModel(model).eval(), inputs["temporal"], tmp_path / "model.pt")
+
+    in_forward = [
+        w for w in caught
+        if issubclass(w.category, torch.jit.TracerWarning)
+        and w.filename == inspect.getsourcefile(RabereActivityNet)
+        and start <= w.lineno < start + len(lines)
+    ]
+    assert not in_forward
+
+@pytest.mark.skipif(ort is None, reason="onnxruntime is not installed")
+@pytest.mark.parametrize("path_name, wrapper_cls", [("single", SingleFrameModel), ("temporal", TemporalModel)])
+def test_onnx_runtime_matches_eager(model, inputs, tmp_path, path_name, wrapper_cls):
+    onnx_path = tmp_path / "model.onnx"
+    export_onnx(wrapper_cls(fold_conv_bn(model)).eval(), inputs[path_name], onnx_path)
+    runtime = OnnxRuntimeModel(str(onnx_path))
+    check_parity(wrapper_cls(model), runtime, inputs[path_name])
+
+    # Exported with a dynamic batch axis
+    single = tuple(tensor[:1] for tensor in inputs[path_name])
+    check_parity(wrapper_cls(model), runtime, single)
+
+def test_parity_check_rejects_mismatch(model, inputs):
+    other = make_model(temporal_length=4)
+    with torch.no_grad():
+        other.detection_heads[0].bbox_head[-1].bias.add_(1.0)
+    with pytest.raises(AssertionError):
+        check_parity(SingleFrameModel(model), SingleFrameModel(other), inputs["single"])
+
+def test_export_model_writes_verified_files(model, tmp_path):
+    torch.manual_seed(0)
+    written = export_model(model, str(tmp_path), image_size=IMAGE_SIZE)
+    assert sorted(path.name for path in written) == [
+        "rabere_single.onnx", "rabere_single.pt", "rabere_temporal.onnx", "rabere_temporal.pt"
+    ]
+    assert all(path.stat().st_size > 0 for path in written)
@@ -0,0 +1,114 @@
+import shutil
+import numpy as np
+import pytest
+import torch
+
+from src.dataset import RabereDataset, _create_frame_transforms
+from src.feature_cache import (
+    STAGE_NAMES,
+    FeatureCacheDataset,
+    FeatureStore,
+    backbone_hash,
+    create_feature_loaders
+)
+from src.trainer import rabereTrainer
+
+from conftest import make_model
+
+CPU = torch.device("cpu")
+
+@pytest.fixture(scope="module")
+def model():
+    return make_model("mobilenet_v3_small", temporal_length=4)
+
+@pytest.fixture(scope="module")
+def dataset(packed_root):
+    _, transform = _create_frame_transforms()
+    return RabereDataset(str(packed_root / "train"), temporal_length=4, transform=transform), transform
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory, dataset, model):
+    dataset, transform = dataset
+    return FeatureStore.build(dataset, model.backbone, tmp_path_factory.mktemp("cache") / "train", transform, CPU, 10)
+
+def test_store_holds_fp16_backbone_features(store, dataset, model):
+    dataset, transform = dataset
+    assert len(store) == 3 * 24
+    assert store.frame_size == (128, 128)
+    assert store.meta["backbone_hash"] == backbone_hash(model.backbone)
+
+    frames = dataset.load_frames(1, 5, 7)
+    batch = torch.stack([transform(image=np.asarray(frame))["image"] for frame in frames])
+    with torch.no_grad():
+        expected = model.backbone(batch)
+    for level, feature in enumerate(expected):
+        stage = store.stage(level)
+        assert stage.dtype == np.float16
+        assert stage.shape[1:] == feature.shape[1:]
+        cached = torch.from_numpy(np.array(stage[store.rows(1, 5, 7)])).float()
+        torch.testing.assert_close(cached, feature, atol=2e-2, rtol=1e-2)
+
+def test_store_is_reused_until_backbone_changes(store, dataset, model, tmp_path):
+    dataset, transform = dataset
+    path = tmp_path / "train"
+    shutil.copytree(store.store_path, path)
+    reused = FeatureStore.open_or_build(dataset, model.backbone, path, transform, CPU)
+    assert reused.store_path == path.resolve()
+
+    changed = make_model("mobilenet_v3_small", temporal_length=4).backbone
+    with torch.no_grad():
+        next(changed.parameters()).add_(0.1)
+    rebuilt = FeatureStore.open_or_build(dataset, changed, path, transform, CPU, 24)
+    assert rebuilt.store_path != reused.store_path
+    assert rebuilt.meta["backbone_hash"] == backbone_hash(changed)
+
+def test_cached_items_drive_the_heads(store, dataset, model):
+    dataset, _ = dataset
+    cached = FeatureCacheDataset(dataset, store)
+    assert len(cached) == len(dataset)
+
+    item = cached[len(cached) - 1]
+    assert len(item["features"]) == len(STAGE_NAMES)
+    assert item["temporal_features"].shape[0] == 3
+    np.testing.assert_allclose(item["bbox"].numpy(), dataset[len(dataset) - 1]["bboxes"][-1].numpy())
+
+    # The heads on cached features match them on the frames, up to fp16
+    sample = dataset[len(dataset) - 1]
+    with torch.no_grad():
+        expected = model(sample["frames"][-1:], sample["frames"][None, :-1])
+        actual = model(
+            [feature[None].float() for feature in item["features"]],
+            item["temporal_features"][None].float(),
+            temporal_is_features=True
+        )
+    for key in ("bbox", "objectness", "activity"):
+        torch.testing.assert_close(actual[key], expected[key], atol=5e-2, rtol=5e-2)
+
+def test_trainer_runs_on_cached_features(packed_root, tmp_path):
+    model = make_model("mobilenet_v3_small", temporal_length=4)
+    train_loader, val_loader = create_feature_loaders(
+        str(packed_root), model.backbone, str(tmp_path / "cache"), CPU,
+        batch_size=8, num_workers=0, temporal_length=4, window_stride=4
+    )
+    features, temporal_features, targets = next(iter(train_loader))
+    assert [feature.dtype for feature in features] == [torch.float16] * 4
+    assert temporal_features.shape[:2] == (8, 3)
+    assert targets["objectness"].shape[-2:] == features[0].shape[-2:]
+
+    for parameter in model.backbone.parameters():
+        parameter.requires_grad_(False)
+    config = {
+        "training": {
+            "lambda_bbox": 1.0, "lambda_obj": 1.0, "lambda_activity": 1.0, "grad_clip": 1.0,
+            "feature_cache": {"enabled": True}
+        },
+        "optimizer": {"name": "Adam", "lr": 1e-3, "weight_decay": 0.0},
+        "scheduler": {"T_0": 10, "T_mult": 2, "eta_min": 1e-5},
+        "system": {"precision": "float32", "channels_last": True},
+        "use_wandb": False,
+        "log_interval": 100
+    }
+    trainer = rabereTrainer(config, model, train_loader, val_loader, CPU)
+    assert np.isfinite(trainer.train_epoch()["train_loss"])
+    assert np.isfinite(trainer.validate()["val_loss"])
+    assert all(result["saved_activations_mb"] > 0 for result in trainer.log_memory_report())
@@ -0,0 +1,56 @@
+import json
+import numpy as np
+import pytest
+
+from src.dataset import RabereDatasetGenerator
+from src.storage import open_packed_sequence
+
+def generate(root, use_processes: bool, batched: bool = False, **kwargs) -> RabereDatasetGenerator:
+    generator = RabereDatasetGenerator(
+        str(root),
+        num_sequences=3,
+        frames_per_sequence=6,
+        image_size=(128, 128),
+        storage_format="packed",
+        batched=batched,
+        seed=5
+    )
+    generator.generate_dataset(num_workers=2, use_processes=use_processes, max_in_flight=2, **kwargs)
+    return generator
+
+def read_sequence(root, seq_id: int):
+    with open(root / "annotations" / f"sequence_{seq_id:04d}.json") as f:
+        annotations = json.load(f)
+    return np.array(open_packed_sequence(root / "data" / f"sequence_{seq_id:04d}")), annotations
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_seeded_generation_matches_across_executors(tmp_path, batched):
+    generate(tmp_path / "threads", use_processes=False, batched=batched)
+    generate(tmp_path / "processes", use_processes=True, batched=batched)
+
+    for seq_id in range(3):
+        frames_t, annotations_t = read_sequence(tmp_path / "threads", seq_id)
+        frames_p, annotations_p = read_sequence(tmp_path / "processes", seq_id)
+        np.testing.assert_array_equal(frames_t, frames_p)
+        assert annotations_t == annotations_p
+
+def test_sequences_draw_independent_streams(tmp_path):
+    generator = generate(tmp_path, use_processes=False)
+    # Regenerating one sequence alone reproduces it, whatever ran before
+    _, annotations = generator.generate_Rabere_sequence(2)
+    _, expected = read_sequence(tmp_path, 2)
+    assert json.loads(json.dumps(annotations)) == expected["frames"]
+
+    _, other = generator.generate_Rabere_sequence(1)
+    assert other != annotations
+
+def test_resume_skips_written_sequences(tmp_path):
+    generate(tmp_path, use_processes=False)
+    ann_path = tmp_path / "annotations" / "sequence_0001.json"
+    mtime = ann_path.stat().st_mtime_ns
+    (tmp_path / "annotations" / "sequence_0002.json").unlink()
+
+    generate(tmp_path, use_processes=False, resume=True)
+    assert ann_path.stat().st_mtime_ns == mtime
+    assert (tmp_path / "annotations" / "sequence_0002.json").is_file()
+    assert not list((tmp_path / "annotations").glob("*.tmp"))
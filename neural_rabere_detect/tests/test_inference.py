@@ -0,0 +1,57 @@
+import pytest
+import torch
+
+from src.inference import FeatureRingBuffer, StreamingInference
+
+from conftest import make_model
+
+def test_ring_buffer_keeps_chronological_window():
+    buffer = FeatureRingBuffer(3)
+    assert buffer.window() is None
+
+    for value in range(5):
+        buffer.push(torch.full((2, 1, 1), float(value)))
+    assert len(buffer) == 3
+    torch.testing.assert_close(buffer.window()[:, 0, 0, 0], torch.tensor([2.0, 3.0, 4.0]))
+
+    # A new resolution starts the window over
+    buffer.push(torch.zeros(2, 2, 2))
+    assert len(buffer) == 1 and buffer.window().shape == (1, 2, 2, 2)
+
+    buffer.reset()
+    assert buffer.window() is None
+
+def test_zero_capacity_buffer_stays_empty():
+    buffer = FeatureRingBuffer(0)
+    buffer.push(torch.zeros(2, 1, 1))
+    assert len(buffer) == 0 and buffer.window() is None
+
+@torch.no_grad()
+def test_streaming_matches_full_windows():
+    model = make_model(temporal_length=4)
+    streaming = StreamingInference(model)
+    frames = torch.randn(6, 2, 3, 64, 64)
+
+    for t in range(len(frames)):
+        outputs = streaming.process_batch(["a", "b"], frames[t])
+
+        # The full model on the same window of raw frames, up to four long
+        history = frames[max(t - 3, 0):t].transpose(0, 1)
+        expected = model(frames[t], history if t > 0 else None)
+        for key in ("bbox", "objectness", "activity"):
+            torch.testing.assert_close(outputs[key], expected[key], atol=1e-4, rtol=1e-4)
+
+def test_cameras_keep_separate_buffers():
+    streaming = StreamingInference(make_model(temporal_length=4), max_streams=2)
+    frame = torch.randn(3, 64, 64)
+    streaming.process_frame("a", frame)
+    streaming.process_frame("a", frame)
+    streaming.process_frame("b", frame)
+    assert len(streaming._streams["a"]) == 2 and len(streaming._streams["b"]) == 1
+
+    # The least recently used stream is dropped past max_streams
+    streaming.process_frame("c", frame)
+    assert list(streaming._streams) == ["b", "c"]
+
+    with pytest.raises(ValueError):
+        streaming.process_batch(["b", "b"], torch.randn(2, 3, 64, 64))
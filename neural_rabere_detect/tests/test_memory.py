@@ -0,0 +1,113 @@
+import pytest
+import torch
+
+from src.memory import activation_memory_report, measure_peak_memory, measure_peak_rss, measure_saved_activations
+from src.precision import PrecisionPolicy
+from src.trainer import rabereTrainer
+
+from conftest import make_model
+
+def make_batch(B: int = 2, T: int = 3, size: int = 64):
+    generator = torch.Generator().manual_seed(0)
+    targets = {
+        "bbox": torch.rand(B, 16, size // 4, size // 4, generator=generator),
+        "objectness": (torch.rand(B, 4, size // 4, size // 4, generator=generator) > 0.9).float(),
+        "activity": torch.rand(B, 1, generator=generator)
+    }
+    return (
+        torch.randn(B, 3, size, size, generator=generator),
+        torch.randn(B, T - 1, 3, size, size, generator=generator),
+        targets
+    )
+
+def loss_fn(model, predictions, targets):
+    return model.compute_loss(predictions, targets)
+
+def backward(model, batch) -> None:
+    frames, temporal_frames, targets = batch
+    torch.manual_seed(0)
+    model.zero_grad(set_to_none=True)
+    loss, _ = loss_fn(model, model(frames, temporal_frames), targets)
+    loss.backward()
+
+@pytest.mark.parametrize("backbone", ["resnet18", "mobilenet_v3_small"])
+def test_checkpointing_saves_memory_and_keeps_gradients(backbone):
+    model = make_model(backbone, temporal_length=3).train()
+    batch = make_batch()
+
+    baseline = measure_saved_activations(lambda: backward(model, batch), model)
+    expected = {name: p.grad.clone() for name, p in model.named_parameters() if p.grad is not None}
+
+    model.set_activation_checkpointing(backbone=True, activity_head=True)
+    checkpointed = measure_saved_activations(lambda: backward(model, batch), model)
+    assert checkpointed < 0.8 * baseline
+
+    for name, parameter in model.named_parameters():
+        if name in expected:
+            torch.testing.assert_close(parameter.grad, expected[name], atol=1e-5, rtol=1e-4)
+
+def test_checkpointing_switches_off_cleanly():
+    model = make_model("resnet18", temporal_length=3)
+    model.set_activation_checkpointing(backbone=True, activity_head=True)
+    assert "forward" in model.activity_head.conv_3d.__dict__
+    assert "forward" in model.backbone.body.layer1.__dict__
+
+    model.set_activation_checkpointing()
+    assert "forward" not in model.activity_head.conv_3d.__dict__
+    assert "forward" not in model.backbone.body.layer1.__dict__
+    assert set(model.state_dict()) == set(make_model("resnet18", temporal_length=3).state_dict())
+
+def test_memory_report_covers_every_variant():
+    model = make_model("mobilenet_v3_small", temporal_length=3)
+    results = activation_memory_report(model, make_batch(B=4), loss_fn, PrecisionPolicy("float32", torch.device("cpu")), 2)
+
+    assert [(r["checkpointing"], r["micro_batch_size"]) for r in results] == [
+        (name, size) for name in ("none", "backbone", "conv_3d", "backbone+conv_3d") for size in (4, 2)
+    ]
+    saved = {(r["checkpointing"], r["micro_batch_size"]): r["saved_activations_mb"] for r in results}
+    assert saved["backbone", 4] < saved["none", 4]
+    assert saved["backbone+conv_3d", 4] < saved["backbone", 4]
+    assert saved["none", 2] < saved["none", 4]
+    # On CPU the RSS figure is secondary and never negative
+    assert all(r["peak_memory_mb"] is None for r in results)
+    assert all(r["approx_rss_peak_mb"] is None or r["approx_rss_peak_mb"] >= 0 for r in results)
+    # The model is handed back as it came, in eval mode without grads
+    assert not model.training
+    assert all(p.grad is None for p in model.parameters())
+
+def trainer_config(accumulation_steps: int):
+    return {
+        "training": {
+            "accumulation_steps": accumulation_steps,
+            "lambda_bbox": 1.0, "lambda_obj": 1.0, "lambda_activity": 1.0, "grad_clip": 1.0
+        },
+        "optimizer": {"name": "Adam", "lr": 1e-3, "weight_decay": 0.0},
+        "scheduler": {"T_0": 10, "T_mult": 2, "eta_min": 1e-5},
+        "system": {"precision": "float32", "channels_last": False},
+        "use_wandb": False,
+        "log_interval": 100
+    }
+
+@pytest.mark.parametrize("accumulation_steps, expected_steps", [(1, 5), (2, 3), (5, 1)])
+def test_accumulation_groups_micro_batches(accumulation_steps, expected_steps):
+    loader = [make_batch() for _ in range(5)]
+    trainer = rabereTrainer(
+        trainer_config(accumulation_steps),
+        make_model("mobilenet_v3_small", temporal_length=3),
+        loader,
+        loader,
+        torch.device("cpu")
+    )
+    steps = []
+    step = trainer.optimizer.step
+    trainer.optimizer.step = lambda *args, **kwargs: (steps.append(1), step(*args, **kwargs))[1]
+
+    results = trainer.train_epoch()
+    assert len(steps) == expected_steps
+    assert results["train_loss"] > 0
+    assert all(p.grad is None or not p.grad.any() for p in trainer.model.parameters())
+
+def test_rss_peak_is_clamped_and_cpu_has_no_exact_peak():
+    assert measure_peak_memory(lambda: None, torch.device("cpu")) is None
+    rss = measure_peak_rss(lambda: None)
+    assert rss is None or rss >= 0
@@ -0,0 +1,43 @@
+import time
+import pytest
+import torch
+
+from src.metrics import MetricAccumulator, StepTimer
+
+def test_accumulator_means():
+    metrics = MetricAccumulator(["loss", "acc"], torch.device("cpu"))
+    assert metrics.compute("val_") == {"val_loss": 0.0, "val_acc": 0.0}
+
+    for loss, acc in ((1.0, 0.5), (2.0, 0.25), (3.0, 0.0)):
+        metrics.update({"loss": torch.tensor(loss), "acc": torch.tensor(acc, dtype=torch.bfloat16)})
+    assert metrics.compute() == pytest.approx({"loss": 2.0, "acc": 0.25})
+
+    metrics.reset()
+    assert metrics.count == 0 and not metrics.sums.any()
+
+def test_accumulator_keeps_sums_on_device_in_float64():
+    metrics = MetricAccumulator(["loss"], torch.device("cpu"))
+    loss = torch.tensor(0.1, requires_grad=True) * 1.0
+    metrics.update({"loss": loss})
+    assert metrics.sums.dtype == torch.float64
+    assert not metrics.sums.requires_grad
+
+    # Many small float32 values accumulate without float32 rounding
+    for _ in range(99999):
+        metrics.update({"loss": torch.tensor(0.1)})
+    assert metrics.compute()["loss"] == pytest.approx(0.1, rel=1e-7)
+
+def test_step_timer_splits_wait_and_compute():
+    timer = StepTimer()
+    for _ in range(3):
+        time.sleep(0.02)
+        timer.data_ready()
+        time.sleep(0.01)
+        timer.step_done()
+
+    summary = timer.summary("train_")
+    assert timer.steps == 3
+    assert summary["train_data_wait_ms"] == pytest.approx(20, abs=10)
+    assert summary["train_compute_ms"] == pytest.approx(10, abs=8)
+    assert 0.4 < summary["train_data_wait_fraction"] < 0.9
+    assert summary["train_steps_per_sec"] == pytest.approx(1 / 0.03, rel=0.5)
@@ -0,0 +1,75 @@
+import torch
+from torchvision.ops import nms
+
+from src.postprocess import ActivitySmoother, DetectionPostProcessor
+
+def make_predictions(B: int = 2, L: int = 2, h: int = 4, w: int = 4):
+    bbox = torch.zeros(B, L, 4, h, w)
+    objectness = torch.zeros(B, L, h, w)
+    return bbox, objectness
+
+def set_box(bbox, objectness, b, level, y, x, box, score):
+    bbox[b, level, :, y, x] = torch.tensor(box)
+    objectness[b, level, y, x] = score
+
+def flat(bbox, objectness):
+    B, L, _, h, w = bbox.shape
+    return {"bbox": bbox.view(B, 4 * L, h, w), "objectness": objectness}
+
+def test_decode_to_pixel_corners():
+    bbox, objectness = make_predictions()
+    set_box(bbox, objectness, 1, 1, 2, 3, [0.5, 0.5, 0.25, 0.5], 0.7)
+    processor = DetectionPostProcessor(image_size=(64, 128))
+    predictions = flat(bbox, objectness)
+    boxes, scores = processor.decode(predictions["bbox"], predictions["objectness"])
+
+    assert boxes.shape == (2, 32, 4) and scores.shape == (2, 32)
+    index = 1 * 16 + 2 * 4 + 3
+    torch.testing.assert_close(boxes[1, index], torch.tensor([48.0, 16.0, 80.0, 48.0]))
+    assert scores[1, index] == 0.7
+
+def test_nms_per_image():
+    bbox, objectness = make_predictions()
+    duplicate = [0.25, 0.25, 0.25, 0.25]
+    # Image 0: the same box on two levels plus a separate one, and one below
+    # the threshold; image 1: the same box again, which image 0 must not
+    # suppress
+    set_box(bbox, objectness, 0, 0, 0, 0, duplicate, 0.9)
+    set_box(bbox, objectness, 0, 1, 1, 1, duplicate, 0.8)
+    set_box(bbox, objectness, 0, 0, 3, 3, [0.75, 0.75, 0.2, 0.2], 0.6)
+    set_box(bbox, objectness, 0, 1, 3, 0, [0.1, 0.9, 0.1, 0.1], 0.4)
+    set_box(bbox, objectness, 1, 0, 2, 2, duplicate, 0.7)
+
+    output = DetectionPostProcessor(image_size=(64, 64), confidence_threshold=0.5)(flat(bbox, objectness))
+    assert output["num_detections"].tolist() == [2, 1]
+    torch.testing.assert_close(output["scores"][0, :3], torch.tensor([0.9, 0.6, 0.0]))
+    torch.testing.assert_close(output["boxes"][0, 0], torch.tensor([8.0, 8.0, 24.0, 24.0]))
+    torch.testing.assert_close(output["boxes"][1, 0], torch.tensor([8.0, 8.0, 24.0, 24.0]))
+
+def test_matches_per_image_nms():
+    torch.manual_seed(0)
+    bbox = torch.rand(3, 8, 8, 8) * 0.5 + 0.25
+    objectness = torch.rand(3, 2, 8, 8)
+    processor = DetectionPostProcessor(image_size=(64, 64), confidence_threshold=0.3, nms_threshold=0.5, max_detections=5)
+    output = processor({"bbox": bbox, "objectness": objectness})
+
+    boxes, scores = processor.decode(bbox, objectness)
+    for b in range(3):
+        mask = scores[b] > 0.3
+        keep = nms(boxes[b][mask], scores[b][mask], 0.5)[:5]
+        count = int(output["num_detections"][b])
+        assert count == len(keep)
+        torch.testing.assert_close(output["scores"][b, :count], scores[b][mask][keep])
+        torch.testing.assert_close(output["boxes"][b, :count], boxes[b][mask][keep])
+
+def test_smoother_running_mean_per_stream():
+    smoother = ActivitySmoother(window=2, max_streams=2)
+    torch.testing.assert_close(smoother(["a", "b"], torch.tensor([[1.0], [3.0]])), torch.tensor([1.0, 3.0]))
+    torch.testing.assert_close(smoother(["a"], torch.tensor([3.0])), torch.tensor([2.0]))
+    # Only the last two values count
+    torch.testing.assert_close(smoother(["a"], torch.tensor([7.0])), torch.tensor([5.0]))
+
+    smoother(["c"], torch.tensor([0.0]))
+    assert list(smoother._history) == ["a", "c"]
+    smoother.reset("a")
+    torch.testing.assert_close(smoother(["a"], torch.tensor([4.0])), torch.tensor([4.0]))
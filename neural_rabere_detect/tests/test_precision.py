@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import torch
+import albumentations as A
+
+from src.dataset import FRAME_BBOX_PARAMS
+from src.precision import PrecisionPolicy, compare_step_times
+
+from conftest import make_model
+
+CPU = torch.device("cpu")
+
+def loss_fn(model, predictions, targets):
+    return model.compute_loss(predictions, targets)
+
+def make_batch(B: int = 2, T: int = 3):
+    targets = {
+        "bbox": torch.rand(B, 16, 16, 16),
+        "objectness": (torch.rand(B, 4, 16, 16) > 0.9).float(),
+        "activity": torch.rand(B, 1)
+    }
+    return torch.randn(B, 3, 64, 64), torch.randn(B, T - 1, 3, 64, 64), targets
+
+@pytest.mark.parametrize("precision, dtype", [
+    ("float32", None), ("bfloat16", torch.bfloat16), ("float16", torch.float16), ("mixed", torch.bfloat16)
+])
+def test_policy_dtypes_on_cpu(precision, dtype):
+    policy = PrecisionPolicy(precision, CPU)
+    assert policy.dtype == dtype
+    assert policy.autocast().fast_dtype == (dtype or torch.float32)
+    # Loss scaling is only for fp16 on CUDA
+    assert not policy.scaler.is_enabled()
+
+def test_policy_from_config():
+    config = {"system": {"precision": "mixed", "channels_last": False}}
+    policy = PrecisionPolicy.from_config(config, CPU)
+    assert policy.name == "bfloat16" and not policy.channels_last
+    with pytest.raises(ValueError):
+        PrecisionPolicy("int8", CPU)
+
+def test_channels_last_model_and_inputs():
+    policy = PrecisionPolicy("bfloat16", CPU)
+    model = policy.prepare_model(make_model(temporal_length=3))
+    conv = model.fpn.layer_blocks[0][0].weight
+    assert conv.is_contiguous(memory_format=torch.channels_last)
+    assert policy.prepare_input(torch.randn(2, 3, 8, 8)).is_contiguous(memory_format=torch.channels_last)
+
+    # Clips are left alone, lists of cached features are converted
+    assert policy.prepare_input(torch.randn(2, 3, 3, 8, 8)).is_contiguous()
+    features = policy.prepare_input([torch.randn(1, 4, 8, 8)])
+    assert features[0].is_contiguous(memory_format=torch.channels_last)
+
+def test_bf16_training_step_is_finite():
+    policy = PrecisionPolicy("bfloat16", CPU)
+    model = policy.prepare_model(make_model(temporal_length=3)).train()
+    frames, temporal_frames, targets = make_batch()
+    with policy.autocast():
+        predictions = model(policy.prepare_input(frames), temporal_frames)
+        loss, losses = model.compute_loss(predictions, targets)
+    assert predictions["bbox"].dtype == torch.bfloat16
+    assert losses["objectness_loss"].dtype == torch.float32
+    policy.backward(loss)
+    assert torch.isfinite(loss)
+    assert all(torch.isfinite(p.grad).all() for p in model.parameters() if p.grad is not None)
+
+def test_focal_loss_survives_saturated_predictions():
+    model = make_model(temporal_length=3)
+    targets = {"bbox": torch.zeros(1, 4, 2, 2), "objectness": torch.ones(1, 1, 2, 2), "activity": torch.zeros(1, 1)}
+    for dtype in (torch.float32, torch.bfloat16):
+        predictions = {
+            "bbox": torch.zeros(1, 4, 2, 2, dtype=dtype),
+            # Saturated on the wrong side: pt == 0
+            "objectness": torch.zeros(1, 1, 2, 2, dtype=dtype),
+            "activity": torch.zeros(1, 1, dtype=dtype)
+        }
+        loss, _ = model.compute_loss(predictions, targets)
+        assert torch.isfinite(loss)
+
+def test_step_time_comparison_keys():
+    times = compare_step_times(make_model(temporal_length=3), make_batch(), CPU, loss_fn, num_steps=1)
+    assert set(times) == {"float32", "float32_channels_last", "bfloat16", "bfloat16_channels_last"}
+    assert all(value > 0 for value in times.values())
+
+def test_frame_boxes_are_clipped_to_the_frame():
+    transform = A.Compose([A.Rotate(limit=(30, 30), p=1.0)], bbox_params=FRAME_BBOX_PARAMS)
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    out = transform(image=image, bboxes=[[40.0, 40.0, 64.0, 64.0]])
+    x1, y1, x2, y2 = out["bboxes"][0][:4]
+    assert 0 <= x1 < x2 <= 64 and 0 <= y1 < y2 <= 64
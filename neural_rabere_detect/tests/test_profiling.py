@@ -0,0 +1,64 @@
+import json
+import torch
+import torch.nn as nn
+
+from src.profiling import ModuleProfiler, estimate_flops
+
+from conftest import make_model
+
+def test_flop_estimates():
+    conv = nn.Conv2d(4, 8, 3, padding=1, groups=2)
+    x = torch.randn(1, 4, 5, 5)
+    assert estimate_flops(conv, (x,), conv(x)) == 2 * (8 * 25) * 2 * 9
+
+    linear = nn.Linear(6, 3)
+    x = torch.randn(2, 6)
+    assert estimate_flops(linear, (x,), linear(x)) == 2 * 6 * 6
+
+    lstm = nn.LSTM(5, 7, num_layers=2, batch_first=True, bidirectional=True)
+    x = torch.randn(2, 3, 5)
+    steps = 6
+    expected = 2 * steps * 2 * 28 * (5 + 7) + 2 * steps * 2 * 28 * (14 + 7)
+    assert estimate_flops(lstm, (x,), lstm(x)) == expected
+
+    assert estimate_flops(nn.ReLU(), (x,), x) == 0
+
+@torch.no_grad()
+def test_profiler_records_nested_modules(tmp_path):
+    model = make_model(temporal_length=3)
+    profiler = ModuleProfiler(model, ["backbone", "detection_heads", "activity_head", "activity_head.lstm"])
+    x, temporal = torch.randn(1, 3, 64, 64), torch.randn(1, 2, 3, 64, 64)
+
+    with profiler:
+        assert profiler.enabled
+        for _ in range(2):
+            model(x, temporal)
+    assert not profiler.enabled
+
+    summary = profiler.summary()
+    # The backbone also encodes the temporal frames; ModuleLists are
+    # profiled per child
+    assert summary["backbone"]["calls"] == 4
+    assert summary["detection_heads.0"]["calls"] == 2 and "detection_heads" not in summary
+    assert summary["activity_head.lstm"]["calls"] == 2
+
+    # LSTM FLOPs are credited to the LSTM and to the head around it
+    lstm = summary["activity_head.lstm"]["mean_gflops"]
+    assert 0 < lstm < summary["activity_head"]["mean_gflops"]
+    assert summary["backbone"]["mean_gflops"] > 0
+
+    profiler.export_json(str(tmp_path / "profile.json"))
+    profiler.export_chrome_trace(str(tmp_path / "trace.json"))
+    assert set(json.loads((tmp_path / "profile.json").read_text())["modules"]) == set(summary)
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert len(events) == sum(stats["calls"] for stats in summary.values())
+
+@torch.no_grad()
+def test_disabled_profiler_leaves_no_hooks():
+    model = make_model(temporal_length=3)
+    profiler = ModuleProfiler(model, ["backbone"])
+    profiler.enable()
+    profiler.disable()
+    model(torch.randn(1, 3, 64, 64))
+    assert profiler.summary() == {}
+    assert not any(module._forward_hooks or module._forward_pre_hooks for module in model.modules())
@@ -0,0 +1,45 @@
+import pytest
+import torch
+
+from src.model import DeformableConv2d
+from src.quantization import check_tolerance, model_size_mb, output_errors, quantize_model
+
+from conftest import make_model
+
+@pytest.fixture(scope="module")
+def batches():
+    # (frames, temporal frames, targets) like the data loaders yield
+    generator = torch.Generator().manual_seed(0)
+    return [
+        (torch.rand(2, 3, 64, 64, generator=generator), torch.rand(2, 3, 3, 64, 64, generator=generator), {})
+        for _ in range(3)
+    ]
+
+@pytest.fixture(scope="module")
+def models(batches):
+    model = make_model("resnet18", temporal_length=4)
+    return model, quantize_model(model, batches, num_calibration_batches=2)
+
+def test_quantized_model_is_int8(models):
+    model, int8_model = models
+    quantized = [name for name, module in int8_model.named_modules() if "quantized" in type(module).__module__]
+    assert any(name.startswith("backbone") for name in quantized)
+    assert any(name.startswith("activity_head") for name in quantized)
+
+    # Deformable convolutions stay float, and the input model is untouched
+    assert any(isinstance(module, DeformableConv2d) for module in int8_model.detection_heads.modules())
+    assert not any("quantized" in type(module).__module__ for module in model.modules())
+    assert model_size_mb(int8_model) < model_size_mb(model) / 2
+
+def test_quantized_outputs_stay_close(models, batches):
+    model, int8_model = models
+    errors = output_errors(model, int8_model, batches, num_batches=3)
+    assert errors["bbox_mae"] < 0.05
+    assert errors["objectness_mae"] < 0.05
+    check_tolerance({"errors": errors}, max_bbox_error=0.05, max_activity_error=1.0)
+
+def test_tolerance_gate_rejects_regressions():
+    errors = {"bbox_mae": 0.1, "activity_mae": 0.01}
+    check_tolerance({"errors": errors}, max_bbox_error=0.2, max_activity_error=0.05)
+    with pytest.raises(RuntimeError, match="bbox MAE"):
+        check_tolerance({"errors": errors}, max_bbox_error=0.05, max_activity_error=0.05)
@@ -0,0 +1,79 @@
+import pytest
+import torch
+
+from conftest import make_model
+
+@pytest.fixture(scope="module")
+def model():
+    return make_model(temporal_length=3)
+
+def count_calls(modules):
+    calls = []
+    handles = [
+        module.register_forward_hook(lambda module, args, output, name=name: calls.append(name))
+        for name, module in modules.items()
+    ]
+    return calls, handles
+
+@torch.no_grad()
+def test_disabled_branches_never_run(model):
+    x, temporal = torch.randn(2, 3, 64, 64), torch.randn(2, 2, 3, 64, 64)
+    calls, handles = count_calls({"detection": model.detection_heads[0], "activity": model.activity_head})
+    try:
+        outputs = model(x, temporal, detection=False)
+        assert set(outputs) == {"activity"} and calls == ["activity"]
+
+        calls.clear()
+        outputs = model(x, temporal, activity=False)
+        assert set(outputs) == {"bbox", "objectness"} and calls == ["detection"]
+    finally:
+        for handle in handles:
+            handle.remove()
+
+    with pytest.raises(ValueError):
+        model(x, detection=False, activity=False)
+
+@torch.no_grad()
+def test_selected_levels_match_full_pyramid(model):
+    x = torch.randn(2, 3, 64, 64)
+    full_bboxes, full_objectness = model(x, activity=False, per_level=True).values()
+    assert len(full_bboxes) == 4
+
+    for levels in ([3], [1, 2], [0, 3]):
+        bboxes, objectness = model(x, activity=False, levels=levels, per_level=True).values()
+        assert len(bboxes) == len(levels)
+        for level, bbox, obj in zip(levels, bboxes, objectness):
+            torch.testing.assert_close(bbox, full_bboxes[level])
+            torch.testing.assert_close(obj, full_objectness[level])
+
+@torch.no_grad()
+def test_coarse_levels_skip_fine_fpn_work(model):
+    features = model.extract_features(torch.randn(1, 3, 64, 64))
+    modules = {f"layer{idx}": block for idx, block in enumerate(model.fpn.layer_blocks)}
+    modules.update({f"inner{idx}": block for idx, block in enumerate(model.fpn.inner_blocks)})
+    calls, handles = count_calls(modules)
+    try:
+        model.detect(features, levels=[2, 3], per_level=True)
+    finally:
+        for handle in handles:
+            handle.remove()
+    assert sorted(calls) == ["inner2", "inner3", "layer2", "layer3"]
+
+@torch.no_grad()
+def test_invalid_levels_and_feature_inputs(model):
+    x = torch.randn(1, 3, 64, 64)
+    with pytest.raises(ValueError):
+        model(x, levels=[4])
+    with pytest.raises(ValueError):
+        model(x, levels=[])
+
+    # Precomputed stage features skip the backbone
+    features = model.extract_features(x)
+    calls, handles = count_calls({"backbone": model.backbone})
+    try:
+        outputs = model(features)
+    finally:
+        for handle in handles:
+            handle.remove()
+    assert calls == []
+    torch.testing.assert_close(outputs["bbox"], model(x)["bbox"])
@@ -0,0 +1,144 @@
+import cv2
+import functools
+import http.client
+import json
+import queue
+import threading
+import numpy as np
+import pytest
+import torch
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer
+
+from src.server import InferenceServer, make_handler
+
+from conftest import make_model
+
+IMAGE_SIZE = (64, 64)
+
+def encode_image() -> bytes:
+    ok, encoded = cv2.imencode(".png", np.random.default_rng(0).integers(0, 255, (*IMAGE_SIZE, 3), dtype=np.uint8))
+    assert ok
+    return encoded.tobytes()
+
+@pytest.fixture
+def server():
+    server = InferenceServer(
+        make_model(temporal_length=2),
+        image_size=IMAGE_SIZE,
+        max_batch_size=4,
+        max_latency_ms=1.0,
+        max_queue_size=2,
+        num_workers=1,
+        num_threads=torch.get_num_threads()
+    )
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def client(server):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(server))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def post(body: bytes, camera: str = "cam0"):
+        connection = http.client.HTTPConnection(*httpd.server_address, timeout=30)
+        path = f"/infer?camera={camera}" if camera else "/infer"
+        connection.request("POST", path, body=body)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    yield post
+    httpd.shutdown()
+    httpd.server_close()
+
+def block_engine(server):
+    # Holds every batch in the engine until released
+    engine = server.workers[0].engine
+    release, entered, calls = threading.Event(), threading.Event(), []
+    process_batch = engine.process_batch
+
+    def blocked(camera_ids, frames):
+        calls.append(list(camera_ids))
+        entered.set()
+        release.wait(10)
+        return process_batch(camera_ids, frames)
+
+    engine.process_batch = blocked
+    return release, entered, calls
+
+def test_good_frame(client):
+    status, payload = client(encode_image())
+    assert status == 200
+    assert payload["camera_id"] == "cam0"
+    assert {"activity", "smoothed_activity", "boxes", "scores", "latency_ms"} <= set(payload)
+
+@pytest.mark.parametrize("body", [b"", b"not an image"])
+def test_bad_image_is_400(client, body):
+    status, payload = client(body)
+    assert status == 400
+    assert "error" in payload
+
+def test_oversized_body_is_413_before_inference(server, client):
+    _, _, calls = block_engine(server)
+    server.max_request_bytes = 16
+    status, payload = client(encode_image())
+    assert status == 413
+    assert "error" in payload
+    assert not calls and server.metrics.snapshot().get("accepted", 0) == 0
+
+def test_missing_camera_is_400(client):
+    assert client(encode_image(), camera="")[0] == 400
+
+def test_engine_failure_is_500(server, client):
+    def fail(camera_ids, frames):
+        raise RuntimeError("engine exploded")
+
+    server.workers[0].engine.process_batch = fail
+    status, payload = client(encode_image())
+    assert status == 500
+    assert "engine exploded" in payload["error"]
+    assert server.metrics.counters["errors"] == 1
+
+def test_timeout_is_504_and_cancelled(server, client, monkeypatch):
+    release, entered, calls = block_engine(server)
+    monkeypatch.setattr(server, "infer", functools.partial(server.infer, timeout=0.2))
+
+    # The first request holds the worker; the second times out in the queue
+    first = server.submit("cam0", server.preprocess(encode_image()))
+    assert entered.wait(10)
+    status, _ = client(encode_image(), camera="cam1")
+    assert status == 504
+    assert server.metrics.counters["timeouts"] == 1
+
+    # Once the worker is free it skips the cancelled request
+    release.set()
+    first.future.result(timeout=10)
+    server.submit("cam2", server.preprocess(encode_image())).future.result(timeout=10)
+    assert all("cam1" not in batch for batch in calls)
+
+def test_full_queue_sheds_load(server, client):
+    release, entered, _ = block_engine(server)
+    frame = server.preprocess(encode_image())
+    requests = [server.submit("cam0", frame)]
+    assert entered.wait(10)
+
+    # One request is held by the worker and two more fill the queue
+    requests.append(server.submit("cam1", frame))
+    requests.append(server.submit("cam2", frame))
+    with pytest.raises(queue.Full):
+        server.submit("cam3", frame)
+    assert client(encode_image(), camera="cam9")[0] == 503
+    assert server.metrics.counters["shed"] == 2
+
+    release.set()
+    for request in requests:
+        request.future.result(timeout=10)
+
+def test_infer_raises_timeout_directly(server):
+    release, entered, _ = block_engine(server)
+    server.submit("cam0", server.preprocess(encode_image()))
+    assert entered.wait(10)
+    with pytest.raises(FutureTimeoutError):
+        server.infer("cam1", encode_image(), timeout=0.1)
+    release.set()
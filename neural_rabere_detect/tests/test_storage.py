@@ -0,0 +1,65 @@
+import shutil
+import numpy as np
+import pytest
+
+from src.dataset import RabereDataset
+from src.storage import (
+    convert_jpeg_dataset,
+    create_packed_sequence,
+    is_packed_sequence,
+    open_packed_sequence,
+    publish_packed_sequence
+)
+
+def test_packed_sequence_round_trip(tmp_path):
+    seq_path = tmp_path / "sequence_0000"
+    packed = create_packed_sequence(seq_path, 3, (8, 6))
+    packed[:] = np.arange(packed.size, dtype=np.uint64).reshape(packed.shape) % 251
+    assert not is_packed_sequence(seq_path)
+    publish_packed_sequence(seq_path, packed)
+    del packed
+
+    assert is_packed_sequence(seq_path)
+    frames = open_packed_sequence(seq_path)
+    assert frames.shape == (3, 8, 6, 3)
+    assert frames.dtype == np.uint8
+    assert isinstance(frames, np.memmap)
+    assert int(frames[2, 7, 5, 2]) == (frames.size - 1) % 251
+
+def test_interrupted_conversion_is_redone(jpeg_root, tmp_path):
+    root = tmp_path / "converted"
+    shutil.copytree(jpeg_root, root, symlinks=False)
+    seq_path = sorted((root / "train").glob("sequence_*"))[0]
+
+    # A conversion that stops before publishing leaves only the temporary
+    # file, so the sequence is still converted on the next run
+    create_packed_sequence(seq_path, 2, (8, 8))
+    assert not is_packed_sequence(seq_path)
+    assert convert_jpeg_dataset(str(root / "train")) == len(list((root / "train").glob("sequence_*")))
+    assert open_packed_sequence(seq_path).any()
+
+def test_converted_jpeg_matches_jpeg_frames(jpeg_root, tmp_path):
+    # Converting in a copy keeps the session's JPEG split intact
+    root = tmp_path / "converted"
+    shutil.copytree(jpeg_root, root, symlinks=False)
+
+    jpeg = RabereDataset(str(root / "train"), temporal_length=4, transform=None)
+    expected = [np.array(frame) for frame in jpeg.load_frames(0, 2, 10, 2)]
+
+    assert convert_jpeg_dataset(str(root / "train")) == len(jpeg.sequences)
+    assert convert_jpeg_dataset(str(root / "train")) == 0
+
+    packed = RabereDataset(str(root / "train"), temporal_length=4, transform=None)
+    assert packed.sequences[0]["format"] == "packed"
+    actual = packed.load_frames(0, 2, 10, 2)
+    assert len(actual) == len(expected)
+    for exp, act in zip(expected, actual):
+        np.testing.assert_array_equal(exp, act)
+
+@pytest.mark.parametrize("temporal_length", [1, 4])
+def test_packed_windows_have_clip_shape(packed_root, temporal_length):
+    dataset = RabereDataset(str(packed_root / "train"), temporal_length=temporal_length)
+    sample = dataset[len(dataset) - 1]
+    assert sample["frames"].shape == (temporal_length, 3, 128, 128)
+    assert sample["bboxes"].shape == (temporal_length, 4)
+    assert sample["activities"].shape == (temporal_length,)
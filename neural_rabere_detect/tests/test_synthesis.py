@@ -0,0 +1,58 @@
+import numpy as np
+
+from src.synthesis import NOISE_TABLE_SIZE, BatchedSequenceRenderer
+
+MOVEMENT_PARAMS = {
+    "max_speed": 30,
+    "direction_change_prob": 0.1,
+    "activity_change_prob": 0.05,
+    "min_activity": 0.0,
+    "max_activity": 1.0
+}
+
+def make_renderer(**kwargs) -> BatchedSequenceRenderer:
+    return BatchedSequenceRenderer((128, 128), MOVEMENT_PARAMS, **kwargs)
+
+def test_noise_table_matches_normal_noise():
+    table = make_renderer()._noise_table
+    assert table.shape == (NOISE_TABLE_SIZE,)
+    assert table.dtype == np.uint8
+
+    # Negative values wrap like astype(uint8) does; as int8 they are N(0, 10)
+    # truncated toward zero
+    signed = table.view(np.int8).astype(np.float64)
+    reference = np.random.default_rng(0).normal(0, 10, 200000).astype(np.int64)
+    assert abs(signed.mean()) < 0.05
+    assert abs(signed.std() - reference.std()) < 0.1
+
+def test_noise_is_fresh_every_frame():
+    frames, _ = make_renderer(noise_block_frames=4).render(np.random.default_rng(0), 12)
+
+    # Far from the sprite every pixel is noise under a near-constant
+    # brightness, so shared noise would make neighbouring frames agree almost
+    # everywhere; fresh noise only agrees where both wrapped values saturate
+    for idx in range(len(frames) - 1):
+        background = slice(0, 16)
+        same = frames[idx, background, background] == frames[idx + 1, background, background]
+        assert same.mean() < 0.5
+
+def test_render_is_seeded():
+    renderer = make_renderer()
+    frames_a, annotations_a = renderer.render(np.random.default_rng(7), 40)
+    frames_b, annotations_b = renderer.render(np.random.default_rng(7), 40)
+    np.testing.assert_array_equal(frames_a, frames_b)
+    assert annotations_a == annotations_b
+
+    frames_c, _ = renderer.render(np.random.default_rng(8), 40)
+    assert not np.array_equal(frames_a, frames_c)
+
+def test_render_into_preallocated_frames():
+    out = np.full((40, 128, 128, 3), 255, dtype=np.uint8)
+    frames, annotations = make_renderer(block_size=16).render(np.random.default_rng(1), 40, out=out)
+    assert frames is out
+    assert len(annotations) == 40
+    assert [annotation["frame_id"] for annotation in annotations] == list(range(40))
+
+    bboxes = np.array([annotation["bbox"] for annotation in annotations])
+    assert (bboxes[:, :2] >= 0).all() and (bboxes[:, 2:] <= 128).all()
+    assert (bboxes[:, 2:] > bboxes[:, :2]).all()
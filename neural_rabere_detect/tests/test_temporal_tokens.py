@@ -0,0 +1,36 @@
+import pytest
+import torch
+
+from src.model import ActivityHead
+
+@pytest.mark.parametrize("mode", ["pool", "grid"])
+@pytest.mark.parametrize("size", [(2, 2), (5, 7), (20, 20)])
+@torch.no_grad()
+def test_attention_sees_one_token_per_frame(mode, size):
+    torch.manual_seed(0)
+    head = ActivityHead(64, temporal_length=4, temporal_tokens=mode, grid_size=2).eval()
+    shapes = []
+    handle = head.temporal_attention.register_forward_pre_hook(lambda module, args: shapes.append(args[0].shape))
+
+    activity = head(torch.randn(2, 64, *size), torch.randn(2, 3, 64, *size))
+    handle.remove()
+
+    # [B, T, C // 4] whatever the map resolution
+    assert shapes == [(2, 4, 16)]
+    assert activity.shape == (2, 1)
+    assert ((activity >= 0) & (activity <= 1)).all()
+
+def test_grid_tokens_keep_layout():
+    torch.manual_seed(0)
+    head = ActivityHead(64, temporal_length=2, temporal_tokens="grid", grid_size=2)
+    x = torch.zeros(1, 2, 16, 4, 4)
+    x[..., :2, :2] = 1.0
+    flipped = x.flip(-1)
+
+    # Pooling cannot tell the two apart, the grid projection can
+    torch.testing.assert_close(x.mean(dim=(-2, -1)), flipped.mean(dim=(-2, -1)))
+    assert not torch.allclose(head._temporal_tokens(x), head._temporal_tokens(flipped))
+
+def test_unknown_token_mode():
+    with pytest.raises(ValueError):
+        ActivityHead(64, temporal_length=4, temporal_tokens="flatten")
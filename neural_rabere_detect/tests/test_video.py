@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from src.video import (
+    VIDEO_INDEX_FILE,
+    VideoClipReader,
+    VideoFrameIndex,
+    VideoReaderPool,
+    is_video_sequence,
+    video_path,
+    write_video_sequence
+)
+
+av = pytest.importorskip("av")
+
+NUM_FRAMES = 40
+
+@pytest.fixture(scope="module")
+def video_sequence(tmp_path_factory):
+    # Flat frames of distinct brightness survive lossy coding recognizably
+    seq_path = tmp_path_factory.mktemp("video") / "sequence_0000"
+    seq_path.mkdir()
+    frames = [np.full((64, 64, 3), 20 + 5 * idx, dtype=np.uint8) for idx in range(NUM_FRAMES)]
+    write_video_sequence(seq_path, frames, fps=30, gop_size=8)
+    return seq_path
+
+def brightness(clip: np.ndarray) -> np.ndarray:
+    return clip.reshape(len(clip), -1).mean(axis=1)
+
+@pytest.fixture(scope="module")
+def decoded(video_sequence) -> np.ndarray:
+    # Every frame decoded front to back, without seeking
+    with av.open(str(video_path(video_sequence))) as container:
+        return np.stack([frame.to_ndarray(format="rgb24") for frame in container.decode(video=0)])
+
+def test_index_lists_frames_and_keyframes(video_sequence):
+    assert is_video_sequence(video_sequence)
+    index = VideoFrameIndex.load_or_build(video_path(video_sequence))
+    assert len(index) == NUM_FRAMES
+    assert (np.diff(index.pts) > 0).all()
+    assert index.keyframes[0] and index.keyframes.sum() >= NUM_FRAMES // 8
+    assert index.keyframe_before(NUM_FRAMES - 1) <= NUM_FRAMES - 1
+
+    # Published by rename, with no temporary file left behind
+    assert (video_sequence / VIDEO_INDEX_FILE).is_file()
+    assert not list(video_sequence.glob(VIDEO_INDEX_FILE + ".tmp*"))
+
+@pytest.mark.parametrize("frame_numbers", [[0, 1, 2, 3], [5, 9, 13, 17], [30, 33, 36, 39]])
+def test_seeked_reads_return_the_requested_frames(video_sequence, decoded, frame_numbers):
+    assert len(decoded) == NUM_FRAMES
+    reader = VideoClipReader(video_path(video_sequence))
+    try:
+        clip = reader.read(frame_numbers)
+        assert clip.shape == (len(frame_numbers), 64, 64, 3)
+        np.testing.assert_array_equal(clip, decoded[frame_numbers])
+        # The same reader seeks back for an earlier window
+        np.testing.assert_array_equal(reader.read([2, 4]), decoded[[2, 4]])
+    finally:
+        reader.close()
+
+def test_missing_frames_raise(video_sequence):
+    reader = VideoClipReader(video_path(video_sequence))
+    try:
+        with pytest.raises(IOError, match=str(NUM_FRAMES + 1)):
+            reader.read([NUM_FRAMES - 2, NUM_FRAMES + 1])
+    finally:
+        reader.close()
+
+def test_pool_bounds_open_readers(video_sequence, tmp_path):
+    other = tmp_path / "sequence_0001"
+    other.mkdir()
+    write_video_sequence(other, [np.zeros((64, 64, 3), dtype=np.uint8)] * 8, fps=30, gop_size=8)
+
+    pool = VideoReaderPool(max_open=1)
+    pool.read(video_path(video_sequence), [0, 1])
+    clip = pool.read(video_path(other), [3])
+    assert list(pool._readers) == [video_path(other)]
+    assert brightness(clip)[0] < 2
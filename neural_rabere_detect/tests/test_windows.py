@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from src.augmentation import ClipAugmentation
+from src.dataset import RabereDataset
+
+@pytest.mark.parametrize(
+    "temporal_length, window_stride, frame_dilation, windows_per_sequence",
+    [(4, 1, 1, 21), (4, 5, 1, 5), (4, 5, 2, 4), (1, 1, 3, 24)]
+)
+def test_window_counts(packed_root, temporal_length, window_stride, frame_dilation, windows_per_sequence):
+    dataset = RabereDataset(
+        str(packed_root / "train"),
+        temporal_length=temporal_length,
+        window_stride=window_stride,
+        frame_dilation=frame_dilation
+    )
+    assert len(dataset) == 3 * windows_per_sequence
+    starts = dataset.frame_indices[dataset.frame_indices[:, 0] == 0, 1]
+    np.testing.assert_array_equal(starts, np.arange(windows_per_sequence) * window_stride)
+
+def test_dilated_window_reads_every_nth_frame(packed_root):
+    dataset = RabereDataset(
+        str(packed_root / "train"),
+        temporal_length=4,
+        transform=ClipAugmentation(train=False),
+        window_stride=5,
+        frame_dilation=2
+    )
+    sample = dataset[1]
+    seq_idx, start = (int(v) for v in dataset.frame_indices[1])
+    assert start == 5
+
+    rows = dataset.annotations.rows(seq_idx, start, start + 7, 2)
+    np.testing.assert_array_equal(dataset.annotations.column("frame_id")[rows], [5, 7, 9, 11])
+    np.testing.assert_allclose(sample["bboxes"].numpy(), dataset.annotations.column("bbox")[rows])
+    assert sample["frames"].shape[0] == 4
+
+def test_random_offsets_keep_epoch_length(packed_root):
+    dataset = RabereDataset(
+        str(packed_root / "train"),
+        temporal_length=4,
+        window_stride=5,
+        frame_dilation=2,
+        random_window_offset=True,
+        seed=1
+    )
+    first = dataset.frame_indices.copy()
+
+    offsets = set()
+    for epoch in range(1, 8):
+        dataset.set_epoch(epoch)
+        indices = dataset.frame_indices
+        assert len(indices) == len(first)
+        np.testing.assert_array_equal(indices[:, 0], first[:, 0])
+        # Windows stay on the stride grid and inside their sequence
+        starts = indices[:, 1]
+        assert (starts >= 0).all() and (starts + dataset.window_span <= 24).all()
+        offsets.update((starts % 5).tolist())
+
+    assert len(offsets) > 1
+
+    dataset.set_epoch(3)
+    again = dataset.frame_indices.copy()
+    dataset.set_epoch(4)
+    dataset.set_epoch(3)
+    np.testing.assert_array_equal(dataset.frame_indices, again)
+
+def test_invalid_stride_rejected(packed_root):
+    with pytest.raises(ValueError):
+        RabereDataset(str(packed_root / "train"), temporal_length=4, window_stride=0)